@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Conversation Archival Job
+Moves the messages of closed or long-idle sessions into compressed per-session blobs.
+Archived messages stay readable through ConversationService.get_session_messages.
+
+Run periodically (e.g. a daily cron or Render cron job):
+    python archive_conversations.py --retention-days 30
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+CONVERSATION_RETENTION_DAYS = float(os.getenv("CONVERSATION_RETENTION_DAYS", "30"))
+CLOSED_CONVERSATION_RETENTION_DAYS = float(os.getenv("CLOSED_CONVERSATION_RETENTION_DAYS", "1"))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Archive closed and idle conversation sessions")
+    parser.add_argument("--retention-days", type=float, default=CONVERSATION_RETENTION_DAYS,
+                        help="Archive sessions idle for longer than this many days")
+    parser.add_argument("--closed-retention-days", type=float, default=CLOSED_CONVERSATION_RETENTION_DAYS,
+                        help="Archive closed sessions this many days after they were closed")
+    parser.add_argument("--batch-size", type=int, default=200, help="Sessions selected per batch")
+    parser.add_argument("--max-sessions", type=int, default=0, help="Stop after this many sessions (0 = no limit)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
+    return parser.parse_args()
+
+def archive(args):
+    """Archive sessions in batches; returns (sessions, messages, succeeded)"""
+    from database import SessionLocal
+    from services.conversation_store import get_conversation_store
+
+    now = datetime.utcnow()
+    idle_before = now - timedelta(days=args.retention_days)
+    closed_before = now - timedelta(days=args.closed_retention_days)
+    sessions = messages = 0
+
+    db = SessionLocal()
+    try:
+        store = get_conversation_store(db)
+        while not args.max_sessions or sessions < args.max_sessions:
+            if args.dry_run:
+                # Nothing is moved, so count every candidate in one query
+                sessions = len(store.find_archivable_sessions(idle_before, closed_before, args.max_sessions or sys.maxsize))
+                logger.info(f"🔎 {sessions} sessions would be archived (dry run)")
+                break
+            limit = args.batch_size
+            if args.max_sessions:
+                limit = min(limit, args.max_sessions - sessions)
+            batch = store.find_archivable_sessions(idle_before, closed_before, limit)
+            if not batch:
+                break
+            for session_id in batch:
+                try:
+                    messages += store.archive_session(session_id)
+                    sessions += 1
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"❌ Failed to archive session {session_id}: {e}")
+                    return sessions, messages, False
+            logger.info(f"📦 Archived {sessions} sessions ({messages} messages) so far")
+        return sessions, messages, True
+    finally:
+        db.close()
+
+def main():
+    """Main archival function"""
+    args = parse_args()
+    logger.info("🚀 Archiving conversations...")
+    logger.info(f"   Idle retention: {args.retention_days} days, closed retention: {args.closed_retention_days} days")
+
+    started = time.perf_counter()
+    sessions, messages, ok = archive(args)
+    elapsed = time.perf_counter() - started
+
+    from database import SessionLocal
+    from services.conversation_store import get_conversation_store
+    db = SessionLocal()
+    try:
+        stats = get_conversation_store(db).archive_stats()
+    finally:
+        db.close()
+
+    ratio = stats["raw_bytes"] / stats["compressed_bytes"] if stats["compressed_bytes"] else 0
+    logger.info(f"✅ {sessions} sessions, {messages} messages archived in {elapsed:.1f}s")
+    logger.info(f"   Hot messages: {stats['hot_messages']}, archived: {stats['archived_messages']} "
+                f"in {stats['archived_sessions']} sessions")
+    logger.info(f"   Archive size: {stats['compressed_bytes']} bytes ({ratio:.1f}x compression)")
+    return ok
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
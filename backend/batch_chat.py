@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Batch Chat CLI
+Answers a file of support questions in one pass (same pipeline as POST /api/chat/batch)
+and writes one NDJSON result per line.
+
+Input is one message per line, or JSON lines with message and optional id, user_id and
+conversation_id:
+    python batch_chat.py questions.txt --output answers.ndjson --concurrency 8
+"""
+
+import sys
+import json
+import logging
+import argparse
+from dotenv import load_dotenv
+
+# Configure logging (to stderr, so results can go to stdout)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer many chat messages in one batch")
+    parser.add_argument("input", help="Text or JSON-lines file of messages ('-' for stdin)")
+    parser.add_argument("--output", default="-", help="NDJSON output file ('-' for stdout)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Concurrent LLM calls")
+    parser.add_argument("--persist", action="store_true", help="Store both turns in conversation history")
+    parser.add_argument("--user-id", default=None, help="User for lines that do not name one")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Messages per batch pass")
+    return parser.parse_args()
+
+def read_items(path: str, default_user_id=None):
+    """Yield batch items from a text or JSON-lines file"""
+    source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line_number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line) if line.startswith("{") else {"message": line}
+            if not item.get("message"):
+                logger.warning(f"⚠️  Line {line_number} has no message, skipped")
+                continue
+            item.setdefault("id", str(line_number))
+            item.setdefault("user_id", default_user_id)
+            yield item
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+def run_batch(items, args, output) -> dict:
+    from database import SessionLocal
+    from services.batch_chat_service import BatchChatService
+    from services.conversation_memory import update_conversation_summary
+    from services.trending import trending
+
+    db = SessionLocal()
+    try:
+        # Trending answers read this process's sketches
+        logger.info(f"   Trending sketches {trending.restore(db)}")
+        batch_service = BatchChatService(db)
+        summary = {}
+        for result in batch_service.process(items, persist=args.persist, max_concurrency=args.concurrency):
+            if "summary" in result:
+                summary = result["summary"]
+                continue
+            output.write(json.dumps(result, default=str) + "\n")
+        # Summaries only after a complete batch, on their own sessions; a failure above propagates as is
+        db.close()
+        for session_id in batch_service.persisted_sessions:
+            update_conversation_summary(session_id)
+    finally:
+        db.close()
+    return summary
+
+def main():
+    """Main batch function"""
+    args = parse_args()
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    totals = {"messages": 0, "unique_messages": 0, "llm_calls": 0, "elapsed_ms": 0.0}
+    try:
+        chunk = []
+        for item in read_items(args.input, args.user_id):
+            chunk.append(item)
+            if len(chunk) >= args.chunk_size:
+                summary = run_batch(chunk, args, output)
+                for key in totals:
+                    totals[key] += summary.get(key, 0)
+                logger.info(f"📦 {totals['messages']} messages answered so far")
+                chunk = []
+        if chunk:
+            summary = run_batch(chunk, args, output)
+            for key in totals:
+                totals[key] += summary.get(key, 0)
+    except Exception as e:
+        logger.error(f"❌ Batch failed: {e}")
+        return False
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    logger.info(f"✅ {totals['messages']} messages ({totals['unique_messages']} unique, "
+                f"{totals['llm_calls']} LLM calls) answered in {totals['elapsed_ms'] / 1000:.1f}s")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1 @@
+# Benchmark and load-testing tools 
\ No newline at end of file
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Response Serialization Benchmark
+Measures CPU time per response of the list endpoints' serialization, from query to JSON bytes:
+the response_model path (ORM objects or schemas, jsonable_encoder, json.dumps) against the
+fast path (SQL rows projected to dicts, encoded by services.serialization)
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_USER_ID = "bench-serialization"
+
+
+def seed_conversations(db, sessions: int, messages: int):
+    """Replace the benchmark user's conversations with sessions × messages synthetic turns"""
+    from models import ConversationSession, ConversationMessage
+
+    session_ids = [row.session_id for row in db.query(ConversationSession.session_id).filter(
+        ConversationSession.user_id == BENCH_USER_ID
+    )]
+    if session_ids:
+        db.query(ConversationMessage).filter(ConversationMessage.session_id.in_(session_ids)).delete(synchronize_session=False)
+        db.query(ConversationSession).filter(ConversationSession.user_id == BENCH_USER_ID).delete(synchronize_session=False)
+    started = datetime.utcnow() - timedelta(days=1)
+    for number in range(sessions):
+        session_id = f"{BENCH_USER_ID}-{number}"
+        db.add(ConversationSession(user_id=BENCH_USER_ID, session_id=session_id, is_active=True,
+                                   created_at=started, updated_at=started + timedelta(seconds=number)))
+        db.bulk_insert_mappings(ConversationMessage, [
+            {"session_id": session_id, "message_type": "user" if turn % 2 == 0 else "ai",
+             "content": f"Message {turn} of session {number}: " + "lorem ipsum dolor sit amet " * 8,
+             "timestamp": started + timedelta(seconds=turn)}
+            for turn in range(messages)
+        ])
+    db.commit()
+    return f"{BENCH_USER_ID}-0"
+
+
+def measure(run: Callable[[], bytes], repeat: int) -> Dict[str, Any]:
+    """CPU milliseconds per call (best of repeat, after a warm-up call) and the response size"""
+    body = run()
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        run()
+        timings.append((time.process_time() - started) * 1000)
+    timings.sort()
+    return {"best_ms": timings[0], "median_ms": timings[len(timings) // 2], "bytes": len(body)}
+
+
+def response_model_json(content) -> bytes:
+    """What FastAPI does for a response_model endpoint once the schemas are built"""
+    from fastapi.encoders import jsonable_encoder
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def run_benchmarks(repeat: int, rows: int, session_id: str):
+    from database import SessionLocal
+    from schemas import ConversationSession as ConversationSessionSchema, ConversationMessage as ConversationMessageSchema
+    from services.conversation_store import SQLAlchemyConversationStore
+    from services.ecommerce_service import EcommerceService, _stock_level_response, INVENTORY_KEYSET
+    from services.pagination import stream_rows
+    from services.serialization import dumps, schema_rows, orjson
+    from models import InventoryItem
+
+    def with_session(body: Callable[[Any], bytes]) -> Callable[[], bytes]:
+        # A fresh session per call, so ORM objects are hydrated every time as in a request
+        def run():
+            db = SessionLocal()
+            try:
+                return body(db)
+            finally:
+                db.close()
+        return run
+
+    cases = {
+        "conversations (user sessions)": (
+            with_session(lambda db: response_model_json([
+                ConversationSessionSchema.from_orm(session)
+                for session in SQLAlchemyConversationStore(db).get_user_sessions(BENCH_USER_ID)
+            ])),
+            with_session(lambda db: dumps(schema_rows(
+                SQLAlchemyConversationStore(db).get_user_session_rows(BENCH_USER_ID), ConversationSessionSchema
+            ))),
+        ),
+        "conversation messages": (
+            with_session(lambda db: response_model_json([
+                ConversationMessageSchema.from_orm(message)
+                for message in SQLAlchemyConversationStore(db).get_session_messages(session_id)
+            ])),
+            with_session(lambda db: dumps(schema_rows(
+                SQLAlchemyConversationStore(db).get_session_message_rows(session_id), ConversationMessageSchema
+            ))),
+        ),
+        "stock levels": (
+            with_session(lambda db: response_model_json([
+                _stock_level_response(result).dict()
+                for result in EcommerceService(db)._stock_levels_query(None, None).limit(rows)
+            ])),
+            with_session(lambda db: dumps(list(EcommerceService(db).iter_stock_levels(None, None, rows)))),
+        ),
+        "inventory items": (
+            with_session(lambda db: response_model_json([
+                row._asdict() for row in stream_rows(
+                    INVENTORY_KEYSET.apply(db.query(*InventoryItem.__table__.columns), None).limit(rows)
+                )
+            ])),
+            with_session(lambda db: dumps([
+                row._asdict() for row in stream_rows(
+                    INVENTORY_KEYSET.apply(db.query(*InventoryItem.__table__.columns), None).limit(rows)
+                )
+            ])),
+        ),
+    }
+
+    logger.info(f"Encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'json (install orjson)'}")
+    print(f"{'endpoint':32} {'bytes':>9} {'before ms':>10} {'after ms':>9} {'speedup':>8}")
+    for name, (before, after) in cases.items():
+        old, new = measure(before, repeat), measure(after, repeat)
+        if old["bytes"] != new["bytes"]:
+            logger.warning(f"{name}: response sizes differ ({old['bytes']} vs {new['bytes']} bytes)")
+        print(f"{name:32} {new['bytes']:>9} {old['median_ms']:>10.2f} {new['median_ms']:>9.2f} "
+              f"{old['median_ms'] / max(new['median_ms'], 1e-6):>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization of the list endpoints")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./benchmark.db"),
+                        help="Seeded database (see seed_local_db.py); the benchmark user's conversations are replaced")
+    parser.add_argument("--sessions", type=int, default=20, help="Conversation sessions of the benchmark user")
+    parser.add_argument("--messages", type=int, default=100, help="Messages per session")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per stock level / inventory response")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per case")
+    args = parser.parse_args()
+
+    # database.py reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from database import SessionLocal, engine
+    from models import Base
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        session_id = seed_conversations(db, args.sessions, args.messages)
+    finally:
+        db.close()
+    run_benchmarks(args.repeat, args.rows, session_id)
+
+
+if __name__ == "__main__":
+    main()
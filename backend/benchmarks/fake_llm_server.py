@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Fake LLM Server
+Local OpenAI/Groq-compatible chat completion server for offline benchmarks
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class FakeLLMConfig:
+    """Latency, token rate and error injection settings for the fake server"""
+
+    def __init__(self, latency_ms: float = 300.0, latency_jitter_ms: float = 100.0,
+                 tokens_per_second: float = 500.0, completion_tokens: int = 120,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = None):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests_served = 0
+
+    def sample(self):
+        """Return (delay_seconds, completion_tokens, error_status) for one request"""
+        with self.lock:
+            self.requests_served += 1
+            latency = max(0.0, self.random.gauss(self.latency_ms, self.latency_jitter_ms))
+            tokens = max(1, int(self.random.gauss(self.completion_tokens, self.completion_tokens * 0.2)))
+            roll = self.random.random()
+
+        error_status = None
+        if roll < self.rate_limit_rate:
+            error_status = 429
+        elif roll < self.rate_limit_rate + self.error_rate:
+            error_status = 500
+
+        generation = tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return latency / 1000 + generation, tokens, error_status
+
+
+def _estimate_tokens(messages) -> int:
+    return sum(len(str(message.get("content", ""))) for message in messages) // 4
+
+
+def _build_completion(payload: dict, completion_tokens: int) -> dict:
+    """Build an OpenAI-style chat completion body"""
+    messages = payload.get("messages", [])
+    last_message = str(messages[-1].get("content", "")) if messages else ""
+    # Echo a bounded slice of the prompt so responses stay deterministic in length
+    filler = " ".join(["lorem"] * completion_tokens)
+    content = f"[fake-llm] {last_message[:200].strip()} {filler}"
+    prompt_tokens = _estimate_tokens(messages)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "fake-model"),
+        "system_fingerprint": None,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "logprobs": None,
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+def make_handler(config: FakeLLMConfig):
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "invalid JSON"}})
+                return
+
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+
+            delay, completion_tokens, error_status = config.sample()
+            time.sleep(delay)
+
+            if error_status == 429:
+                self._send_json(429, {"error": {"message": "rate limit exceeded", "type": "rate_limit"}},
+                                extra_headers={"retry-after": "1"})
+            elif error_status:
+                self._send_json(error_status, {"error": {"message": "injected server error"}})
+            elif payload.get("stream"):
+                self._send_stream(_build_completion(payload, completion_tokens))
+            else:
+                self._send_json(200, _build_completion(payload, completion_tokens))
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+            else:
+                self._send_json(200, {"status": "ok", "requests_served": config.requests_served})
+
+        def _send_json(self, status_code: int, body: dict, extra_headers: dict = None):
+            data = json.dumps(body).encode()
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (extra_headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, completion: dict):
+            """Send the completion as OpenAI-style server-sent events, one word per chunk"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            content = completion["choices"][0]["message"]["content"]
+            for word in content.split(" "):
+                chunk = {"id": completion["id"], "object": "chat.completion.chunk", "model": completion["model"],
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            # Request logging would dominate benchmark output
+            pass
+
+    return FakeLLMHandler
+
+
+def start_server(config: FakeLLMConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread and return it"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Mean time to first token")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0, help="Standard deviation of latency")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=500.0, help="Generation speed")
+    parser.add_argument("--llm-completion-tokens", type=int, default=120, help="Mean completion length")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses")
+
+
+def config_from_args(args) -> FakeLLMConfig:
+    return FakeLLMConfig(
+        latency_ms=args.llm_latency_ms,
+        latency_jitter_ms=args.llm_jitter_ms,
+        tokens_per_second=args.llm_tokens_per_second,
+        completion_tokens=args.llm_completion_tokens,
+        error_rate=args.llm_error_rate,
+        rate_limit_rate=args.llm_rate_limit_rate,
+        seed=getattr(args, "seed", None)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI/Groq-compatible completion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--seed", type=int, default=None)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(config_from_args(args), args.host, args.port)
+    logger.info(f"🤖 Fake LLM server listening on http://{args.host}:{server.server_address[1]}")
+    logger.info(f"   Use GROQ_BASE_URL=http://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
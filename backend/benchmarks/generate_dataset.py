@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Synthetic Dataset Generator
+Streams schema-consistent distribution_centers, users, inventory_items, orders and order_items
+CSV (or Parquet) files at a configurable scale factor, with production-like skew
+
+Every attribute is a pure function of (seed, entity id), so chunks can be generated on
+separate cores without coordination and foreign keys still line up:
+- order_items.id == inventory_items.id for the sold unit, and order k owns ids 4k..4k+3
+- unsold stock uses a separate id range above every order item id
+- a user's gender and signup time are recomputed wherever orders reference that user, and
+  orders only reference users who had signed up by the order date
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Row counts of the original dataset at scale factor 1.0
+BASE_USERS = 100_000
+BASE_PRODUCTS = 29_120
+BASE_ORDERS = 125_000
+
+MAX_ITEMS_PER_ORDER = 4
+MAX_UNSOLD_PER_PRODUCT = 8
+# Large prime used to spread popularity ranks over ids, so popular products/users are not all low ids
+RANK_SHUFFLE_PRIME = 2_654_435_761
+
+START_TIME = np.datetime64("2019-01-01T00:00:00", "s")
+END_TIME = np.datetime64("2024-01-01T00:00:00", "s")
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86_400
+SIGNUP_SPAN_FRACTION = 0.9
+
+DISTRIBUTION_CENTERS = [
+    (1, "Memphis TN", 35.1174, -89.9711), (2, "Chicago IL", 41.8369, -87.6847),
+    (3, "Houston TX", 29.7604, -95.3698), (4, "Los Angeles CA", 34.05, -118.25),
+    (5, "New Orleans LA", 29.95, -90.0667), (6, "Port Authority of New York/New Jersey NY/NJ", 40.634, -73.7834),
+    (7, "Philadelphia PA", 39.95, -75.1667), (8, "Mobile AL", 30.6944, -88.0431),
+    (9, "Charleston SC", 32.7833, -79.9333), (10, "Savannah GA", 32.0167, -81.1167)
+]
+
+# (state, city, postal prefix, latitude, longitude, weight)
+LOCATIONS = [
+    ("California", "Los Angeles", "900", 34.05, -118.25, 14), ("Texas", "Houston", "770", 29.76, -95.37, 10),
+    ("New York", "New York", "100", 40.71, -74.01, 8), ("Florida", "Miami", "331", 25.76, -80.19, 7),
+    ("Illinois", "Chicago", "606", 41.88, -87.63, 5), ("Pennsylvania", "Philadelphia", "191", 39.95, -75.17, 4),
+    ("Ohio", "Columbus", "432", 39.96, -83.0, 4), ("Georgia", "Atlanta", "303", 33.75, -84.39, 4),
+    ("Washington", "Seattle", "981", 47.61, -122.33, 3), ("Arizona", "Phoenix", "850", 33.45, -112.07, 3),
+    ("Massachusetts", "Boston", "021", 42.36, -71.06, 3), ("Colorado", "Denver", "802", 39.74, -104.99, 2),
+    ("Tennessee", "Memphis", "381", 35.15, -90.05, 2), ("Louisiana", "New Orleans", "701", 29.95, -90.07, 1),
+]
+
+FIRST_NAMES = np.array(["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David",
+                        "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas",
+                        "Sarah", "Daniel", "Karen", "Matthew", "Nancy", "Anthony", "Lisa"], dtype=object)
+LAST_NAMES = np.array(["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+                       "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+                       "Thomas", "Taylor", "Moore", "Jackson", "Martin"], dtype=object)
+TRAFFIC_SOURCES = (["Search", "Organic", "Facebook", "Email", "Display"], [70, 15, 6, 5, 4])
+
+# (category, department, product noun)
+CATEGORIES = [
+    ("Tops & Tees", "Women", "Tee"), ("Tops & Tees", "Men", "T-Shirt"), ("Jeans", "Men", "Jeans"),
+    ("Jeans", "Women", "Skinny Jeans"), ("Fashion Hoodies & Sweatshirts", "Men", "Hoodie"),
+    ("Fashion Hoodies & Sweatshirts", "Women", "Sweatshirt"), ("Outerwear & Coats", "Men", "Jacket"),
+    ("Outerwear & Coats", "Women", "Coat"), ("Sweaters", "Women", "Cardigan"), ("Sweaters", "Men", "Sweater"),
+    ("Shorts", "Men", "Cargo Shorts"), ("Shorts", "Women", "Shorts"), ("Dresses", "Women", "Maxi Dress"),
+    ("Intimates", "Women", "Bralette"), ("Socks", "Men", "Crew Socks"), ("Accessories", "Women", "Scarf"),
+    ("Accessories", "Men", "Baseball Cap"), ("Active", "Women", "Leggings"), ("Active", "Men", "Running Shorts"),
+    ("Sleep & Lounge", "Women", "Pajama Set"), ("Swim", "Men", "Swim Trunks"), ("Suits & Sport Coats", "Men", "Blazer"),
+]
+STYLES = np.array(["Classic", "Slim Fit", "Vintage", "Essential", "Premium", "Relaxed", "Sport", "Organic",
+                   "Heritage", "Everyday", "Performance", "Lightweight"], dtype=object)
+BRANDS = np.array(["Levi's", "Calvin Klein", "Carhartt", "Columbia", "Hanes", "Nike", "Tommy Hilfiger",
+                   "Allegra K", "Champion", "Dockers", "Quiksilver", "Speedo", "Under Armour", ""], dtype=object)
+
+# Order status mix of the original dataset
+ORDER_STATUSES = (["Complete", "Shipped", "Processing", "Cancelled", "Returned"], [25, 30, 20, 15, 10])
+ITEMS_PER_ORDER = ([1, 2, 3, 4], [62, 22, 10, 6])
+
+TABLE_COLUMNS = {
+    "distribution_centers": ["id", "name", "latitude", "longitude"],
+    "users": ["id", "first_name", "last_name", "email", "age", "gender", "state", "street_address",
+              "postal_code", "city", "country", "latitude", "longitude", "traffic_source", "created_at"],
+    "inventory_items": ["id", "product_id", "created_at", "sold_at", "cost", "product_category", "product_name",
+                        "product_brand", "product_retail_price", "product_department", "product_sku",
+                        "product_distribution_center_id"],
+    "orders": ["order_id", "user_id", "status", "gender", "created_at", "returned_at", "shipped_at",
+               "delivered_at", "num_of_item"],
+    "order_items": ["id", "order_id", "user_id", "product_id", "inventory_item_id", "status", "created_at",
+                    "shipped_at", "delivered_at", "returned_at"],
+}
+
+_MASK64 = (1 << 64) - 1
+
+
+class DatasetSpec:
+    """Row counts, skew and seed shared by every worker"""
+
+    def __init__(self, scale: float, seed: int, product_skew: float, customer_skew: float):
+        self.seed = seed
+        self.users = max(1, int(BASE_USERS * scale))
+        self.products = max(1, int(BASE_PRODUCTS * scale))
+        self.orders = max(1, int(BASE_ORDERS * scale))
+        self.product_skew = product_skew
+        self.customer_skew = customer_skew
+
+    @property
+    def unsold_id_base(self) -> int:
+        return MAX_ITEMS_PER_ORDER * (self.orders + 1)
+
+
+# ---------------------------------------------------------------------------
+# Deterministic vectorized randomness
+# ---------------------------------------------------------------------------
+
+def _uniform(ids: np.ndarray, salt: int, seed: int) -> np.ndarray:
+    """SplitMix64 hash of (seed, salt, id) mapped to floats in [0, 1)"""
+    offset = np.uint64((seed * 0x9E3779B1 + salt * 0x85EBCA77) & _MASK64)
+    with np.errstate(over="ignore"):
+        x = ids.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + offset
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _choice(u: np.ndarray, options, weights=None) -> np.ndarray:
+    """Map uniforms onto options (optionally weighted) without a per-row Python loop"""
+    options = np.asarray(options, dtype=object)
+    if weights is None:
+        return options[np.minimum((u * len(options)).astype(np.int64), len(options) - 1)]
+    cdf = np.cumsum(weights, dtype=np.float64)
+    return options[np.searchsorted(cdf / cdf[-1], u, side="right").clip(0, len(options) - 1)]
+
+
+def _skewed_id(u: np.ndarray, n, skew: float, shuffle: bool = True) -> np.ndarray:
+    """Sample ids in [1, n] with a bounded power-law (Zipf-like) popularity distribution
+
+    n may be an array giving a per-row upper bound.
+    """
+    if skew <= 0:
+        rank = np.floor(u * n).astype(np.int64) + 1
+    elif abs(skew - 1.0) < 1e-9:
+        rank = np.floor(np.power(n + 1.0, u)).astype(np.int64)
+    else:
+        exponent = 1.0 - skew
+        rank = np.floor(np.power((np.power(n + 1.0, exponent) - 1.0) * u + 1.0, 1.0 / exponent)).astype(np.int64)
+    rank = np.clip(rank, 1, n)
+    if not shuffle:
+        return rank
+    # Spread popular ranks across the id space
+    return ((rank - 1) * RANK_SHUFFLE_PRIME) % n + 1
+
+
+def _seconds(u: np.ndarray, low: float, high: float) -> np.ndarray:
+    return (low + u * (high - low)).astype(np.int64).astype("timedelta64[s]")
+
+
+# ---------------------------------------------------------------------------
+# Per-entity attributes (pure functions of id)
+# ---------------------------------------------------------------------------
+
+def _user_created_at(user_ids: np.ndarray, spec: "DatasetSpec") -> np.ndarray:
+    """Signups are spread over the first 90% of the time span in id order"""
+    signup_span = (END_TIME - START_TIME).astype(np.int64) * SIGNUP_SPAN_FRACTION
+    gap = signup_span / spec.users
+    offset = (user_ids - 1) * gap + _uniform(user_ids, 1, spec.seed) * gap
+    return START_TIME + offset.astype(np.int64).astype("timedelta64[s]")
+
+
+def _user_gender(user_ids: np.ndarray, seed: int) -> np.ndarray:
+    return np.where(_uniform(user_ids, 2, seed) < 0.5, "F", "M").astype(object)
+
+
+def _product_attributes(product_ids: np.ndarray, seed: int) -> pd.DataFrame:
+    category_index = np.minimum((_uniform(product_ids, 20, seed) * len(CATEGORIES)).astype(np.int64),
+                                len(CATEGORIES) - 1)
+    categories = np.array([c[0] for c in CATEGORIES], dtype=object)[category_index]
+    departments = np.array([c[1] for c in CATEGORIES], dtype=object)[category_index]
+    nouns = np.array([c[2] for c in CATEGORIES], dtype=object)[category_index]
+    brands = _choice(_uniform(product_ids, 21, seed), BRANDS)
+    styles = _choice(_uniform(product_ids, 22, seed), STYLES)
+
+    # Log-normal retail prices centred around $40
+    z = np.sqrt(-2 * np.log(np.maximum(_uniform(product_ids, 23, seed), 1e-12))) * \
+        np.cos(2 * np.pi * _uniform(product_ids, 24, seed))
+    retail_price = np.round(np.exp(3.7 + 0.7 * z).clip(1.5, 999.0), 2)
+    cost = np.round(retail_price * (0.35 + 0.25 * _uniform(product_ids, 25, seed)), 2)
+
+    names = pd.Series(brands).str.cat([pd.Series(styles), pd.Series(nouns)], sep=" ").str.strip()
+    return pd.DataFrame({
+        "product_id": product_ids,
+        "cost": cost,
+        "product_category": categories,
+        "product_name": names.to_numpy(),
+        "product_brand": np.where(brands == "", None, brands),
+        "product_retail_price": retail_price,
+        "product_department": departments,
+        "product_distribution_center_id": 1 + np.minimum(
+            (_uniform(product_ids, 26, seed) * len(DISTRIBUTION_CENTERS)).astype(np.int64),
+            len(DISTRIBUTION_CENTERS) - 1
+        ),
+    })
+
+
+def _inventory_frame(ids: np.ndarray, product_ids: np.ndarray, created_at, sold_at, seed: int) -> pd.DataFrame:
+    frame = _product_attributes(product_ids, seed)
+    frame.insert(0, "id", ids)
+    frame["created_at"] = created_at
+    frame["sold_at"] = sold_at
+    # The model keeps product_sku unique per inventory row, so suffix the product SKU with the row id
+    frame["product_sku"] = (pd.Series(product_ids).map("{:08X}".format) + "-" + pd.Series(ids).astype(str)).to_numpy()
+    return frame[TABLE_COLUMNS["inventory_items"]]
+
+
+# ---------------------------------------------------------------------------
+# Chunk generators
+# ---------------------------------------------------------------------------
+
+def generate_users(spec: DatasetSpec, start: int, end: int) -> pd.DataFrame:
+    ids = np.arange(start, end, dtype=np.int64)
+    seed = spec.seed
+    location_index = np.searchsorted(
+        np.cumsum([loc[5] for loc in LOCATIONS]) / sum(loc[5] for loc in LOCATIONS),
+        _uniform(ids, 3, seed), side="right"
+    ).clip(0, len(LOCATIONS) - 1)
+    locations = np.array(LOCATIONS, dtype=object)[location_index]
+    id_strings = pd.Series(ids).astype(str)
+    first_names = _choice(_uniform(ids, 4, seed), FIRST_NAMES)
+    last_names = _choice(_uniform(ids, 5, seed), LAST_NAMES)
+
+    return pd.DataFrame({
+        "id": ids,
+        "first_name": first_names,
+        "last_name": last_names,
+        "email": (pd.Series(first_names).str.lower() + "." + pd.Series(last_names).str.lower() + id_strings
+                  + "@example.com").to_numpy(),
+        "age": 12 + (_uniform(ids, 6, seed) * 59).astype(np.int64),
+        "gender": _user_gender(ids, seed),
+        "state": locations[:, 0],
+        "street_address": (id_strings.str[-4:] + " " + pd.Series(_choice(_uniform(ids, 7, seed), LAST_NAMES))
+                           + " Street").to_numpy(),
+        "postal_code": (pd.Series(locations[:, 2]) + id_strings.str[-2:].str.zfill(2)).to_numpy(),
+        "city": locations[:, 1],
+        "country": "United States",
+        "latitude": np.round(locations[:, 3].astype(np.float64) + (_uniform(ids, 8, seed) - 0.5), 6),
+        "longitude": np.round(locations[:, 4].astype(np.float64) + (_uniform(ids, 9, seed) - 0.5), 6),
+        "traffic_source": _choice(_uniform(ids, 10, seed), *TRAFFIC_SOURCES),
+        "created_at": _user_created_at(ids, spec),
+    })
+
+
+def generate_orders(spec: DatasetSpec, start: int, end: int):
+    """Return (orders, order_items, sold inventory_items) frames for order ids [start, end)"""
+    order_ids = np.arange(start, end, dtype=np.int64)
+    seed = spec.seed
+    span = (END_TIME - START_TIME).astype(np.int64)
+
+    # Order volume grows over time while created_at stays roughly increasing with order_id
+    base_offset = span * np.sqrt(order_ids / (spec.orders + 1)) + \
+        (_uniform(order_ids, 31, seed) - 0.5) * 12 * SECONDS_PER_HOUR
+    base_offset = base_offset.clip(0, span)
+    created_at = START_TIME + base_offset.astype(np.int64).astype("timedelta64[s]")
+
+    # Only customers who had signed up by then can order; the longest-tenured ones order most
+    eligible = np.floor(spec.users * base_offset / (span * SIGNUP_SPAN_FRACTION)).astype(np.int64)
+    eligible = eligible.clip(1, spec.users)
+    user_ids = _skewed_id(_uniform(order_ids, 30, seed), eligible, spec.customer_skew, shuffle=False)
+    created_at = np.maximum(created_at, _user_created_at(user_ids, spec) + _seconds(_uniform(order_ids, 32, seed), 60, SECONDS_PER_HOUR))
+
+    status = _choice(_uniform(order_ids, 33, seed), *ORDER_STATUSES)
+    num_of_item = _choice(_uniform(order_ids, 34, seed), *ITEMS_PER_ORDER).astype(np.int64)
+
+    shipped_mask = np.isin(status, ["Shipped", "Complete", "Returned"])
+    delivered_mask = np.isin(status, ["Complete", "Returned"])
+    returned_mask = status == "Returned"
+    nat = np.datetime64("NaT", "s")
+    shipped_at = np.where(shipped_mask, created_at + _seconds(_uniform(order_ids, 35, seed), SECONDS_PER_HOUR, 3 * SECONDS_PER_DAY), nat)
+    delivered_at = np.where(delivered_mask, shipped_at + _seconds(_uniform(order_ids, 36, seed), SECONDS_PER_DAY, 6 * SECONDS_PER_DAY), nat)
+    returned_at = np.where(returned_mask, delivered_at + _seconds(_uniform(order_ids, 37, seed), SECONDS_PER_DAY, 14 * SECONDS_PER_DAY), nat)
+
+    orders = pd.DataFrame({
+        "order_id": order_ids,
+        "user_id": user_ids,
+        "status": status,
+        "gender": _user_gender(user_ids, seed),
+        "created_at": created_at,
+        "returned_at": returned_at,
+        "shipped_at": shipped_at,
+        "delivered_at": delivered_at,
+        "num_of_item": num_of_item,
+    })
+
+    # Expand each order into its items; order k owns item ids 4k .. 4k + num_of_item - 1
+    repeat = lambda values: np.repeat(values, num_of_item)
+    item_order_ids = repeat(order_ids)
+    slot = np.arange(len(item_order_ids)) - repeat(np.cumsum(num_of_item) - num_of_item)
+    item_ids = item_order_ids * MAX_ITEMS_PER_ORDER + slot
+    # Popular products dominate sales
+    product_ids = _skewed_id(_uniform(item_ids, 40, seed), spec.products, spec.product_skew)
+    item_created = repeat(created_at) + _seconds(_uniform(item_ids, 41, seed), 0, 120)
+    item_status = repeat(status)
+
+    order_items = pd.DataFrame({
+        "id": item_ids,
+        "order_id": item_order_ids,
+        "user_id": repeat(user_ids),
+        "product_id": product_ids,
+        "inventory_item_id": item_ids,
+        "status": item_status,
+        "created_at": item_created,
+        "shipped_at": repeat(shipped_at),
+        "delivered_at": repeat(delivered_at),
+        "returned_at": repeat(returned_at),
+    })
+
+    stocked_at = item_created - _seconds(_uniform(item_ids, 42, seed), SECONDS_PER_DAY, 120 * SECONDS_PER_DAY)
+    sold_at = np.where(item_status == "Cancelled", nat, item_created)
+    inventory = _inventory_frame(item_ids, product_ids, stocked_at, sold_at, seed)
+    return orders, order_items, inventory
+
+
+def generate_unsold_stock(spec: DatasetSpec, start: int, end: int) -> pd.DataFrame:
+    """Unsold inventory for product ids [start, end)"""
+    product_ids = np.arange(start, end, dtype=np.int64)
+    seed = spec.seed
+    counts = (_uniform(product_ids, 50, seed) * (MAX_UNSOLD_PER_PRODUCT + 1)).astype(np.int64).clip(0, MAX_UNSOLD_PER_PRODUCT)
+    item_products = np.repeat(product_ids, counts)
+    slot = np.arange(len(item_products)) - np.repeat(np.cumsum(counts) - counts, counts)
+    ids = spec.unsold_id_base + item_products * MAX_UNSOLD_PER_PRODUCT + slot
+    span = (END_TIME - START_TIME).astype(np.int64)
+    created_at = START_TIME + _seconds(_uniform(ids, 51, seed), span * 0.5, span)
+    return _inventory_frame(ids, item_products, created_at, np.full(len(ids), np.datetime64("NaT", "s")), seed)
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+def _write_part(frame: pd.DataFrame, table: str, part_dir: str, index: int, file_format: str):
+    frame = frame[TABLE_COLUMNS[table]]
+    table_dir = os.path.join(part_dir, table)
+    os.makedirs(table_dir, exist_ok=True)
+    path = os.path.join(table_dir, f"part-{index:06d}.{file_format}")
+    if file_format == "parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False, header=False)
+
+
+def _run_task(task):
+    """Worker entry point: generate one chunk and write its part files"""
+    kind, spec, start, end, index, part_dir, file_format = task
+    if kind == "users":
+        _write_part(generate_users(spec, start, end), "users", part_dir, index, file_format)
+        return end - start
+    if kind == "orders":
+        orders, order_items, inventory = generate_orders(spec, start, end)
+        _write_part(orders, "orders", part_dir, index, file_format)
+        _write_part(order_items, "order_items", part_dir, index, file_format)
+        _write_part(inventory, "inventory_items", part_dir, index, file_format)
+        return end - start
+    stock = generate_unsold_stock(spec, start, end)
+    # Unsold stock parts sort after the sold-unit parts of the same table
+    _write_part(stock, "inventory_items", part_dir, 500_000 + index, file_format)
+    return end - start
+
+
+def _chunk_tasks(kind: str, spec: DatasetSpec, total: int, chunk_size: int, part_dir: str, file_format: str):
+    return [
+        (kind, spec, start, min(start + chunk_size, total + 1), index, part_dir, file_format)
+        for index, start in enumerate(range(1, total + 1, chunk_size))
+    ]
+
+
+def _merge_parts(table: str, part_dir: str, output_dir: str, file_format: str):
+    """Concatenate part files into <table>.csv (streamed) or a <table>/ Parquet dataset directory"""
+    table_dir = os.path.join(part_dir, table)
+    parts = sorted(os.listdir(table_dir)) if os.path.isdir(table_dir) else []
+    if file_format == "parquet":
+        destination = os.path.join(output_dir, table)
+        shutil.rmtree(destination, ignore_errors=True)
+        shutil.move(table_dir, destination)
+        return destination
+
+    destination = os.path.join(output_dir, f"{table}.csv")
+    with open(destination, "w", newline="") as out:
+        out.write(",".join(TABLE_COLUMNS[table]) + "\n")
+        for part in parts:
+            with open(os.path.join(table_dir, part)) as src:
+                shutil.copyfileobj(src, out, length=1 << 20)
+    return destination
+
+
+def generate_dataset(output_dir: str, scale: float = 1.0, seed: int = 42, chunk_size: int = 50_000,
+                     processes: int = None, file_format: str = "csv", product_skew: float = 1.1,
+                     customer_skew: float = 0.5):
+    """Generate all five tables into output_dir"""
+    if file_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet output requires pyarrow (pip install pyarrow)")
+
+    spec = DatasetSpec(scale, seed, product_skew, customer_skew)
+    os.makedirs(output_dir, exist_ok=True)
+    part_dir = tempfile.mkdtemp(prefix="parts-", dir=output_dir)
+    started = time.time()
+    logger.info(f"🏭 Generating scale {scale}: {spec.users:,} users, {spec.products:,} products, "
+                f"{spec.orders:,} orders (seed {seed}, {processes or os.cpu_count()} processes)")
+
+    try:
+        dcs = pd.DataFrame(DISTRIBUTION_CENTERS, columns=TABLE_COLUMNS["distribution_centers"])
+        _write_part(dcs, "distribution_centers", part_dir, 0, file_format)
+
+        tasks = (_chunk_tasks("users", spec, spec.users, chunk_size, part_dir, file_format)
+                 + _chunk_tasks("orders", spec, spec.orders, chunk_size, part_dir, file_format)
+                 + _chunk_tasks("stock", spec, spec.products, chunk_size, part_dir, file_format))
+        done = 0
+        with Pool(processes=processes) as pool:
+            # imap_unordered keeps at most a few chunks in flight per worker
+            for rows in pool.imap_unordered(_run_task, tasks):
+                done += 1
+                if done % 20 == 0 or done == len(tasks):
+                    logger.info(f"   {done}/{len(tasks)} chunks written")
+
+        outputs = [_merge_parts(table, part_dir, output_dir, file_format) for table in TABLE_COLUMNS]
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    logger.info(f"✅ Dataset written to {output_dir} in {time.time() - started:.1f}s")
+    for path in outputs:
+        logger.info(f"   - {path}")
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic e-commerce dataset")
+    parser.add_argument("--output-dir", default=os.path.join("..", "dataset", "synthetic"))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiple of the original dataset volume")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per chunk (bounds memory)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--product-skew", type=float, default=1.1, help="Zipf exponent of product popularity")
+    parser.add_argument("--customer-skew", type=float, default=0.5, help="Zipf exponent of orders per customer")
+    args = parser.parse_args()
+
+    try:
+        generate_dataset(args.output_dir, args.scale, args.seed, args.chunk_size, args.processes,
+                         args.format, args.product_skew, args.customer_skew)
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
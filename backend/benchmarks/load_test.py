@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Offline Chat Load Test
+Starts the API against a local seeded database and a fake LLM server, drives mixed-intent
+/api/chat traffic and reports throughput, latency percentiles and per-stage breakdowns
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from benchmarks import fake_llm_server
+from benchmarks.seed_local_db import seed_database, DEFAULT_DATABASE_URL
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative weights of each intent in the generated traffic
+DEFAULT_MIX = {"order_status": 40, "stock": 25, "top_products": 15, "general": 20}
+
+GENERAL_MESSAGES = [
+    "hello there",
+    "what is your return policy",
+    "can you help me with sizing",
+    "do you ship internationally",
+    "i need help with a refund"
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2)
+    }
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Parse a Server-Timing header into {stage: milliseconds}"""
+    stages = {}
+    for entry in (header or "").split(","):
+        parts = [part.strip() for part in entry.split(";")]
+        if not parts[0]:
+            continue
+        for part in parts[1:]:
+            if part.startswith("dur="):
+                stages[parts[0]] = float(part[4:])
+    return stages
+
+
+class TrafficGenerator:
+    """Produces realistic chat messages from identifiers present in the seeded database"""
+
+    def __init__(self, database_url: str, mix: Dict[str, int], seed: int):
+        from sqlalchemy import create_engine, text
+        engine = create_engine(database_url)
+        with engine.connect() as conn:
+            self.order_ids = [row[0] for row in conn.execute(text("SELECT order_id FROM orders LIMIT 5000"))]
+            self.product_names = [
+                row[0] for row in conn.execute(text("SELECT DISTINCT product_name FROM inventory_items LIMIT 1000"))
+            ]
+        engine.dispose()
+        self.mix = mix
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def next_message(self):
+        """Return (intent, message, user_id)"""
+        with self.lock:
+            intent = self.random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+            user_id = f"load-user-{self.random.randint(1, 200)}"
+            if intent == "order_status" and self.order_ids:
+                order_id = self.random.choice(self.order_ids)
+                template = self.random.choice(["order status for order {}", "where is my order {}", "track order {}"])
+                return intent, template.format(order_id), user_id
+            if intent == "stock" and self.product_names:
+                name = self.random.choice(self.product_names).lower()
+                return intent, f"how many {name} in stock", user_id
+            if intent == "top_products":
+                return intent, f"top {self.random.randint(3, 10)} most sold products", user_id
+            return "general", self.random.choice(GENERAL_MESSAGES), user_id
+
+
+def send_chat(base_url: str, message: str, user_id: str, conversation_id: Optional[str], timeout: float):
+    body = json.dumps({"message": message, "user_id": user_id, "conversation_id": conversation_id}).encode()
+    request = urllib.request.Request(
+        f"{base_url}/api/chat", data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        payload = json.loads(response.read())
+        return payload, response.headers.get("Server-Timing")
+
+
+def run_load(base_url: str, generator: TrafficGenerator, concurrency: int, total_requests: int,
+             duration: float, timeout: float) -> Dict[str, Any]:
+    """Drive traffic from `concurrency` workers and collect per-request measurements"""
+    results = []
+    results_lock = threading.Lock()
+    sessions: Dict[str, str] = {}
+    deadline = time.perf_counter() + duration if duration else None
+    remaining = [total_requests]
+
+    def take_ticket() -> bool:
+        with results_lock:
+            if deadline is not None:
+                return time.perf_counter() < deadline
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker():
+        while take_ticket():
+            intent, message, user_id = generator.next_message()
+            start = time.perf_counter()
+            record = {"intent": intent, "ok": False, "stages": {}}
+            try:
+                payload, timing = send_chat(base_url, message, user_id, sessions.get(user_id), timeout)
+                sessions[user_id] = payload["conversation_id"]
+                record["ok"] = True
+                record["stages"] = parse_server_timing(timing)
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                record["error"] = str(e)
+            record["latency_ms"] = (time.perf_counter() - start) * 1000
+            with results_lock:
+                results.append(record)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    return build_report(results, elapsed, concurrency)
+
+
+def build_report(results: List[Dict[str, Any]], elapsed: float, concurrency: int) -> Dict[str, Any]:
+    successes = [r for r in results if r["ok"]]
+    by_intent: Dict[str, List[float]] = {}
+    by_stage: Dict[str, List[float]] = {}
+    for record in successes:
+        by_intent.setdefault(record["intent"], []).append(record["latency_ms"])
+        for stage, duration in record["stages"].items():
+            by_stage.setdefault(stage, []).append(duration)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(successes),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(successes) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize([r["latency_ms"] for r in successes]),
+        "latency_by_intent_ms": {intent: summarize(values) for intent, values in sorted(by_intent.items())},
+        "stages_ms": {stage: summarize(values) for stage, values in sorted(by_stage.items())}
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    def delta(current: float, previous: Optional[float]) -> str:
+        if previous in (None, 0):
+            return ""
+        return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+    base_latency = (baseline or {}).get("latency_ms", {})
+    print("\n📊 Load test results")
+    print(f"   Requests: {report['requests']} ({report['errors']} errors) at concurrency {report['concurrency']}")
+    print(f"   Throughput: {report['throughput_rps']} req/s"
+          f"{delta(report['throughput_rps'], (baseline or {}).get('throughput_rps'))}")
+    for key in ("p50", "p95", "p99"):
+        print(f"   Latency {key}: {report['latency_ms'][key]} ms{delta(report['latency_ms'][key], base_latency.get(key))}")
+
+    print("\n   By intent (p50 / p95 / p99 ms):")
+    for intent, stats in report["latency_by_intent_ms"].items():
+        print(f"   - {intent}: {stats['p50']} / {stats['p95']} / {stats['p99']} (n={stats['count']})")
+
+    print("\n   By stage (mean / p95 ms):")
+    base_stages = (baseline or {}).get("stages_ms", {})
+    for stage, stats in report["stages_ms"].items():
+        previous = base_stages.get(stage, {}).get("p95")
+        print(f"   - {stage}: {stats['mean']} / {stats['p95']}{delta(stats['p95'], previous)}")
+
+
+def start_api(database_url: str, llm_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url,
+        "GROQ_API_KEY": env.get("GROQ_API_KEY", "benchmark-key"),
+        "GROQ_BASE_URL": llm_url,
+        # Workers size their DB pools and pick the shared cache tier from this
+        "WEB_CONCURRENCY": str(workers),
+        # Measure serving capacity rather than the provider quota and per-user limits
+        "LLM_RPM_LIMIT": env.get("LLM_RPM_LIMIT", "0"),
+        "LLM_TPM_LIMIT": env.get("LLM_TPM_LIMIT", "0"),
+        "USER_RATE_LIMIT_PER_MIN": env.get("USER_RATE_LIMIT_PER_MIN", "0"),
+        "ENVIRONMENT": "development"
+    })
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--workers", str(workers)]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+def wait_for_api(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API process exited during startup")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError("API did not become healthy in time")
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Parse 'order_status=40,stock=25,...' into a weight mapping"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown intent '{name}'")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline /api/chat load test")
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--api-url", default=None, help="Use an already running API instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=0, help="Run for N seconds instead of a request count")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client timeout per request")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Intent weights, e.g. order_status=40,stock=25,top_products=15,general=20")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="Use the database as-is")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--save-baseline", help="Write the JSON report as a baseline for later comparison")
+    parser.add_argument("--baseline", help="Compare against a previously saved baseline report")
+    fake_llm_server.add_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        seed_database(args.database_url, users=2000, products=300, orders=5000, seed=args.seed, reset=False)
+
+    llm_server = None
+    api_process = None
+    try:
+        base_url = args.api_url
+        if not base_url:
+            llm_server = fake_llm_server.start_server(fake_llm_server.config_from_args(args))
+            llm_url = f"http://127.0.0.1:{llm_server.server_address[1]}"
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            logger.info(f"🚀 Starting API on {base_url} (fake LLM at {llm_url})")
+            api_process = start_api(args.database_url, llm_url, port, args.workers)
+            wait_for_api(base_url, api_process)
+
+        generator = TrafficGenerator(args.database_url, args.mix, args.seed)
+        logger.info(f"🔥 Driving traffic at concurrency {args.concurrency}...")
+        report = run_load(base_url, generator, args.concurrency, args.requests, args.duration, args.timeout)
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait(timeout=10)
+        if llm_server is not None:
+            llm_server.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"💾 Report written to {path}")
+
+    return report["errors"] == 0
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
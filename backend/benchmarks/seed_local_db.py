@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Local Benchmark Database Seeding Script
+Creates the schema in a local database (SQLite or Postgres) and fills it with seeded sample data
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URL = "sqlite:///./benchmark.db"
+
+PRODUCT_TYPES = ["T-Shirt", "Jeans", "Hoodie", "Jacket", "Sweater", "Shorts", "Dress", "Socks", "Cap", "Sneakers"]
+PRODUCT_STYLES = ["Classic", "Slim Fit", "Vintage", "Essential", "Premium", "Relaxed", "Sport", "Organic"]
+CATEGORIES = {
+    "T-Shirt": "Tops & Tees", "Jeans": "Jeans", "Hoodie": "Fashion Hoodies & Sweatshirts",
+    "Jacket": "Outerwear & Coats", "Sweater": "Sweaters", "Shorts": "Shorts", "Dress": "Dresses",
+    "Socks": "Socks", "Cap": "Accessories", "Sneakers": "Accessories"
+}
+BRANDS = ["Levi's", "Calvin Klein", "Carhartt", "Columbia", "Hanes", "Nike", "Tommy Hilfiger", None]
+ORDER_STATUSES = ["Complete", "Shipped", "Processing", "Cancelled", "Returned"]
+STATES = ["California", "Texas", "New York", "Florida", "Illinois", "Washington", "Ohio", "Georgia"]
+DISTRIBUTION_CENTERS = [
+    ("Memphis TN", 35.1174, -89.9711), ("Chicago IL", 41.8369, -87.6847),
+    ("Houston TX", 29.7604, -95.3698), ("Los Angeles CA", 34.05, -118.25),
+    ("New Orleans LA", 29.95, -90.0667), ("Port Authority of New York/New Jersey NY/NJ", 40.634, -73.7834),
+    ("Philadelphia PA", 39.95, -75.1667), ("Mobile AL", 30.6944, -88.0431),
+    ("Charleston SC", 32.7833, -79.9333), ("Savannah GA", 32.0167, -81.1167)
+]
+
+
+def enable_wal(engine):
+    """SQLite only: WAL lets several API workers read while one writes"""
+    if engine.dialect.name == "sqlite":
+        from sqlalchemy import text
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+
+
+def seed_database(database_url: str, users: int, products: int, orders: int, seed: int, reset: bool):
+    """Create tables and insert a deterministic sample dataset"""
+    # database.py reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = database_url
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models import Base, DistributionCenter, User, InventoryItem, Order, OrderItem
+
+    engine = create_engine(database_url)
+    enable_wal(engine)
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    if db.query(Order).first() is not None:
+        logger.info("ℹ️  Database already seeded, use --reset to recreate it")
+        db.close()
+        return
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    db.bulk_insert_mappings(DistributionCenter, [
+        {"id": i, "name": name, "latitude": lat, "longitude": lon}
+        for i, (name, lat, lon) in enumerate(DISTRIBUTION_CENTERS, 1)
+    ])
+
+    db.bulk_insert_mappings(User, [
+        {
+            "id": i,
+            "first_name": f"User{i}",
+            "last_name": rng.choice(["Smith", "Johnson", "Lee", "Garcia", "Brown", "Davis"]),
+            "email": f"user{i}@example.com",
+            "age": rng.randint(18, 70),
+            "gender": rng.choice(["M", "F"]),
+            "state": rng.choice(STATES),
+            "country": "United States",
+            "latitude": rng.uniform(25.0, 48.0),
+            "longitude": rng.uniform(-123.0, -70.0),
+            "traffic_source": rng.choice(["Search", "Organic", "Email", "Facebook", "Display"]),
+            "created_at": now - timedelta(days=rng.randint(30, 1500))
+        }
+        for i in range(1, users + 1)
+    ])
+
+    catalog = []
+    for product_id in range(1, products + 1):
+        product_type = rng.choice(PRODUCT_TYPES)
+        retail_price = round(rng.uniform(8, 150), 2)
+        catalog.append({
+            "product_id": product_id,
+            "product_name": f"{rng.choice(PRODUCT_STYLES)} {product_type} {product_id}",
+            "product_category": CATEGORIES[product_type],
+            "product_brand": rng.choice(BRANDS),
+            "product_retail_price": retail_price,
+            "cost": round(retail_price * rng.uniform(0.35, 0.6), 2),
+            "product_department": rng.choice(["Men", "Women"]),
+            "product_distribution_center_id": rng.randint(1, len(DISTRIBUTION_CENTERS))
+        })
+
+    inventory_rows, order_rows, order_item_rows = [], [], []
+    inventory_id = 0
+    order_item_id = 0
+    for order_id in range(1, orders + 1):
+        user_id = rng.randint(1, users)
+        status = rng.choices(ORDER_STATUSES, weights=[45, 25, 15, 10, 5])[0]
+        created_at = now - timedelta(days=rng.uniform(0, 365))
+        shipped_at = created_at + timedelta(hours=rng.uniform(6, 72)) if status in ("Complete", "Shipped", "Returned") else None
+        delivered_at = shipped_at + timedelta(days=rng.uniform(1, 6)) if status in ("Complete", "Returned") else None
+        returned_at = delivered_at + timedelta(days=rng.uniform(1, 14)) if status == "Returned" else None
+        num_of_item = rng.randint(1, 4)
+
+        order_rows.append({
+            "order_id": order_id, "user_id": user_id, "status": status, "gender": rng.choice(["M", "F"]),
+            "created_at": created_at, "shipped_at": shipped_at, "delivered_at": delivered_at,
+            "returned_at": returned_at, "num_of_item": num_of_item
+        })
+        for _ in range(num_of_item):
+            # Popular products get most of the sales
+            product = catalog[min(int(rng.paretovariate(1.2)) - 1, len(catalog) - 1)]
+            inventory_id += 1
+            order_item_id += 1
+            inventory_rows.append({
+                "id": inventory_id, "created_at": created_at - timedelta(days=rng.uniform(1, 90)),
+                "sold_at": created_at if status != "Cancelled" else None,
+                "product_sku": f"SKU-{inventory_id:08d}", **product
+            })
+            order_item_rows.append({
+                "id": order_item_id, "order_id": order_id, "user_id": user_id,
+                "product_id": product["product_id"], "inventory_item_id": inventory_id, "status": status,
+                "created_at": created_at, "shipped_at": shipped_at, "delivered_at": delivered_at,
+                "returned_at": returned_at
+            })
+
+    # Unsold stock so availability queries have something to count
+    for product in catalog:
+        for _ in range(rng.randint(0, 6)):
+            inventory_id += 1
+            inventory_rows.append({
+                "id": inventory_id, "created_at": now - timedelta(days=rng.uniform(1, 90)), "sold_at": None,
+                "product_sku": f"SKU-{inventory_id:08d}", **product
+            })
+
+    db.bulk_insert_mappings(InventoryItem, inventory_rows)
+    db.bulk_insert_mappings(Order, order_rows)
+    db.bulk_insert_mappings(OrderItem, order_item_rows)
+    db.commit()
+    db.close()
+
+    logger.info(f"✅ Seeded {users} users, {products} products, {orders} orders, "
+                f"{len(order_item_rows)} order items and {inventory_id} inventory items")
+
+
+# Load order that respects foreign key constraints, with the timestamp columns of each table
+CSV_TABLES = [
+    ("distribution_centers", []),
+    ("users", ["created_at"]),
+    ("inventory_items", ["created_at", "sold_at"]),
+    ("orders", ["created_at", "returned_at", "shipped_at", "delivered_at"]),
+    ("order_items", ["created_at", "shipped_at", "delivered_at", "returned_at"]),
+]
+
+
+def load_csv_dir(database_url: str, csv_dir: str, reset: bool, chunk_size: int = 50_000):
+    """Bulk load CSVs in the dataset schema (e.g. from generate_dataset.py) in bounded-memory chunks"""
+    os.environ["DATABASE_URL"] = database_url
+    import pandas as pd
+    from sqlalchemy import create_engine
+    from models import Base
+
+    engine = create_engine(database_url)
+    enable_wal(engine)
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    for table, date_columns in CSV_TABLES:
+        csv_path = os.path.join(csv_dir, f"{table}.csv")
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"CSV file not found: {csv_path}")
+        total = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size, parse_dates=date_columns):
+            chunk.to_sql(table, engine, if_exists="append", index=False, chunksize=5000)
+            total += len(chunk)
+        logger.info(f"✅ Loaded {total:,} rows into {table}")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a local database for benchmarks")
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    parser.add_argument("--csv-dir", help="Load CSVs from this directory (e.g. generate_dataset.py output) instead")
+    args = parser.parse_args()
+
+    if args.csv_dir:
+        try:
+            load_csv_dir(args.database_url, args.csv_dir, args.reset)
+        except FileNotFoundError as e:
+            logger.error(f"❌ {e}")
+            return False
+        return True
+
+    seed_database(args.database_url, args.users, args.products, args.orders, args.seed, args.reset)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
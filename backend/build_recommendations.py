@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Recommendations Build Job
+Builds the "customers also bought" index from order_items: product co-occurrence counts,
+normalised by lift (or cosine), top-k neighbours per product, written as memory-mappable
+arrays to RECOMMENDATIONS_PATH. Running API workers pick up a new build within
+RECOMMENDATIONS_RELOAD_SECONDS.
+
+Run after loading data and then periodically (e.g. a nightly cron job):
+    python build_recommendations.py --metric lift --top-k 20
+"""
+
+import sys
+import time
+import logging
+import argparse
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+def parse_args():
+    from services.recommendations import (
+        RECOMMENDATIONS_PATH, RECOMMENDATIONS_TOP_K, RECOMMENDATIONS_MIN_SUPPORT, METRICS
+    )
+
+    parser = argparse.ArgumentParser(description="Build product co-occurrence recommendations")
+    parser.add_argument("--metric", choices=METRICS, default="lift", help="Score normalisation")
+    parser.add_argument("--top-k", type=int, default=RECOMMENDATIONS_TOP_K, help="Neighbours kept per product")
+    parser.add_argument("--min-support", type=int, default=RECOMMENDATIONS_MIN_SUPPORT,
+                        help="Minimum orders a pair must share")
+    parser.add_argument("--output", default=RECOMMENDATIONS_PATH, help="Index directory")
+    return parser.parse_args()
+
+def load_baskets(db):
+    """(order_id, product_id) pairs and product names, read through a server-side cursor"""
+    import pandas as pd
+    from sqlalchemy import func
+    from models import OrderItem, InventoryItem
+    from services.pagination import stream_rows
+
+    pairs = pd.DataFrame.from_records(
+        stream_rows(db.query(OrderItem.order_id, OrderItem.product_id)),
+        columns=["order_id", "product_id"]
+    )
+    names = dict(
+        db.query(InventoryItem.product_id, func.min(InventoryItem.product_name)).group_by(InventoryItem.product_id)
+    )
+    return pairs, names
+
+def main():
+    """Main build function"""
+    args = parse_args()
+    from database import AnalyticsSessionLocal, get_analytics_engine
+    from services.recommendations import build_cooccurrence, save_index
+
+    logger.info(f"🚀 Building recommendations ({args.metric}, top {args.top_k}, min support {args.min_support})...")
+    started = time.perf_counter()
+    db = AnalyticsSessionLocal(bind=get_analytics_engine())
+    try:
+        pairs, names = load_baskets(db)
+    except Exception as e:
+        logger.error(f"❌ Failed to read order items: {e}")
+        return False
+    finally:
+        db.close()
+    logger.info(f"   {len(pairs)} order items in {pairs['order_id'].nunique()} orders")
+
+    neighbors = build_cooccurrence(pairs, args.metric, args.top_k, args.min_support)
+    if neighbors.empty:
+        logger.error("❌ No product pairs reach the minimum support; nothing written")
+        return False
+
+    save_index(neighbors, names, args.output, args.metric, int(pairs["order_id"].nunique()))
+    logger.info(f"✅ {neighbors['product_id'].nunique()} products, {len(neighbors)} neighbour pairs "
+                f"written to {args.output} in {time.perf_counter() - started:.1f}s")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -1,8 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
 import os
+import time
 import logging
 from dotenv import load_dotenv
 
@@ -19,19 +20,98 @@ if not DATABASE_URL:
     logger.error("   Please set DATABASE_URL in your .env file")
     raise ValueError("DATABASE_URL environment variable is required")
 
-# Configure engine with connection pooling for production
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=10,  # Number of connections to maintain
-    max_overflow=20,  # Additional connections that can be created
-    pool_pre_ping=True,  # Validate connections before use
-    pool_recycle=3600,  # Recycle connections after 1 hour
-    echo=False  # Set to True for SQL debugging
-)
+# Every uvicorn worker has its own pools, so the primary's connection budget (e.g. Supabase's
+# limit) is split between workers instead of each one taking pool_size + max_overflow
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "30"))
+
+# Analytics reads use their own, smaller pool (optionally on a read replica) so heavy scans
+# cannot take the connections chat persistence needs
+ANALYTICS_DATABASE_URL = os.getenv("ANALYTICS_DATABASE_URL") or None
+ANALYTICS_MAX_CONNECTIONS = int(os.getenv("ANALYTICS_MAX_CONNECTIONS", "10"))
+# The analytics pool on the primary (all analytics without a replica, the fallback while the
+# replica is down) is part of DB_MAX_CONNECTIONS; chat gets the rest
+ANALYTICS_PRIMARY_CONNECTIONS = int(os.getenv(
+    "ANALYTICS_PRIMARY_CONNECTIONS", min(ANALYTICS_MAX_CONNECTIONS, DB_MAX_CONNECTIONS // 3)
+))
+ANALYTICS_POOL_TIMEOUT = float(os.getenv("ANALYTICS_POOL_TIMEOUT", "10"))
+# After the replica fails, analytics use the primary for this many seconds before retrying it
+ANALYTICS_REPLICA_RETRY_SECONDS = float(os.getenv("ANALYTICS_REPLICA_RETRY_SECONDS", "30"))
+
+_workers = max(1, WEB_CONCURRENCY)
+_connections_per_worker = max(2, (DB_MAX_CONNECTIONS - ANALYTICS_PRIMARY_CONNECTIONS) // _workers)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", max(1, _connections_per_worker // 3)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", _connections_per_worker - DB_POOL_SIZE))
+_analytics_primary_per_worker = max(2, ANALYTICS_PRIMARY_CONNECTIONS // _workers)
+_analytics_replica_per_worker = max(2, ANALYTICS_MAX_CONNECTIONS // _workers)
+
+# Per-worker minimums and explicit pool sizes can still add up to more than the budget
+_primary_connections = _workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW + _analytics_primary_per_worker)
+if _primary_connections > DB_MAX_CONNECTIONS:
+    logger.warning(
+        f"⚠️  {WEB_CONCURRENCY} workers can open {_primary_connections} connections to the primary "
+        f"(chat {DB_POOL_SIZE + DB_MAX_OVERFLOW} + analytics {_analytics_primary_per_worker} each), "
+        f"more than DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS}"
+    )
+
+# Statement timeouts (milliseconds, 0 = none). Chat traffic fails fast; analytics scans get
+# longer but cannot run unbounded
+OLTP_STATEMENT_TIMEOUT_MS = int(os.getenv("OLTP_STATEMENT_TIMEOUT_MS", "5000"))
+ANALYTICS_STATEMENT_TIMEOUT_MS = int(os.getenv("ANALYTICS_STATEMENT_TIMEOUT_MS", "30000"))
+
+def create_db_engine(url: str, pool_size: int, max_overflow: int, statement_timeout_ms: int = 0,
+                     pool_timeout: float = 30):
+    """Create an engine with its own connection pool and (on Postgres) statement_timeout"""
+    connect_args = {}
+    if statement_timeout_ms and url.startswith("postgres"):
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    return create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=pool_size,  # Number of connections to maintain
+        max_overflow=max_overflow,  # Additional connections that can be created
+        pool_timeout=pool_timeout,
+        pool_pre_ping=True,  # Validate connections before use
+        pool_recycle=3600,  # Recycle connections after 1 hour
+        connect_args=connect_args,
+        echo=False  # Set to True for SQL debugging
+    )
+
+# Configure engine with connection pooling for production (chat and other OLTP traffic)
+engine = create_db_engine(DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, OLTP_STATEMENT_TIMEOUT_MS)
+
+def _analytics_engine(url: str, connections: int):
+    pool_size = max(1, connections // 2)
+    return create_db_engine(url, pool_size, connections - pool_size, ANALYTICS_STATEMENT_TIMEOUT_MS, ANALYTICS_POOL_TIMEOUT)
+
+analytics_primary_engine = _analytics_engine(DATABASE_URL, _analytics_primary_per_worker)
+analytics_replica_engine = _analytics_engine(
+    ANALYTICS_DATABASE_URL, _analytics_replica_per_worker
+) if ANALYTICS_DATABASE_URL else None
+
+_replica_down_until = 0.0
+
+def _mark_replica_down(reason):
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + ANALYTICS_REPLICA_RETRY_SECONDS
+    logger.warning(f"⚠️  Analytics replica unavailable, using primary for {ANALYTICS_REPLICA_RETRY_SECONDS:.0f}s: {reason}")
+
+if analytics_replica_engine is not None:
+    @event.listens_for(analytics_replica_engine, "handle_error")
+    def _on_replica_error(context):
+        # Lost or refused connections move analytics to the primary; query errors do not
+        if context.is_disconnect or context.connection is None:
+            _mark_replica_down(context.original_exception)
+
+def get_analytics_engine():
+    """The read replica when configured and healthy, otherwise the primary's analytics pool"""
+    if analytics_replica_engine is not None and time.monotonic() >= _replica_down_until:
+        return analytics_replica_engine
+    return analytics_primary_engine
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AnalyticsSessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 # Base class for models
 Base = declarative_base()
@@ -48,11 +128,45 @@ def get_db():
     finally:
         db.close()
 
+def get_analytics_db():
+    """Dependency to get a session for heavy read-only queries (replica or analytics pool)"""
+    db = AnalyticsSessionLocal(bind=get_analytics_engine())
+    if db.get_bind() is analytics_replica_engine:
+        # Connect up front so an unreachable replica falls back to the primary for this request too
+        try:
+            db.connection()
+        except Exception:
+            db.close()
+            db = AnalyticsSessionLocal(bind=analytics_primary_engine)
+    try:
+        yield db
+    except Exception as e:
+        logger.error(f"Analytics session error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def check_analytics_replica():
+    """Probe the read replica at startup so a bad ANALYTICS_DATABASE_URL falls back immediately"""
+    if analytics_replica_engine is None:
+        return True
+    try:
+        with analytics_replica_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✅ Analytics replica connection successful")
+        return True
+    except Exception as e:
+        # The handle_error listener has usually marked it already
+        if time.monotonic() >= _replica_down_until:
+            _mark_replica_down(e)
+        return False
+
 def test_database_connection():
     """Test database connection and return status"""
     try:
         with engine.connect() as conn:
-            conn.execute("SELECT 1")
+            conn.execute(text("SELECT 1"))
         logger.info("✅ Database connection successful")
         return True
     except Exception as e:
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Delivery ETA Model Fitting
+Fits per-distribution-center and per-state lead-time percentiles from the order history and
+writes them to ETA_MODEL_PATH. Running API workers load the new file within ETA_RELOAD_SECONDS
+of it being written, without a restart.
+
+Run after loading data and then periodically (e.g. a nightly cron job):
+    python fit_eta_model.py --lookback-days 365
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+def parse_args():
+    from services.eta_model import ETA_MODEL_PATH, ETA_LOOKBACK_DAYS
+
+    parser = argparse.ArgumentParser(description="Fit the delivery ETA model from order history")
+    parser.add_argument("--lookback-days", type=int, default=ETA_LOOKBACK_DAYS,
+                        help="Fit on items ordered within this many days")
+    parser.add_argument("--output", default=ETA_MODEL_PATH, help="Model file to write")
+    return parser.parse_args()
+
+def main():
+    """Main fitting function"""
+    args = parse_args()
+    from database import AnalyticsSessionLocal, get_analytics_engine
+    from services.eta_model import EtaModel
+
+    logger.info(f"🚀 Fitting ETA model on the last {args.lookback_days} days of orders...")
+    started = time.perf_counter()
+    db = AnalyticsSessionLocal(bind=get_analytics_engine())
+    try:
+        model = EtaModel.fit_from_db(db, args.lookback_days)
+    except Exception as e:
+        logger.error(f"❌ Failed to fit ETA model: {e}")
+        return False
+    finally:
+        db.close()
+
+    if not model.stages["total"].get("global"):
+        logger.error("❌ Not enough delivered orders to fit a model")
+        return False
+
+    model.save(args.output)
+    groups = sum(len(groups) for stage in model.stages.values() for groups in stage.values())
+    logger.info(f"✅ Fitted {groups} lead-time groups from {model.samples} shipped items "
+                f"in {time.perf_counter() - started:.1f}s")
+    logger.info(f"   Written to {args.output} ({os.path.getsize(args.output)} bytes)")
+    low, median, high = model.stages["total"]["global"][""][:3]
+    logger.info(f"   Order to delivery: P10 {low / 24:.1f}, P50 {median / 24:.1f}, P90 {high / 24:.1f} days")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -1,18 +1,46 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, status, Request, Response, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Callable, Iterator, List, Optional
 import os
+import json
+import asyncio
+import time
 import logging
 
-from database import get_db, engine, test_database_connection
+from database import (
+    get_db, get_analytics_db, engine, analytics_primary_engine, analytics_replica_engine,
+    test_database_connection, check_analytics_replica, AnalyticsSessionLocal, get_analytics_engine
+)
 from models import Base
 from schemas import (
-    ChatRequest, ChatResponse, ConversationSession as ConversationSessionSchema,
-    ConversationMessage as ConversationMessageSchema, MessageType
+    ChatRequest, ChatResponse, BatchChatRequest, ConversationSession as ConversationSessionSchema,
+    ConversationMessage as ConversationMessageSchema, MessageType, DistributionCenterResponse,
+    NearestDistributionCenterResponse, OrderEtaResponse, ProductRecommendationResponse, TrendingProductResponse,
+    TopProductResponse
 )
 from services.conversation_service import ConversationService
 from services.enhanced_chat_service import EnhancedChatService
+from services.batch_chat_service import BatchChatService, BATCH_CHAT_MAX_MESSAGES
+from services.chat_connection import ChatConnection, WS_MAX_PIPELINED_MESSAGES
+from services.conversation_memory import ConversationMemory, update_conversation_summary
+from services.llm_policy import Deadline
+from services.rate_limiter import user_rate_limiter
+from services.admission import chat_admission, chat_priority, AdmissionRejected
+from services.cache import cache
+from services.entity_cache import entity_cache
+from services.ecommerce_service import (
+    EcommerceService, ORDERS_BY_DATE_KEYSET, ORDERS_KEYSET, INVENTORY_KEYSET, STOCK_LEVELS_KEYSET
+)
+from services.pagination import Keyset, InvalidCursor, page_size
+from services.serialization import FastJSONResponse, ndjson_lines, schema_rows
+from services.eta_model import load_eta_model, ETA_MODEL_PATH
+from services.recommendations import RECOMMENDATIONS_TOP_K
+from services.trending import trending, TRENDING_SNAPSHOT_PATH
+from services.gazetteer import catalog_gazetteer, get_catalog_gazetteer
+from services.query_instrumentation import instrument_engine, start_request, finish_request, query_metrics
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -22,6 +50,20 @@ if not test_database_connection():
     logger.error("❌ Failed to connect to database on startup")
     raise RuntimeError("Database connection failed")
 
+# Analytics fall back to the primary if the replica is unreachable
+check_analytics_replica()
+
+# Delivery estimates come from the lead-time model fitted by fit_eta_model.py
+if load_eta_model():
+    logger.info(f"✅ ETA model loaded from {ETA_MODEL_PATH}")
+else:
+    logger.warning(f"⚠️  No ETA model at {ETA_MODEL_PATH}; delivery estimates are unknown until fit_eta_model.py writes it")
+
+# Record statement counts, DB time and slow queries per request
+for instrumented_engine in (engine, analytics_primary_engine, analytics_replica_engine):
+    if instrumented_engine is not None:
+        instrument_engine(instrumented_engine)
+
 # Create database tables (only in development)
 if os.getenv("ENVIRONMENT", "development") == "development":
     try:
@@ -31,6 +73,21 @@ if os.getenv("ENVIRONMENT", "development") == "development":
         logger.error(f"❌ Failed to create database tables: {e}")
         raise
 
+# Trending products are counted from the sales in the database; start from the last snapshot
+# (plus the sales since) or the recent sales
+_startup_db = AnalyticsSessionLocal(bind=get_analytics_engine())
+try:
+    logger.info(f"✅ Trending sketches {trending.restore(_startup_db)}")
+except Exception as e:
+    logger.warning(f"⚠️  Trending sketches start empty: {e}")
+# Build the catalog gazetteer now rather than on the first chat message
+try:
+    logger.info(f"✅ Catalog gazetteer: {catalog_gazetteer.refresh(_startup_db).stats()}")
+except Exception as e:
+    logger.warning(f"⚠️  Catalog gazetteer is built on first use: {e}")
+finally:
+    _startup_db.close()
+
 app = FastAPI(
     title="E-commerce Chatbot API",
     description="Backend API for E-commerce Customer Support Chatbot",
@@ -48,8 +105,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.on_event("startup")
+def start_trending_poller():
+    """Count sales written by any process (other workers, data loads) as they are committed"""
+    trending.start_polling(lambda: AnalyticsSessionLocal(bind=get_analytics_engine()))
+
+@app.on_event("shutdown")
+def save_trending_snapshot():
+    """Keep the trending sketches across restarts (one worker writes for all)"""
+    trending.stop_polling()
+    if TRENDING_SNAPSHOT_PATH and trending.owns_snapshot():
+        try:
+            trending.save()
+            logger.info(f"✅ Trending snapshot saved to {TRENDING_SNAPSHOT_PATH}")
+        except Exception as e:
+            logger.error(f"❌ Failed to save trending snapshot: {e}")
+
+@app.middleware("http")
+async def track_query_metrics(request: Request, call_next):
+    """Count SQL statements and DB time for each request and aggregate them per endpoint"""
+    stats = start_request(request.url.path)
+    response = await call_next(request)
+    
+    # Use the route template so /api/orders/1/status and /api/orders/2/status aggregate together
+    route = request.scope.get("route")
+    finish_request(stats, f"{request.method} {route.path if route else request.url.path}")
+    
+    response.headers["X-DB-Query-Count"] = str(stats.query_count)
+    response.headers["X-DB-Time-Ms"] = f"{stats.total_time_ms:.2f}"
+    return response
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -79,59 +167,248 @@ async def health_check():
         }
 
 # Conversation endpoints
+# Plain def: FastAPI runs it in the threadpool, so concurrent chats overlap instead of blocking
+# the event loop on DB and LLM I/O (and identical LLM prompts can be coalesced)
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(
+def chat(
     request: ChatRequest,
+    http_request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Primary chat endpoint that accepts user messages and returns AI responses.
     Enhanced with LLM integration and intelligent business logic.
     """
-    # Get or create conversation session
-    user_id = request.user_id or "anonymous"
-    conversation_service = ConversationService(db)
-    session = conversation_service.get_or_create_session(user_id, request.conversation_id)
+    # The LLM gets whatever is left of the request budget once the data has been fetched
+    deadline = Deadline()
+    stage_timings = {}
+    stage_start = time.perf_counter()
     
-    # Store user message
-    user_message = conversation_service.add_message(
-        session.session_id, 
-        MessageType.USER, 
-        request.message
-    )
+    # Per-user token bucket so one chatty client cannot use up the shared LLM quota; anonymous
+    # visitors are told apart by their address
+    user_id = request.user_id or "anonymous"
+    allowed, retry_after = user_rate_limiter.check(user_id, _client_host(http_request))
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many messages, please slow down",
+            headers={"Retry-After": str(retry_after)}
+        )
     
-    # Initialize enhanced chat service
-    enhanced_chat_service = EnhancedChatService(db)
+    # Cheap intents are admitted ahead of LLM turns; under load the LLM is dropped before requests are
+    try:
+        admission = chat_admission.admit(chat_priority(request.message), deadline)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The assistant is busy right now, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    stage_start = _record_stage(stage_timings, "admission", stage_start)
     
     try:
-        # Get conversation history for context
-        conversation_history = conversation_service.get_session_messages(session.session_id)
-        history_context = [
-            {"role": msg.message_type, "content": msg.content}
-            for msg in conversation_history[-5:]  # Last 5 messages for context
-        ]
+        # Get or create conversation session
+        conversation_service = ConversationService(db)
+        session = conversation_service.get_or_create_session(user_id, request.conversation_id)
         
-        # Process message with enhanced service
-        ai_response_text, needs_clarification, missing_info = enhanced_chat_service.process_message(
-            request.message, history_context
+        # Store user message
+        user_message = conversation_service.add_message(
+            session.session_id, 
+            MessageType.USER, 
+            request.message
         )
+        stage_start = _record_stage(stage_timings, "session", stage_start)
         
-    except Exception as e:
-        # Handle errors gracefully
-        ai_response_text = f"I'm having trouble processing your request right now. Please try again later. Error: {str(e)}"
-    
-    # Store AI response
-    ai_message = conversation_service.add_message(
-        session.session_id, 
-        MessageType.AI, 
-        ai_response_text
-    )
+        # Initialize enhanced chat service
+        enhanced_chat_service = EnhancedChatService(db)
+        stage_start = _record_stage(stage_timings, "init", stage_start)
+        
+        try:
+            # Rolling summary + recent messages keeps history bounded for long conversations
+            history_context = ConversationMemory(db).get_context(
+                session.session_id, exclude_message_id=user_message.id
+            )
+            stage_start = _record_stage(stage_timings, "history", stage_start)
+            
+            # Process message with enhanced service
+            ai_response_text, needs_clarification, missing_info = enhanced_chat_service.process_message(
+                request.message, history_context, deadline=deadline, degraded=admission.degraded
+            )
+            
+        except Exception as e:
+            # Handle errors gracefully
+            ai_response_text = f"I'm having trouble processing your request right now. Please try again later. Error: {str(e)}"
+        stage_timings.update(enhanced_chat_service.stage_timings)
+        stage_start = time.perf_counter()
+        
+        # Store AI response
+        ai_message = conversation_service.add_message(
+            session.session_id, 
+            MessageType.AI, 
+            ai_response_text
+        )
+        _record_stage(stage_timings, "persist", stage_start)
+        session_id, message_id = session.session_id, ai_message.id
+        
+        # get_db only closes the session after background tasks have run; release the connection
+        # now so the summary task does not need a second one (which can exhaust small pools)
+        db.close()
+        
+        # Fold older messages into the summary after the response has been sent
+        background_tasks.add_task(update_conversation_summary, session_id)
+        
+        # Per-stage breakdown for load testing and browser devtools
+        response.headers["Server-Timing"] = ", ".join(
+            f"{stage};dur={duration:.2f}" for stage, duration in stage_timings.items()
+        )
+        
+        return ChatResponse(
+            response=ai_response_text,
+            conversation_id=session_id,
+            message_id=message_id
+        )
+    finally:
+        admission.release()
+
+@app.post("/api/chat/batch")
+def chat_batch(
+    request: BatchChatRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Answer many messages in one request for bulk and offline workloads (QA replays, FAQ
+    generation). Streams one NDJSON line per message as it is answered, then a summary line.
+    """
+    if not request.messages:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No messages given")
+    if len(request.messages) > BATCH_CHAT_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BATCH_CHAT_MAX_MESSAGES} messages per batch"
+        )
     
-    return ChatResponse(
-        response=ai_response_text,
-        conversation_id=session.session_id,
-        message_id=ai_message.id
+    batch_service = BatchChatService(db)
+    results = batch_service.process(
+        [item.dict() for item in request.messages],
+        persist=request.persist,
+        max_concurrency=request.max_concurrency
     )
+    
+    def stream_results():
+        for result in results:
+            yield json.dumps(result, default=str) + "\n"
+        # Same as /api/chat: release the connection before the summary tasks run
+        db.close()
+        for session_id in batch_service.persisted_sessions:
+            background_tasks.add_task(update_conversation_summary, session_id)
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, user_id: str = "anonymous", conversation_id: Optional[str] = None):
+    """
+    Chat over one long-lived connection bound to a conversation session.
+    
+    Client frames are {"message": "...", "client_id": "..."} (or plain text). Messages may be
+    pipelined; they are answered in order. The server pushes {"type": "token"} frames with LLM
+    output as it is generated and one {"type": "response"} frame per message, whose response
+    text is final.
+    """
+    await websocket.accept()
+    connection = ChatConnection(user_id, conversation_id)
+    try:
+        session_id = await run_in_threadpool(connection.open)
+    except Exception as e:
+        logger.error(f"WebSocket session setup failed: {e}")
+        await websocket.close(code=1011)
+        return
+    
+    loop = asyncio.get_running_loop()
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_PIPELINED_MESSAGES)
+    # Every frame goes through one sender so tokens and responses keep their order
+    outbox: asyncio.Queue = asyncio.Queue()
+    outbox.put_nowait({"type": "session", "conversation_id": session_id})
+    
+    async def receive_messages():
+        while True:
+            frame = await websocket.receive_text()
+            try:
+                payload = json.loads(frame)
+            except ValueError:
+                payload = {"message": frame}
+            if not isinstance(payload, dict):
+                payload = {"message": str(payload)}
+            # Blocks when the client is too far ahead, which stops reading from the socket
+            await inbox.put(payload)
+    
+    async def summarize() -> bool:
+        try:
+            return await run_in_threadpool(connection.refresh_summary)
+        except Exception as e:
+            logger.error(f"WebSocket summary update failed: {e}")
+            return False
+    
+    async def answer_messages():
+        # The summary is folded in its own task, like /api/chat's background task, so pipelined
+        # messages do not wait on its LLM call; its history is picked up between two messages
+        summary_task: Optional[asyncio.Task] = None
+        while True:
+            payload = await inbox.get()
+            if summary_task is not None and summary_task.done():
+                if summary_task.result():
+                    await run_in_threadpool(connection.reload_history)
+                summary_task = None
+            client_id = payload.get("client_id")
+            message = (payload.get("message") or "").strip()
+            if not message:
+                await outbox.put({"type": "error", "client_id": client_id, "detail": "Empty message"})
+                continue
+            allowed, retry_after = user_rate_limiter.check(connection.user_id, _client_host(websocket))
+            if not allowed:
+                await outbox.put({"type": "error", "client_id": client_id, "status": 429,
+                                  "detail": "Too many messages, please slow down", "retry_after": retry_after})
+                continue
+            
+            def on_token(piece: str, client_id=client_id):
+                loop.call_soon_threadsafe(outbox.put_nowait, {"type": "token", "client_id": client_id, "delta": piece})
+            
+            try:
+                result = await run_in_threadpool(connection.handle, message, on_token)
+            except AdmissionRejected as e:
+                await outbox.put({"type": "error", "client_id": client_id, "status": 503,
+                                  "detail": "The assistant is busy right now, please retry shortly",
+                                  "retry_after": e.retry_after})
+                continue
+            await outbox.put({"type": "response", "client_id": client_id, **result})
+            if summary_task is None and connection.needs_summary():
+                summary_task = asyncio.create_task(summarize())
+    
+    async def send_frames():
+        while True:
+            await websocket.send_json(await outbox.get())
+    
+    tasks = [asyncio.create_task(coroutine) for coroutine in (receive_messages(), answer_messages(), send_frames())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not isinstance(task.exception(), WebSocketDisconnect):
+                logger.error(f"WebSocket chat error: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def _record_stage(stage_timings: dict, stage: str, stage_start: float) -> float:
+    """Record elapsed milliseconds for a chat stage and return the start of the next one"""
+    now = time.perf_counter()
+    stage_timings[stage] = (now - stage_start) * 1000
+    return now
+
+def _client_host(connection) -> Optional[str]:
+    """Address of an HTTP or WebSocket client (the X-Forwarded-For one behind a trusted proxy)"""
+    return connection.client.host if connection.client else None
 
 @app.get("/api/conversations/{user_id}", response_model=List[ConversationSessionSchema])
 async def get_user_conversations(
@@ -140,8 +417,8 @@ async def get_user_conversations(
 ):
     """Get all conversation sessions for a user"""
     conversation_service = ConversationService(db)
-    sessions = conversation_service.get_user_sessions(user_id)
-    return sessions
+    # Plain rows straight to JSON: no ORM objects, per-session message loads or schema validation
+    return FastJSONResponse(schema_rows(conversation_service.get_user_session_rows(user_id), ConversationSessionSchema))
 
 @app.get("/api/conversations/{session_id}/messages", response_model=List[ConversationMessageSchema])
 async def get_conversation_messages(
@@ -158,8 +435,7 @@ async def get_conversation_messages(
             detail="Conversation session not found"
         )
     
-    messages = conversation_service.get_session_messages(session_id)
-    return messages
+    return FastJSONResponse(schema_rows(conversation_service.get_session_message_rows(session_id), ConversationMessageSchema))
 
 @app.delete("/api/conversations/{session_id}")
 async def close_conversation(
@@ -180,26 +456,35 @@ async def close_conversation(
 
 # Data endpoints (for testing and verification)
 @app.get("/api/stats")
-async def get_database_stats(db: Session = Depends(get_db)):
+async def get_database_stats(db: Session = Depends(get_analytics_db)):
     """Get basic database statistics"""
-    from models import User, Order, InventoryItem, ConversationSession
+    from models import User, Order, InventoryItem
     
     stats = {
         "users": db.query(User).count(),
         "orders": db.query(Order).count(),
         "inventory_items": db.query(InventoryItem).count(),
-        "conversation_sessions": db.query(ConversationSession).count()
+        "conversation_sessions": ConversationService(db).store.count_sessions()
     }
     
     return stats
 
 # Business Logic Testing Endpoints
-@app.get("/api/analytics/top-products")
-async def get_top_products(limit: int = 5, db: Session = Depends(get_db)):
+@app.get("/api/analytics/top-products", response_model=List[TopProductResponse])
+async def get_top_products(limit: int = 5, db: Session = Depends(get_analytics_db)):
     """Get top selling products"""
     from services.ecommerce_service import EcommerceService
     ecommerce_service = EcommerceService(db)
-    return ecommerce_service.get_top_products(limit)
+    return FastJSONResponse(schema_rows(ecommerce_service.get_top_products(limit), TopProductResponse))
+
+@app.get("/api/analytics/trending", response_model=List[TrendingProductResponse])
+def get_trending_products(window: Optional[str] = None, limit: int = Query(10, ge=1, le=100),
+                          category: Optional[str] = None, department: Optional[str] = None):
+    """Best sellers of a recent window (1h, 24h or 7d by default), overall or per category/department"""
+    try:
+        return FastJSONResponse(schema_rows(trending.top(window, limit, category, department), TrendingProductResponse))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/orders/{order_id}/status")
 async def get_order_status(order_id: int, db: Session = Depends(get_db)):
@@ -211,19 +496,160 @@ async def get_order_status(order_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Order not found")
     return order_status
 
+@app.get("/api/orders/{order_id}/eta", response_model=OrderEtaResponse)
+def get_order_eta(order_id: int, db: Session = Depends(get_db)):
+    """Estimated delivery window of an order (P10/P50/P90 of similar past deliveries)"""
+    order_eta = EcommerceService(db).get_order_eta(order_id)
+    if not order_eta:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order_eta
+
+@app.get("/api/products/{product_id}/recommendations", response_model=List[ProductRecommendationResponse])
+def get_product_recommendations(product_id: int, limit: int = 5, db: Session = Depends(get_db)):
+    """Products customers also bought with this one (precomputed; the session is never used)"""
+    recommendations = EcommerceService(db).get_recommendations(product_id, max(1, min(limit, RECOMMENDATIONS_TOP_K)))
+    if recommendations is None:
+        raise HTTPException(status_code=404, detail="No recommendations for this product")
+    return recommendations
+
 @app.get("/api/inventory/stock-levels")
-async def get_stock_levels(product_name: str = None, db: Session = Depends(get_db)):
-    """Get stock levels for products"""
-    from services.ecommerce_service import EcommerceService
+def get_stock_levels(product_name: str = None, limit: Optional[int] = None, after: Optional[str] = None,
+                     format: str = "json", db: Session = Depends(get_analytics_db)):
+    """Get stock levels for products, one page at a time (or all of them as NDJSON)"""
+    ecommerce_service = EcommerceService(db)
+    product_name, match = _catalog_name(db, product_name, "product")
+    return _list_response(
+        lambda size: ecommerce_service.iter_stock_levels(product_name, after, size, match), STOCK_LEVELS_KEYSET, limit, after, format
+    )
+
+@app.get("/api/users/{user_id}/orders")
+def get_user_orders(user_id: int, limit: Optional[int] = None, after: Optional[str] = None,
+                    format: str = "json", db: Session = Depends(get_db)):
+    """Get a user's orders, newest first"""
+    ecommerce_service = EcommerceService(db)
+    return _list_response(
+        lambda size: ecommerce_service.iter_user_orders(user_id, after, size), ORDERS_BY_DATE_KEYSET, limit, after, format
+    )
+
+@app.get("/api/orders")
+def get_orders_by_status(order_status: str = Query(..., alias="status"), limit: Optional[int] = None, after: Optional[str] = None,
+                         format: str = "json", db: Session = Depends(get_analytics_db)):
+    """Get orders with a status"""
+    ecommerce_service = EcommerceService(db)
+    return _list_response(
+        lambda size: ecommerce_service.iter_orders_by_status(order_status, after, size), ORDERS_KEYSET, limit, after, format
+    )
+
+@app.get("/api/inventory/items")
+def get_inventory_items(category: Optional[str] = None, product_name: Optional[str] = None,
+                        limit: Optional[int] = None, after: Optional[str] = None,
+                        format: str = "json", db: Session = Depends(get_analytics_db)):
+    """Get inventory items of a category or of products matching a name"""
+    if bool(category) == bool(product_name):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give either category or product_name")
+    ecommerce_service = EcommerceService(db)
+    if category:
+        category, match = _catalog_name(db, category, "category")
+        fetch = lambda size: ecommerce_service.iter_inventory_by_category(category, after, size, match)
+    else:
+        product_name, match = _catalog_name(db, product_name, "product")
+        fetch = lambda size: ecommerce_service.iter_product_details(product_name, after, size, match)
+    return _list_response(fetch, INVENTORY_KEYSET, limit, after, format)
+
+def _catalog_name(db: Session, text: Optional[str], kind: str):
+    """
+    (canonical name, kind) when text names a catalog entity of that kind, so the lookup is an
+    indexed equality; (text, None) otherwise, for a substring search
+    """
+    entity = get_catalog_gazetteer(db).resolve(text, (kind,)) if text else None
+    return (entity["name"], kind) if entity else (text, None)
+
+@app.get("/api/distribution-centers", response_model=List[DistributionCenterResponse])
+def get_distribution_centers(db: Session = Depends(get_db)):
+    """Get all distribution centers"""
+    return EcommerceService(db).get_distribution_centers()
+
+@app.get("/api/distribution-centers/nearest", response_model=List[NearestDistributionCenterResponse])
+def get_nearest_distribution_centers(user_id: Optional[int] = None, latitude: Optional[float] = None,
+                                     longitude: Optional[float] = None, product_name: Optional[str] = None,
+                                     limit: int = 1, db: Session = Depends(get_db)):
+    """Nearest distribution centers to a user or a point, optionally only those with a product in stock"""
     ecommerce_service = EcommerceService(db)
-    return ecommerce_service.get_stock_levels(product_name)
+    limit = max(1, limit)
+    if user_id is not None:
+        centers = ecommerce_service.get_nearest_distribution_centers_for_user(user_id, product_name, limit)
+        if centers is None:
+            raise HTTPException(status_code=404, detail="User not found or has no location")
+        return centers
+    if latitude is None or longitude is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give user_id or latitude and longitude")
+    return ecommerce_service.get_nearest_distribution_centers(latitude, longitude, product_name, limit)
+
+@app.get("/api/distribution-centers/assignments")
+def get_distribution_center_assignments(after: Optional[int] = None, db: Session = Depends(get_analytics_db)):
+    """Stream the nearest distribution center of every user (NDJSON), from user id after on"""
+    assignments = EcommerceService(db).assign_users_to_distribution_centers(after)
+    return StreamingResponse(ndjson_lines(assignments), media_type="application/x-ndjson")
+
+@app.get("/api/orders/{order_id}/distribution-centers", response_model=List[NearestDistributionCenterResponse])
+def get_order_distribution_centers(order_id: int, db: Session = Depends(get_db)):
+    """Distribution centers an order's items ship from"""
+    centers = EcommerceService(db).get_order_distribution_centers(order_id)
+    if not centers:
+        raise HTTPException(status_code=404, detail="Order not found or has no shipping center")
+    return centers
+
+def _list_response(fetch: Callable[[Optional[int]], Iterator], keyset: Keyset, limit: Optional[int],
+                   after: Optional[str], format: str):
+    """
+    Serve a keyset-paginated listing. JSON returns one page as an array, with the cursor of the
+    next page in the X-Next-Cursor header while there is one. NDJSON streams every row from the
+    cursor on (up to limit) through a server-side cursor, so memory stays flat at any size.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="format must be json or ndjson")
+    if after:
+        try:
+            keyset.decode(after)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if format == "ndjson":
+        rows = fetch(limit)
+        return StreamingResponse(ndjson_lines(_row_dict(row) for row in rows), media_type="application/x-ndjson")
+    
+    size = page_size(limit)
+    # One row past the page tells whether there is a next one
+    rows = list(fetch(size + 1))
+    headers = {"X-Next-Cursor": keyset.cursor(rows[size - 1])} if len(rows) > size else {}
+    return FastJSONResponse([_row_dict(row) for row in rows[:size]], headers=headers)
+
+def _row_dict(row) -> dict:
+    if isinstance(row, dict):
+        return row
+    return row.dict() if hasattr(row, "dict") else row._asdict()
 
 @app.get("/api/analytics/sales")
-async def get_sales_analytics(db: Session = Depends(get_db)):
-    """Get overall sales analytics"""
+async def get_sales_analytics(approximate: Optional[bool] = None, db: Session = Depends(get_analytics_db)):
+    """Get overall sales analytics (approximate=true: from sketches, with error bounds)"""
     from services.ecommerce_service import EcommerceService
     ecommerce_service = EcommerceService(db)
-    return ecommerce_service.get_sales_analytics()
+    return FastJSONResponse(ecommerce_service.get_sales_analytics(approximate))
+
+@app.get("/api/metrics/queries")
+async def get_query_metrics():
+    """Get per-endpoint SQL query counts, DB time and suspected N+1 patterns"""
+    return query_metrics.snapshot()
+
+@app.get("/api/metrics/cache")
+async def get_cache_metrics():
+    """Get hit rates of the in-process and shared cache tiers, the entity cache and trending sketches for this worker"""
+    return {**cache.stats(), "entities": entity_cache.stats(), "trending": trending.stats()}
+
+@app.get("/api/metrics/admission")
+async def get_admission_metrics():
+    """Get the chat admission controller's concurrency limit, queues and shed/rejected counts for this worker"""
+    return chat_admission.stats()
 
 @app.get("/api/llm/status")
 async def get_llm_status(db: Session = Depends(get_db)):
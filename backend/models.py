@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -125,6 +125,7 @@ class ConversationSession(Base):
     
     # Relationship to messages
     messages = relationship("ConversationMessage", back_populates="session", cascade="all, delete-orphan")
+    summary = relationship("ConversationSummary", back_populates="session", uselist=False, cascade="all, delete-orphan")
     
     # Composite index for user sessions
     __table_args__ = (
@@ -146,4 +147,35 @@ class ConversationMessage(Base):
     # Composite index for session messages
     __table_args__ = (
         Index('idx_session_timestamp', 'session_id', 'timestamp'),
-    ) 
\ No newline at end of file
+        # Never reuse ids on SQLite once archival empties the table (summaries track last_message_id)
+        {'sqlite_autoincrement': True},
+    )
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(255), ForeignKey("conversation_sessions.session_id"), unique=True, nullable=False, index=True)
+    summary = Column(Text, nullable=False, default="")
+    # Messages with an id up to this one are folded into the summary
+    last_message_id = Column(Integer, nullable=False, default=0)
+    summarized_messages = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # Relationship to session
+    session = relationship("ConversationSession", back_populates="summary")
+
+class ConversationArchive(Base):
+    __tablename__ = "conversation_archives"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: archives stay readable whichever conversation store wrote the session
+    session_id = Column(String(255), unique=True, nullable=False, index=True)
+    user_id = Column(String(100), nullable=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    codec = Column(String(20), nullable=False)  # 'zstd' or 'zlib'
+    payload = Column(LargeBinary, nullable=False)  # Compressed JSON list of messages
+    raw_bytes = Column(Integer, nullable=False, default=0)
+    first_message_at = Column(DateTime)
+    last_message_at = Column(DateTime)
+    archived_at = Column(DateTime, default=func.now())
@@ -18,6 +18,17 @@ class ChatResponse(BaseModel):
     conversation_id: str = Field(..., description="Conversation session ID")
     message_id: int = Field(..., description="Message ID")
 
+class BatchChatItem(BaseModel):
+    message: str = Field(..., description="User's message")
+    id: Optional[str] = Field(None, description="Client identifier echoed back in the result")
+    user_id: Optional[str] = Field(None, description="User identifier (used when persisting)")
+    conversation_id: Optional[str] = Field(None, description="Conversation to append to when persisting")
+
+class BatchChatRequest(BaseModel):
+    messages: List[BatchChatItem] = Field(..., description="Messages to answer")
+    persist: bool = Field(False, description="Store both turns in conversation history")
+    max_concurrency: Optional[int] = Field(None, description="Concurrent LLM calls (capped by the server)")
+
 class ConversationMessage(BaseModel):
     id: int
     message_type: MessageType
@@ -69,7 +80,7 @@ class InventoryItemResponse(BaseModel):
     product_id: int
     product_name: str
     product_category: str
-    product_brand: str
+    product_brand: Optional[str] = None
     product_retail_price: float
     product_department: str
     product_sku: str
@@ -128,4 +139,40 @@ class StockLevelResponse(BaseModel):
     available_stock: int
     total_inventory: int
     product_category: str
-    product_brand: str 
\ No newline at end of file
+    product_brand: Optional[str] = None 
+
+class NearestDistributionCenterResponse(BaseModel):
+    id: int
+    name: str
+    latitude: float
+    longitude: float
+    distance_km: Optional[float] = None
+    available_stock: Optional[int] = None
+    items_count: Optional[int] = None
+
+class OrderEtaResponse(BaseModel):
+    order_id: int
+    status: Optional[str] = None
+    stage: str = Field(..., description="processing, shipped, delivered, closed or unknown")
+    earliest: Optional[datetime] = Field(None, description="10th percentile delivery time")
+    expected: Optional[datetime] = Field(None, description="Median delivery time (actual time once delivered)")
+    latest: Optional[datetime] = Field(None, description="90th percentile delivery time")
+    expected_ship: Optional[datetime] = None
+    overdue: bool = False
+    samples: Optional[int] = Field(None, description="Past deliveries the estimate is based on")
+    basis: Optional[str] = Field(None, description="Group of past deliveries used, e.g. dc_state:4|California")
+
+class ProductRecommendationResponse(BaseModel):
+    product_id: int
+    product_name: Optional[str] = None
+    score: float = Field(..., description="Lift (or cosine) of buying both products together")
+    orders_together: int
+
+class TrendingProductResponse(BaseModel):
+    product_id: int
+    product_name: str
+    product_category: Optional[str] = None
+    product_department: Optional[str] = None
+    units_sold: int = Field(..., description="Upper bound of units sold in the window")
+    revenue: float
+    error: int = Field(0, description="Possible overcount of units_sold (units_sold - error is a lower bound)")
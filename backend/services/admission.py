@@ -0,0 +1,204 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+from database import DB_POOL_SIZE, DB_MAX_OVERFLOW
+from services.gazetteer import catalog_gazetteer
+from services.llm_policy import Deadline, llm_policy
+from services.query_parser import QueryParser
+
+# Admission control in front of the chat pipeline; false admits everything
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+# Concurrency limit bounds; the limit adapts between them. A chat holds a database connection
+# for most of its life, so more than the worker's connections only queues on the pool.
+ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "2"))
+ADMISSION_INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", str(max(ADMISSION_MIN_LIMIT, ADMISSION_MAX_LIMIT // 2))))
+# Latency above which a completed request counts as overload, per priority class
+ADMISSION_TARGET_MS_HIGH = float(os.getenv("ADMISSION_TARGET_MS_HIGH", "500"))
+ADMISSION_TARGET_MS_LOW = float(os.getenv("ADMISSION_TARGET_MS_LOW", "3000"))
+# Multiplicative decrease on overload (the increase is one slot per limit's worth of completions)
+ADMISSION_BACKOFF = float(os.getenv("ADMISSION_BACKOFF", "0.9"))
+# Requests waiting for a slot, per priority class. Waiting requests hold a threadpool thread, so
+# the maximum limit plus both queues should stay below the threadpool size (40 by default).
+ADMISSION_QUEUE_HIGH = int(os.getenv("ADMISSION_QUEUE_HIGH", "6"))
+ADMISSION_QUEUE_LOW = int(os.getenv("ADMISSION_QUEUE_LOW", "2"))
+# Longest wait for a slot; never more than half of the request's remaining deadline
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000"))
+# Share of the limit in use above which LLM turns are answered without the LLM
+ADMISSION_DEGRADE_AT = float(os.getenv("ADMISSION_DEGRADE_AT", "0.8"))
+
+PRIORITIES = ("high", "low")
+
+
+class AdmissionRejected(Exception):
+    """The chat pipeline is at capacity; the client should retry after retry_after seconds"""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(f"Chat pipeline overloaded ({reason}), retry in {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Admission:
+    """A granted slot; release it when the request is done"""
+
+    def __init__(self, controller: "AdmissionController", priority: str, degraded: bool):
+        self.controller = controller
+        self.priority = priority
+        # Answer without LLM enhancement (the formatter's response)
+        self.degraded = degraded
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Adaptive concurrency limit with priority queues for the chat pipeline.
+
+    The limit follows AIMD on observed latency: it grows by one slot per limit's worth of
+    requests that finish within their class's target while the limit is in use, and shrinks by
+    ADMISSION_BACKOFF when one overruns it (once per round of requests, so a burst of slow
+    completions counts once). Requests beyond the limit wait in a bounded FIFO per priority,
+    high before low, and are rejected when their queue is full or their wait runs out.
+
+    Cheap intents are high priority. LLM turns are low priority, and once the limit is mostly
+    in use they are admitted degraded instead: answered from the formatter, which makes them
+    cheap, so enhancement is shed before any request is.
+    """
+
+    def __init__(self, enabled: bool = ADMISSION_CONTROL, initial_limit: int = ADMISSION_INITIAL_LIMIT,
+                 min_limit: int = ADMISSION_MIN_LIMIT, max_limit: int = ADMISSION_MAX_LIMIT):
+        self.enabled = enabled
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.targets = {"high": ADMISSION_TARGET_MS_HIGH / 1000, "low": ADMISSION_TARGET_MS_LOW / 1000}
+        self.queue_sizes = {"high": ADMISSION_QUEUE_HIGH, "low": ADMISSION_QUEUE_LOW}
+        self.in_flight = 0
+        self._queues: Dict[str, deque] = {priority: deque() for priority in PRIORITIES}
+        self._condition = threading.Condition()
+        self._decreased_at = 0.0
+        self._service_time = None  # EWMA of seconds per request, for Retry-After
+        self.counters = {"admitted": 0, "queued": 0, "degraded": 0, "rejected_queue_full": 0,
+                         "rejected_timeout": 0, "completed": 0, "overloaded": 0}
+
+    def admit(self, priority: str, deadline: Optional[Deadline] = None) -> Admission:
+        """A slot for a request of this priority, waiting for one if need be, or AdmissionRejected"""
+        now = time.monotonic()
+        max_wait = ADMISSION_QUEUE_TIMEOUT_MS / 1000
+        if deadline is not None:
+            max_wait = min(max_wait, deadline.remaining_ms() / 2000)
+        with self._condition:
+            if not self.enabled:
+                return self._grant(priority, False)
+            degraded = False
+            if priority == "low" and self._saturated():
+                # Without the LLM the turn is as cheap as any high-priority one
+                priority, degraded = "high", True
+            if not self._waiting(priority) and self.in_flight < int(self.limit):
+                return self._grant(priority, degraded)
+            queue = self._queues[priority]
+            if len(queue) >= self.queue_sizes[priority]:
+                self.counters["rejected_queue_full"] += 1
+                raise AdmissionRejected(self._retry_after(), "queue full")
+            ticket = object()
+            queue.append(ticket)
+            self.counters["queued"] += 1
+            give_up_at = now + max_wait
+            try:
+                while not (self._next_waiter() is ticket and self.in_flight < int(self.limit)):
+                    remaining = give_up_at - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["rejected_timeout"] += 1
+                        raise AdmissionRejected(self._retry_after(), "queue timeout")
+                    self._condition.wait(remaining)
+            finally:
+                queue.remove(ticket)
+                # The next waiter may be able to go now, or has moved to the head
+                self._condition.notify_all()
+            return self._grant(priority, degraded)
+
+    def _grant(self, priority: str, degraded: bool) -> Admission:
+        self.in_flight += 1
+        self.counters["admitted"] += 1
+        if degraded:
+            self.counters["degraded"] += 1
+        return Admission(self, priority, degraded)
+
+    def _release(self, admission: Admission):
+        now = time.monotonic()
+        latency = now - admission.admitted_at
+        with self._condition:
+            busy = self.in_flight >= self.limit / 2
+            self.in_flight -= 1
+            self.counters["completed"] += 1
+            self._service_time = latency if self._service_time is None else 0.9 * self._service_time + 0.1 * latency
+            if latency > self.targets[admission.priority]:
+                # Requests admitted before the last decrease already saw the old limit
+                if admission.admitted_at >= self._decreased_at:
+                    self.counters["overloaded"] += 1
+                    self.limit = max(self.min_limit, self.limit * ADMISSION_BACKOFF)
+                    self._decreased_at = now
+            elif busy:
+                # Only grow while the limit is actually being used
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _saturated(self) -> bool:
+        return self.in_flight >= self.limit * ADMISSION_DEGRADE_AT or any(self._queues.values())
+
+    def _waiting(self, priority: str) -> bool:
+        """Whether anyone of this or higher priority is already queued (no overtaking)"""
+        for queued in PRIORITIES:
+            if self._queues[queued]:
+                return True
+            if queued == priority:
+                return False
+        return False
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            if self._queues[priority]:
+                return self._queues[priority][0]
+        return None
+
+    def _retry_after(self) -> int:
+        """Seconds until the queued work has likely drained at the current limit"""
+        queued = sum(len(queue) for queue in self._queues.values())
+        service_time = self._service_time or self.targets["high"]
+        return max(1, math.ceil(service_time * (queued + 1) / max(1.0, self.limit)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "enabled": self.enabled,
+                "limit": round(self.limit, 2),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self.in_flight,
+                "queue_depth": {priority: len(queue) for priority, queue in self._queues.items()},
+                "service_time_ms": round(self._service_time * 1000, 1) if self._service_time is not None else None,
+                **self.counters
+            }
+
+
+# Classification only needs the intent; the gazetteer is used as it is (refreshed by the chat service)
+_classifier = QueryParser(catalog_gazetteer)
+
+
+def chat_priority(message: str) -> str:
+    """high for intents answered from the database alone, low for turns that call the LLM"""
+    parsed = _classifier.parse_query(message)
+    policy = llm_policy.policies.get(parsed["query_type"].value) or llm_policy.policies["general"]
+    return "low" if policy.get("enhance", True) else "high"
+
+
+chat_admission = AdmissionController()
@@ -0,0 +1,174 @@
+import os
+from datetime import datetime
+from itertools import islice
+from statistics import NormalDist
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from models import User, Order, InventoryItem
+from services.cache import cache
+from services.pagination import stream_rows, STREAM_BATCH_SIZE
+from services.sketches import HyperLogLog, BottomKSample
+
+# Default for get_sales_analytics (dashboard and chat); the API can ask for either mode
+APPROXIMATE_ANALYTICS = os.getenv("APPROXIMATE_ANALYTICS", "false").lower() in ("1", "true", "yes")
+# Relative standard error of the distinct counts (sets the HyperLogLog size: 0.02 -> 4 KB)
+APPROX_DISTINCT_ERROR = float(os.getenv("APPROX_DISTINCT_ERROR", "0.02"))
+# Sold-item prices kept for the price distribution
+APPROX_SAMPLE_SIZE = int(os.getenv("APPROX_SAMPLE_SIZE", "2000"))
+# Confidence level of the reported error bounds
+APPROX_CONFIDENCE = float(os.getenv("APPROX_CONFIDENCE", "0.95"))
+# Rows are bucketed by month of an insert-time column (or sold_at), so a closed month does not
+# change; its sketches are cached (shared by all workers) this long
+APPROX_BUCKET_TTL = float(os.getenv("APPROX_BUCKET_TTL", str(7 * 86400)))
+
+PRICE_PERCENTILES = (0.1, 0.5, 0.9)
+
+
+class AnalyticsBucket:
+    """
+    Mergeable sales summary of one time bucket: exact order and sold-item counts and revenue,
+    HyperLogLog sketches of customers and product names, and a bottom-k sample of sold-item
+    prices. Buckets (months, or the same month from several workers) add up with merge.
+    """
+
+    def __init__(self, orders: int = 0, items_sold: int = 0, revenue: float = 0.0,
+                 customers: Optional[HyperLogLog] = None, products: Optional[HyperLogLog] = None,
+                 prices: Optional[BottomKSample] = None):
+        self.orders = orders
+        self.items_sold = items_sold
+        self.revenue = revenue
+        self.customers = customers or HyperLogLog.for_error(APPROX_DISTINCT_ERROR)
+        self.products = products or HyperLogLog.for_error(APPROX_DISTINCT_ERROR)
+        self.prices = prices or BottomKSample(APPROX_SAMPLE_SIZE)
+
+    @classmethod
+    def build(cls, db: Session, start: Optional[datetime], end: Optional[datetime]) -> "AnalyticsBucket":
+        """Summarize rows dated in [start, end) (no end: everything from start; no start: undated rows)"""
+        bucket = cls()
+        bucket.orders = db.query(func.count(Order.order_id)).filter(_dated(Order.created_at, start, end)).scalar() or 0
+        for ids in _batches(db.query(User.id).filter(_dated(User.created_at, start, end))):
+            bucket.customers.add_many(ids)
+        for names in _batches(db.query(InventoryItem.product_name).filter(_dated(InventoryItem.created_at, start, end))):
+            bucket.products.add_many(names)
+        if start is not None:
+            sold = db.query(InventoryItem.product_retail_price).filter(_dated(InventoryItem.sold_at, start, end))
+            for prices in _batches(sold):
+                bucket.items_sold += len(prices)
+                bucket.revenue += float(sum(price or 0.0 for price in prices))
+                bucket.prices.add_many([price or 0.0 for price in prices])
+        return bucket
+
+    def merge(self, other: "AnalyticsBucket") -> "AnalyticsBucket":
+        self.orders += other.orders
+        self.items_sold += other.items_sold
+        self.revenue += other.revenue
+        self.customers.merge(other.customers)
+        self.products.merge(other.products)
+        self.prices.merge(other.prices)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"orders": self.orders, "items_sold": self.items_sold, "revenue": self.revenue,
+                "customers": self.customers.to_dict(), "products": self.products.to_dict(),
+                "prices": self.prices.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AnalyticsBucket":
+        return cls(data["orders"], data["items_sold"], data["revenue"], HyperLogLog.from_dict(data["customers"]),
+                   HyperLogLog.from_dict(data["products"]), BottomKSample.from_dict(data["prices"]))
+
+
+def approximate_sales_analytics(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Sales analytics from monthly sketches: closed months come from the shared cache (built once),
+    so only the current month is read from the database. Counts of orders and items and the
+    revenue are exact; distinct counts and the price distribution carry error bounds at
+    APPROX_CONFIDENCE.
+    """
+    current = _month_start(now or datetime.utcnow())
+    history = AnalyticsBucket.from_dict(
+        cache.get_or_set(_key(f"history:{current:%Y-%m}"), APPROX_BUCKET_TTL, lambda: _history(db, current).to_dict())
+    )
+    total = history.merge(AnalyticsBucket.build(db, current, None))
+    return _summary(total)
+
+
+def _history(db: Session, current: datetime) -> AnalyticsBucket:
+    """Merge of every month before current, each month's sketches cached on their own"""
+    history = AnalyticsBucket.build(db, None, None)
+    month = _month_start(_earliest(db) or current)
+    while month < current:
+        following = _next_month(month)
+        history.merge(AnalyticsBucket.from_dict(cache.get_or_set(
+            _key(f"month:{month:%Y-%m}"), APPROX_BUCKET_TTL,
+            lambda: AnalyticsBucket.build(db, month, following).to_dict()
+        )))
+        month = following
+    return history
+
+
+def _summary(total: AnalyticsBucket) -> Dict[str, Any]:
+    z = NormalDist().inv_cdf((1 + APPROX_CONFIDENCE) / 2)
+    customers = total.customers.count()
+    products = total.products.count()
+    percentiles = total.prices.quantiles(list(PRICE_PERCENTILES))
+    return {
+        "total_orders": total.orders,
+        "total_revenue": round(total.revenue, 2),
+        "total_customers": customers,
+        "total_products": products,
+        "items_sold": total.items_sold,
+        "item_price_percentiles": {
+            f"p{round(quantile * 100)}": round(value, 2) for quantile, value in zip(PRICE_PERCENTILES, percentiles)
+        },
+        "approximate": True,
+        "confidence": APPROX_CONFIDENCE,
+        # Half-widths of the confidence intervals; the percentiles' is in quantile units (0.02 = 2 points)
+        "error_bounds": {
+            "total_customers": round(z * total.customers.relative_error * customers),
+            "total_products": round(z * total.products.relative_error * products),
+            "item_price_percentiles": round(max(total.prices.rank_error(quantile, z) for quantile in PRICE_PERCENTILES), 4),
+        },
+        "sample_size": len(total.prices.values),
+    }
+
+
+def _dated(column, start: Optional[datetime], end: Optional[datetime]):
+    if start is None:
+        return column.is_(None)
+    if end is None:
+        return column >= start
+    return and_(column >= start, column < end)
+
+
+def _batches(query) -> Iterator[List[Any]]:
+    rows = stream_rows(query)
+    while True:
+        batch = [row[0] for row in islice(rows, STREAM_BATCH_SIZE)]
+        if not batch:
+            return
+        yield batch
+
+
+def _earliest(db: Session) -> Optional[datetime]:
+    # Each is an index lookup
+    dates = [
+        db.query(func.min(column)).scalar()
+        for column in (User.created_at, Order.created_at, InventoryItem.created_at, InventoryItem.sold_at)
+    ]
+    dates = [date for date in dates if date is not None]
+    return min(dates) if dates else None
+
+
+def _month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def _next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _key(name: str) -> str:
+    # Sketch settings are part of the key, so a config change never merges mismatched sketches
+    return f"approx_analytics:{APPROX_DISTINCT_ERROR}:{APPROX_SAMPLE_SIZE}:{name}"
@@ -0,0 +1,279 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+from sqlalchemy.orm import Session
+from schemas import MessageType
+from services.query_parser import QueryType
+from services.enhanced_chat_service import EnhancedChatService, classify_llm_outcome, CHAT_ORDERS_SHOWN
+from services.conversation_service import ConversationService
+from services.llm_policy import llm_policy
+from services.llm_service import LLMService
+
+# Upper bound on messages per batch request
+BATCH_CHAT_MAX_MESSAGES = int(os.getenv("BATCH_CHAT_MAX_MESSAGES", "1000"))
+# Concurrent LLM calls per batch; the upstream quota still applies to each call
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+
+class BatchChatService:
+    """
+    Answers many chat messages in one pass.
+
+    All messages are parsed up front and identical ones (after the parser's normalization)
+    are answered once. Data lookups run per intent as set-based queries (one IN query for all
+    order ids, one OR-of-ilike query for all product searches, ...), responses that need no
+    LLM are emitted straight away, and LLM calls then run on a bounded thread pool with
+    results emitted as they complete. Messages are answered without conversation history.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.chat_service = EnhancedChatService(db)
+        self.ecommerce_service = self.chat_service.ecommerce_service
+        self.formatter = self.chat_service.response_formatter
+        # LLMService keeps per-call state (last_error), so each pool thread gets its own
+        self._thread_state = threading.local()
+        # Sessions written by the last persisted batch, for summary updates
+        self.persisted_sessions: List[str] = []
+
+    def process(self, items: List[Dict[str, Any]], persist: bool = False,
+                max_concurrency: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield one result dict per item (in completion order, with its index), then a summary.
+
+        Items are dicts with message and optional id, user_id and conversation_id. With persist,
+        both turns are stored in the item's conversation; items of the same user without a
+        conversation_id share one new session.
+        """
+        started = time.perf_counter()
+        concurrency = max(1, min(max_concurrency or BATCH_LLM_CONCURRENCY, BATCH_LLM_CONCURRENCY))
+        self.persisted_sessions = []
+        sessions: Dict[Tuple[str, Optional[str]], str] = {}
+
+        plans = self._plan(items)
+        llm_keys = [key for key, plan in plans.items() if plan["llm"]]
+        counts = {"messages": len(items), "unique_messages": len(plans), "llm_calls": len(llm_keys)}
+
+        # Answers that are already final go out before any LLM call starts
+        for key, plan in plans.items():
+            if not plan["llm"]:
+                for index in plan["indexes"]:
+                    yield self._result(items, index, plan, plan["response"], persist, sessions)
+
+        if llm_keys:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-llm") as executor:
+                futures = {executor.submit(self._enhance, plans[key]): key for key in llm_keys}
+                for future in as_completed(futures):
+                    plan = plans[futures[future]]
+                    response, path = future.result()
+                    llm_policy.record(plan["intent"], path)
+                    plan["path"] = path
+                    for index in plan["indexes"]:
+                        yield self._result(items, index, plan, response, persist, sessions)
+
+        self.persisted_sessions = list(sessions.values())
+        yield {"summary": {
+            **counts,
+            "persisted_sessions": len(self.persisted_sessions),
+            "llm_concurrency": concurrency,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }}
+
+    def _plan(self, items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Parse and deduplicate the messages, fetch their data and decide which need the LLM"""
+        plans: Dict[str, Dict[str, Any]] = {}
+        for index, item in enumerate(items):
+            key = item["message"].lower().strip()
+            if key in plans:
+                plans[key]["indexes"].append(index)
+                continue
+            parsed = self.chat_service.query_parser.parse_query(item["message"])
+            query_type, parameters = parsed["query_type"], parsed["parameters"]
+            plans[key] = {
+                "indexes": [index],
+                "message": item["message"],
+                "query_type": query_type,
+                "parameters": parameters,
+                "missing_info": self.chat_service._check_missing_information(query_type, parameters),
+                "query_results": {}
+            }
+
+        self._fetch_base_responses([plan for plan in plans.values() if not plan["missing_info"]])
+
+        llm_available = self.chat_service.llm_available and self.chat_service.llm_service is not None
+        for plan in plans.values():
+            plan["intent"] = "clarification" if plan["missing_info"] else plan["query_type"].value
+            plan["decision"] = decision = llm_policy.decide(plan["intent"])
+            plan["llm"] = decision.enhance and llm_available
+            if plan["llm"]:
+                continue
+            plan["path"] = decision.path if not decision.enhance else "llm_unavailable"
+            llm_policy.record(plan["intent"], plan["path"])
+            if plan["missing_info"]:
+                plan["response"] = self.chat_service._fallback_clarifying_question(plan["missing_info"])
+        return plans
+
+    def _fetch_base_responses(self, plans: List[Dict[str, Any]]):
+        """Set-based data lookups per intent, then formatting of each plan's base response"""
+        by_type: Dict[QueryType, List[Dict[str, Any]]] = {}
+        for plan in plans:
+            by_type.setdefault(plan["query_type"], []).append(plan)
+
+        fetchers = {
+            QueryType.ORDER_STATUS: self._fetch_order_statuses,
+            QueryType.ORDER_ETA: self._fetch_order_etas,
+            QueryType.STOCK_LEVELS: self._fetch_stock_levels,
+            QueryType.USER_ORDERS: self._fetch_user_orders,
+            QueryType.PRODUCT_DETAILS: self._fetch_product_details,
+            QueryType.TOP_PRODUCTS: self._fetch_top_products,
+            QueryType.TRENDING_PRODUCTS: self._fetch_trending_products,
+            QueryType.SALES_ANALYTICS: self._fetch_sales_analytics,
+            QueryType.DISTRIBUTION_CENTER: self._fetch_distribution_centers,
+        }
+        for query_type, group in by_type.items():
+            if query_type == QueryType.GENERAL:
+                for plan in group:
+                    plan["response"] = self.formatter.format_general_response(plan["parameters"].get("message", ""))
+                continue
+            try:
+                fetchers[query_type](group)
+            except Exception as e:
+                print(f"Error fetching batch data for {query_type.value}: {e}")
+                self.db.rollback()
+                for plan in group:
+                    plan["response"] = self.formatter.format_error_response("database_error", str(e))
+
+    def _fetch_order_statuses(self, plans: List[Dict[str, Any]]):
+        statuses = self.ecommerce_service.get_order_statuses([plan["parameters"]["order_id"] for plan in plans])
+        for plan in plans:
+            order_status = statuses.get(plan["parameters"]["order_id"])
+            plan["query_results"]["order_status"] = order_status
+            plan["response"] = self.formatter.format_order_status_response(order_status)
+
+    def _fetch_order_etas(self, plans: List[Dict[str, Any]]):
+        # Warms the order and customer caches in one pass; each estimate is then a model lookup
+        self.ecommerce_service.get_order_statuses([plan["parameters"]["order_id"] for plan in plans])
+        for plan in plans:
+            plan["response"] = self.formatter.format_order_eta_response(
+                self.ecommerce_service.get_order_eta(plan["parameters"]["order_id"])
+            )
+
+    def _fetch_stock_levels(self, plans: List[Dict[str, Any]]):
+        levels = self.ecommerce_service.get_stock_levels_for_products(
+            [plan["parameters"]["product_name"] for plan in plans], _matches(plans)
+        )
+        for plan in plans:
+            stock_levels = levels.get(plan["parameters"]["product_name"], [])
+            plan["query_results"]["stock_levels"] = stock_levels
+            plan["response"] = self.formatter.format_stock_levels_response(stock_levels)
+
+    def _fetch_user_orders(self, plans: List[Dict[str, Any]]):
+        # Same window and total as the single-message path
+        orders, totals = self.ecommerce_service.get_orders_for_users(
+            [plan["parameters"]["user_id"] for plan in plans], CHAT_ORDERS_SHOWN
+        )
+        for plan in plans:
+            user_id = plan["parameters"]["user_id"]
+            plan["response"] = self.formatter.format_user_orders_response(orders.get(user_id, []), totals.get(user_id, 0))
+
+    def _fetch_product_details(self, plans: List[Dict[str, Any]]):
+        details = self.ecommerce_service.get_product_details_for_products(
+            [plan["parameters"]["product_name"] for plan in plans], _matches(plans)
+        )
+        for plan in plans:
+            products = details.get(plan["parameters"]["product_name"], [])
+            # Index lookups only; no further queries
+            also_bought = self.chat_service.also_bought(products)
+            plan["query_results"]["also_bought"] = also_bought
+            plan["response"] = self.formatter.format_product_details_response(products, also_bought)
+
+    def _fetch_top_products(self, plans: List[Dict[str, Any]]):
+        # One ranking for the largest limit asked for; smaller limits are its prefix
+        products = self.ecommerce_service.get_top_products(max(plan["parameters"].get("limit", 5) for plan in plans))
+        for plan in plans:
+            plan["response"] = self.formatter.format_top_products_response(
+                products[:plan["parameters"].get("limit", 5)]
+            )
+
+    def _fetch_trending_products(self, plans: List[Dict[str, Any]]):
+        # Sketch lookups only; no database access
+        for plan in plans:
+            window = plan["parameters"].get("window")
+            products = self.ecommerce_service.get_trending_products(window, plan["parameters"].get("limit", 5))
+            plan["response"] = self.formatter.format_trending_products_response(products, window)
+
+    def _fetch_sales_analytics(self, plans: List[Dict[str, Any]]):
+        analytics = self.ecommerce_service.get_sales_analytics()
+        response = self.formatter.format_sales_analytics_response(analytics)
+        for plan in plans:
+            plan["response"] = response
+
+    def _fetch_distribution_centers(self, plans: List[Dict[str, Any]]):
+        # One query warms the customer cache; the nearest-center lookups are then in-memory
+        self.ecommerce_service.get_customers([plan["parameters"]["user_id"] for plan in plans if "user_id" in plan["parameters"]])
+        for plan in plans:
+            plan["response"] = self.chat_service.distribution_center_response(plan["parameters"])
+
+    def _enhance(self, plan: Dict[str, Any]) -> Tuple[str, str]:
+        """Runs on a pool thread: the LLM call for one unique message and its policy path"""
+        llm_service = getattr(self._thread_state, "llm_service", None)
+        if llm_service is None:
+            llm_service = self._thread_state.llm_service = LLMService()
+        decision = plan["decision"]
+
+        try:
+            if plan["missing_info"]:
+                response = llm_service.ask_clarifying_question(
+                    plan["message"], plan["missing_info"], model=decision.model, timeout=decision.timeout
+                )
+            else:
+                context = self.chat_service._build_context(
+                    plan["query_type"], plan["parameters"], plan["response"], plan["query_results"]
+                )
+                response = llm_service.enhance_response(
+                    plan["response"], plan["message"], context, model=decision.model, timeout=decision.timeout
+                )
+        except Exception as e:
+            print(f"Error enhancing batch response with LLM: {e}")
+            return plan.get("response") or self.chat_service._fallback_clarifying_question(plan["missing_info"]), "llm_error"
+        return response, classify_llm_outcome(llm_service.last_error)
+
+    def _result(self, items: List[Dict[str, Any]], index: int, plan: Dict[str, Any], response: str,
+                persist: bool, sessions: Dict[Tuple[str, Optional[str]], str]) -> Dict[str, Any]:
+        item = items[index]
+        result = {
+            "index": index,
+            "id": item.get("id"),
+            "response": response,
+            "query_type": plan["query_type"].value,
+            "needs_clarification": bool(plan["missing_info"]),
+            "missing_info": plan["missing_info"],
+            "path": plan["path"]
+        }
+        if persist:
+            result["conversation_id"], result["message_id"] = self._persist(item, response, sessions)
+        return result
+
+    def _persist(self, item: Dict[str, Any], response: str,
+                 sessions: Dict[Tuple[str, Optional[str]], str]) -> Tuple[str, int]:
+        """Store both turns; called from the consuming thread only, as the store is not shared"""
+        conversation_service = ConversationService(self.db)
+        user_id = item.get("user_id") or "anonymous"
+        session_key = (user_id, item.get("conversation_id"))
+        session_id = sessions.get(session_key)
+        if session_id is None:
+            session_id = conversation_service.get_or_create_session(user_id, item.get("conversation_id")).session_id
+            sessions[session_key] = session_id
+        conversation_service.add_message(session_id, MessageType.USER, item["message"])
+        ai_message = conversation_service.add_message(session_id, MessageType.AI, response)
+        return session_id, ai_message.id
+
+
+def _matches(plans: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Match kind of each catalog-resolved product_name in the plans (free-text names have none)"""
+    return {
+        plan["parameters"]["product_name"]: plan["parameters"]["match"]
+        for plan in plans if plan["parameters"].get("match")
+    }
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# In-process tier: small and short-lived so workers cannot drift far from the shared tier
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1024"))
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", "5"))
+# Shared tier used by every worker: sqlite (a local WAL-mode file), redis or none.
+# Defaults to sqlite when several workers run, since a per-process cache would diverge.
+CACHE_SHARED_BACKEND = os.getenv("CACHE_SHARED_BACKEND", "sqlite" if WEB_CONCURRENCY > 1 else "none")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "ecommerce-chatbot-cache.db"))
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "cache:")
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Thread-safe LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int = CACHE_LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Cache shared by all workers on a host through one SQLite file in WAL mode, so readers
+    never block on the writer. Values are stored as JSON.
+    """
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Any:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return _MISSING
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, default=str), now + ttl)
+        )
+        # Occasional sweep keeps the file from growing with expired keys
+        if random.random() < 1 / 64:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class RedisCache:
+    """Cache shared by all workers and hosts using the same REDIS_URL"""
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for CACHE_SHARED_BACKEND=redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Any:
+        pipe = self.client.pipeline()
+        pipe.get(CACHE_PREFIX + key)
+        pipe.pttl(CACHE_PREFIX + key)
+        value, ttl_ms = pipe.execute()
+        if value is None:
+            return _MISSING
+        return json.loads(value), time.time() + max(ttl_ms, 0) / 1000
+
+    def set(self, key: str, value: Any, ttl: float):
+        self.client.set(CACHE_PREFIX + key, json.dumps(value, default=str), px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: str):
+        self.client.delete(CACHE_PREFIX + key)
+
+
+class TieredCache:
+    """
+    In-process LRU in front of an optional shared tier.
+
+    Reads check the local tier, then the shared tier (copying hits into the local tier for at
+    most CACHE_LOCAL_TTL), then compute. Writes go to both tiers, so every worker serves the
+    value the first one computed. Values must be JSON-serializable.
+    """
+
+    def __init__(self, local: LocalCache, shared=None):
+        self.local = local
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "shared_errors": 0}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self._count("local_hits")
+            return value
+        if self.shared is not None:
+            try:
+                entry = self.shared.get(key)
+            except Exception as e:
+                print(f"Error reading shared cache: {e}")
+                self._count("shared_errors")
+                entry = _MISSING
+            if entry is not _MISSING:
+                value, expires_at = entry
+                self.local.set(key, value, min(CACHE_LOCAL_TTL, expires_at - time.time()))
+                self._count("shared_hits")
+                return value
+        self._count("misses")
+        return default
+
+    def set(self, key: str, value: Any, ttl: float):
+        self.local.set(key, value, min(ttl, CACHE_LOCAL_TTL) if self.shared is not None else ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl)
+            except Exception as e:
+                print(f"Error writing shared cache: {e}")
+                self._count("shared_errors")
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except Exception as e:
+                print(f"Error deleting from shared cache: {e}")
+                self._count("shared_errors")
+
+    def get_or_set(self, key: str, ttl: float, compute: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["local_hits"] + counters["shared_hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round((lookups - counters["misses"]) / lookups, 3) if lookups else None,
+            "local_entries": len(self.local),
+            "shared_backend": CACHE_SHARED_BACKEND,
+            "workers": WEB_CONCURRENCY
+        }
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+
+def create_cache() -> TieredCache:
+    shared = None
+    try:
+        if CACHE_SHARED_BACKEND == "sqlite":
+            shared = SQLiteCache(CACHE_SQLITE_PATH)
+        elif CACHE_SHARED_BACKEND == "redis":
+            shared = RedisCache(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    except Exception as e:
+        print(f"Shared cache not available, using the in-process tier only: {e}")
+    return TieredCache(LocalCache(), shared)
+
+
+cache = create_cache()
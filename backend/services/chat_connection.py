@@ -0,0 +1,127 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Optional
+from database import get_db
+from schemas import MessageType
+from services.conversation_service import ConversationService
+from services.conversation_memory import ConversationMemory, RECENT_MESSAGE_WINDOW, SUMMARIZE_BATCH
+from services.enhanced_chat_service import EnhancedChatService
+from services.llm_policy import Deadline
+from services.admission import chat_admission, chat_priority
+
+# Messages a client may send ahead of their responses before the server stops reading
+WS_MAX_PIPELINED_MESSAGES = int(os.getenv("WS_MAX_PIPELINED_MESSAGES", "16"))
+
+
+class ChatConnection:
+    """
+    Server-side state of one WebSocket chat connection.
+
+    The session is resolved (and its ownership checked) once when the connection opens, and
+    the prompt history is loaded once and then extended in memory with every turn. A message
+    therefore costs the two message inserts plus its own data lookups; history is only re-read
+    after older turns have been folded into the summary. Database sessions are taken from the
+    pools per message, so idle connections hold no database connection.
+    """
+
+    def __init__(self, user_id: Optional[str], conversation_id: Optional[str] = None):
+        self.user_id = user_id or "anonymous"
+        self.requested_conversation_id = conversation_id
+        self.session_id: Optional[str] = None
+        self.history: List[Dict[str, str]] = []
+        self.messages_handled = 0
+
+    def open(self) -> str:
+        """Bind the connection to its session and load the history; returns the session id"""
+        with contextmanager(get_db)() as db:
+            session = ConversationService(db).get_or_create_session(self.user_id, self.requested_conversation_id)
+            self.session_id = session.session_id
+            self.history = ConversationMemory(db).get_context(self.session_id)
+        return self.session_id
+
+    def handle(self, text: str, on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Answer one message (LLM output goes to on_token as it is generated) and persist both turns.
+        Raises AdmissionRejected, before anything is stored, when the chat pipeline is at capacity.
+        """
+        deadline = Deadline()
+        stage_timings: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        admission = chat_admission.admit(chat_priority(text), deadline)
+        try:
+            return self._answer(text, on_token, deadline, admission.degraded, stage_timings, started)
+        finally:
+            admission.release()
+
+    def _answer(self, text: str, on_token: Optional[Callable[[str], None]], deadline: Deadline, degraded: bool,
+                stage_timings: Dict[str, float], started: float) -> Dict[str, Any]:
+        with contextmanager(get_db)() as db:
+            conversation_service = ConversationService(db)
+            conversation_service.add_message(self.session_id, MessageType.USER, text)
+            _record_stage(stage_timings, "persist", started)
+
+            chat_service = EnhancedChatService(db)
+            try:
+                response, needs_clarification, missing_info = chat_service.process_message(
+                    text, list(self.history), deadline=deadline, on_token=on_token, degraded=degraded
+                )
+            except Exception as e:
+                response = f"I'm having trouble processing your request right now. Please try again later. Error: {str(e)}"
+                needs_clarification, missing_info = False, []
+            stage_timings.update(chat_service.stage_timings)
+            stage_start = time.perf_counter()
+
+            ai_message = conversation_service.add_message(self.session_id, MessageType.AI, response)
+            _record_stage(stage_timings, "persist", stage_start)
+
+        self._remember(text, response)
+        self.messages_handled += 1
+        stage_timings["total"] = (time.perf_counter() - started) * 1000
+        return {
+            "response": response,
+            "conversation_id": self.session_id,
+            "message_id": ai_message.id,
+            "needs_clarification": needs_clarification,
+            "missing_info": missing_info,
+            "timings": {stage: round(duration, 2) for stage, duration in stage_timings.items()}
+        }
+
+    def needs_summary(self) -> bool:
+        """True once enough turns have accumulated for update_summary to fold some of them"""
+        unsummarized = sum(1 for turn in self.history if turn["role"] != "summary")
+        return unsummarized >= RECENT_MESSAGE_WINDOW + SUMMARIZE_BATCH
+
+    def refresh_summary(self) -> bool:
+        """
+        Fold older turns into the stored summary (usually an LLM call); True when it changed.
+        Safe to run alongside the next message: the in-memory history is left to reload_history.
+        """
+        from services.llm_service import LLMService
+
+        with contextmanager(get_db)() as db:
+            try:
+                llm_service = LLMService()
+            except Exception:
+                llm_service = None
+            return ConversationMemory(db).update_summary(self.session_id, llm_service)
+
+    def reload_history(self):
+        """Re-read the history from the new summary; call between messages, when every turn is stored"""
+        with contextmanager(get_db)() as db:
+            self.history = ConversationMemory(db).get_context(self.session_id)
+
+    def _remember(self, user_text: str, response: str):
+        self.history.append({"role": MessageType.USER.value, "content": user_text})
+        self.history.append({"role": MessageType.AI.value, "content": response})
+        # Same bound as ConversationMemory.get_context, in case summarizing falls behind
+        summary = [turn for turn in self.history if turn["role"] == "summary"]
+        turns = [turn for turn in self.history if turn["role"] != "summary"]
+        self.history = summary + turns[-(RECENT_MESSAGE_WINDOW + SUMMARIZE_BATCH):]
+
+
+def _record_stage(stage_timings: Dict[str, float], stage: str, stage_start: float) -> float:
+    now = time.perf_counter()
+    stage_timings[stage] = stage_timings.get(stage, 0.0) + (now - stage_start) * 1000
+    return now
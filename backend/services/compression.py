@@ -0,0 +1,34 @@
+import os
+import json
+import zlib
+from typing import Any, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; zlib is always available
+    zstandard = None
+
+# Codec for new blobs; blobs record their codec so either can always be read back
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "zstd" if zstandard is not None else "zlib")
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "10" if ARCHIVE_CODEC == "zstd" else "9"))
+
+
+def compress_json(value: Any) -> Tuple[bytes, str]:
+    """Serialize value as compact JSON and compress it; returns (payload, codec)"""
+    raw = json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+    if ARCHIVE_CODEC == "zstd" and zstandard is not None:
+        # Compressor objects are not thread-safe, so each call gets its own
+        return zstandard.ZstdCompressor(level=ARCHIVE_COMPRESSION_LEVEL).compress(raw), "zstd"
+    return zlib.compress(raw, min(ARCHIVE_COMPRESSION_LEVEL, 9)), "zlib"
+
+
+def decompress_json(payload: bytes, codec: str) -> Any:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed archives")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == "zlib":
+        raw = zlib.decompress(payload)
+    else:
+        raise ValueError(f"Unknown archive codec: {codec}")
+    return json.loads(raw)
@@ -0,0 +1,119 @@
+import os
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import Session
+from services.conversation_store import get_conversation_store
+from services.prompt_builder import count_tokens, truncate_to_tokens
+
+# Messages kept verbatim after the summary
+RECENT_MESSAGE_WINDOW = int(os.getenv("MEMORY_RECENT_MESSAGES", "4"))
+# Unsummarized messages beyond the window that trigger folding them into the summary
+SUMMARIZE_BATCH = int(os.getenv("MEMORY_SUMMARIZE_BATCH", "4"))
+# Upper bound on the rolling summary
+SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "200"))
+MAX_FOLD_MESSAGES = 64
+
+
+class ConversationMemory:
+    """
+    Rolling summary plus a small window of recent messages per session.
+
+    Prompt-time reads touch one summary row and at most RECENT_MESSAGE_WINDOW + SUMMARIZE_BATCH
+    messages, so context stays bounded however long the conversation gets. Folding older
+    messages into the summary happens in update_summary, which runs off the request path.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.store = get_conversation_store(db)
+
+    def get_context(self, session_id: str, exclude_message_id: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Return the conversation history for a prompt: the summary (role "summary") followed by
+        the messages not yet folded into it
+        """
+        summary = self.store.get_summary(session_id)
+        last_message_id = summary["last_message_id"] if summary else 0
+
+        recent = self.store.get_recent_messages(
+            session_id, RECENT_MESSAGE_WINDOW + SUMMARIZE_BATCH,
+            after_id=last_message_id, exclude_id=exclude_message_id
+        )
+
+        history = []
+        if summary and summary["summary"]:
+            history.append({"role": "summary", "content": summary["summary"]})
+        history.extend(
+            {"role": message.message_type, "content": message.content}
+            for message in recent
+        )
+        return history
+
+    def update_summary(self, session_id: str, llm_service=None) -> bool:
+        """
+        Fold messages older than the recent window into the rolling summary.
+
+        Uses the LLM when available and an extractive summary otherwise. Returns True when the
+        summary changed.
+        """
+        summary = self.store.get_summary(session_id)
+        last_message_id = summary["last_message_id"] if summary else 0
+
+        # Long pre-existing histories are folded a bounded chunk at a time
+        pending = self.store.get_messages_after(session_id, last_message_id, MAX_FOLD_MESSAGES + RECENT_MESSAGE_WINDOW)
+
+        to_fold = pending[:max(0, len(pending) - RECENT_MESSAGE_WINDOW)]
+        if len(to_fold) < SUMMARIZE_BATCH:
+            return False
+
+        previous = summary["summary"] if summary else ""
+        turns = [{"role": message.message_type, "content": message.content} for message in to_fold]
+
+        new_summary = None
+        if llm_service is not None:
+            try:
+                new_summary = llm_service.summarize_conversation(previous, turns, SUMMARY_MAX_TOKENS)
+            except Exception as e:
+                print(f"Error summarizing conversation with LLM: {e}")
+        if not new_summary:
+            new_summary = self._extractive_summary(previous, turns)
+
+        self.store.save_summary(
+            session_id,
+            truncate_to_tokens(new_summary, SUMMARY_MAX_TOKENS),
+            to_fold[-1].id,
+            (summary["summarized_messages"] if summary else 0) + len(to_fold)
+        )
+        return True
+
+    def _extractive_summary(self, previous: str, turns: List[Dict[str, str]]) -> str:
+        """Summary without an LLM: the first sentence of each turn, keeping the newest within budget"""
+        lines = [line for line in previous.split("\n") if line] if previous else []
+        for turn in turns:
+            speaker = "User" if turn["role"] == "user" else "Assistant"
+            first_line = turn["content"].strip().split("\n")[0]
+            first_sentence = first_line.split(". ")[0].strip("*# ")
+            lines.append(f"{speaker}: {truncate_to_tokens(first_sentence, 40)}")
+
+        # Drop the oldest lines until the summary fits
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > SUMMARY_MAX_TOKENS:
+            lines.pop(0)
+        return "\n".join(lines)
+
+
+def update_conversation_summary(session_id: str):
+    """Background task entry point: refresh a session's summary with its own DB session"""
+    from database import SessionLocal
+    from services.llm_service import LLMService
+
+    db = SessionLocal()
+    try:
+        try:
+            llm_service = LLMService()
+        except Exception:
+            llm_service = None
+        ConversationMemory(db).update_summary(session_id, llm_service)
+    except Exception as e:
+        print(f"Error updating conversation summary: {e}")
+        db.rollback()
+    finally:
+        db.close()
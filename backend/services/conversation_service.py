@@ -1,76 +1,47 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from models import ConversationSession, ConversationMessage
 from schemas import MessageType
-import uuid
-from datetime import datetime
-from typing import Optional, List
+from services.conversation_store import get_conversation_store
+from typing import Optional, List, Dict, Any
 
 class ConversationService:
     def __init__(self, db: Session):
         self.db = db
+        # Backend chosen by CONVERSATION_STORE (main database tables or a dedicated SQLite store)
+        self.store = get_conversation_store(db)
     
-    def create_session(self, user_id: str) -> ConversationSession:
+    def create_session(self, user_id: str) -> Any:
         """Create a new conversation session"""
-        session_id = str(uuid.uuid4())
-        session = ConversationSession(
-            user_id=user_id,
-            session_id=session_id,
-            is_active=True
-        )
-        self.db.add(session)
-        self.db.commit()
-        self.db.refresh(session)
-        return session
+        return self.store.create_session(user_id)
     
-    def get_session(self, session_id: str) -> Optional[ConversationSession]:
+    def get_session(self, session_id: str) -> Optional[Any]:
         """Get an existing conversation session"""
-        return self.db.query(ConversationSession).filter(
-            ConversationSession.session_id == session_id,
-            ConversationSession.is_active == True
-        ).first()
+        return self.store.get_session(session_id)
     
-    def get_user_sessions(self, user_id: str) -> List[ConversationSession]:
+    def get_user_sessions(self, user_id: str) -> List[Any]:
         """Get all active sessions for a user"""
-        return self.db.query(ConversationSession).filter(
-            ConversationSession.user_id == user_id,
-            ConversationSession.is_active == True
-        ).order_by(ConversationSession.updated_at.desc()).all()
+        return self.store.get_user_sessions(user_id)
     
-    def add_message(self, session_id: str, message_type: MessageType, content: str) -> ConversationMessage:
+    def add_message(self, session_id: str, message_type: MessageType, content: str) -> Any:
         """Add a message to a conversation session"""
-        message = ConversationMessage(
-            session_id=session_id,
-            message_type=message_type.value,
-            content=content
-        )
-        self.db.add(message)
-        
-        # Update session's updated_at timestamp
-        session = self.get_session(session_id)
-        if session:
-            session.updated_at = datetime.utcnow()
-        
-        self.db.commit()
-        self.db.refresh(message)
-        return message
+        return self.store.add_message(session_id, message_type.value, content)
     
-    def get_session_messages(self, session_id: str) -> List[ConversationMessage]:
+    def get_session_messages(self, session_id: str) -> List[Any]:
         """Get all messages for a conversation session"""
-        return self.db.query(ConversationMessage).filter(
-            ConversationMessage.session_id == session_id
-        ).order_by(ConversationMessage.timestamp.asc()).all()
+        return self.store.get_session_messages(session_id)
+    
+    def get_user_session_rows(self, user_id: str) -> List[Dict[str, Any]]:
+        """Active sessions of a user with their messages, as plain dicts ready to encode"""
+        return self.store.get_user_session_rows(user_id)
+    
+    def get_session_message_rows(self, session_id: str) -> List[Dict[str, Any]]:
+        """All messages of a session as plain dicts ready to encode"""
+        return self.store.get_session_message_rows(session_id)
     
     def close_session(self, session_id: str) -> bool:
         """Close a conversation session"""
-        session = self.get_session(session_id)
-        if session:
-            session.is_active = False
-            self.db.commit()
-            return True
-        return False
+        return self.store.close_session(session_id)
     
-    def get_or_create_session(self, user_id: str, conversation_id: Optional[str] = None) -> ConversationSession:
+    def get_or_create_session(self, user_id: str, conversation_id: Optional[str] = None) -> Any:
         """Get existing session or create new one"""
         if conversation_id:
             session = self.get_session(conversation_id)
@@ -78,4 +49,4 @@ class ConversationService:
                 return session
         
         # Create new session
-        return self.create_session(user_id) 
\ No newline at end of file
+        return self.create_session(user_id)
\ No newline at end of file
@@ -0,0 +1,585 @@
+import os
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import func, exists, or_, and_
+from sqlalchemy.orm import Session
+from models import ConversationSession, ConversationMessage, ConversationSummary, ConversationArchive
+from services.compression import compress_json, decompress_json
+
+# sqlalchemy: the conversation tables next to the catalogue (default)
+# sqlite: a separate append-optimized SQLite file in WAL mode
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "sqlalchemy")
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", "./conversations.db")
+
+# Fields of the ConversationSession and ConversationMessage response schemas
+SESSION_COLUMNS = (
+    ConversationSession.id, ConversationSession.user_id, ConversationSession.session_id,
+    ConversationSession.created_at, ConversationSession.updated_at, ConversationSession.is_active
+)
+MESSAGE_COLUMNS = (
+    ConversationMessage.id, ConversationMessage.message_type, ConversationMessage.content, ConversationMessage.timestamp
+)
+
+
+class ConversationStore:
+    """
+    Storage for chat sessions, messages and rolling summaries.
+
+    Sessions and messages are returned as objects with the attributes of the ConversationSession
+    and ConversationMessage models, so they serialize through the same response schemas.
+    Summaries are dicts with summary, last_message_id and summarized_messages.
+    """
+
+    def create_session(self, user_id: str):
+        raise NotImplementedError
+
+    def get_session(self, session_id: str):
+        """Active session by id, or None"""
+        raise NotImplementedError
+
+    def get_user_sessions(self, user_id: str) -> List[Any]:
+        raise NotImplementedError
+
+    def close_session(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def count_sessions(self) -> int:
+        raise NotImplementedError
+
+    def add_message(self, session_id: str, message_type: str, content: str):
+        """Append a message and touch the session's updated_at"""
+        raise NotImplementedError
+
+    def get_session_messages(self, session_id: str) -> List[Any]:
+        """All messages of a session, including archived ones, oldest first"""
+        raise NotImplementedError
+
+    def get_user_session_rows(self, user_id: str) -> List[Dict[str, Any]]:
+        """get_user_sessions as plain dicts in the ConversationSession schema's shape, messages included"""
+        return [
+            _session_row(session, [_message_row(message) for message in session.messages])
+            for session in self.get_user_sessions(user_id)
+        ]
+
+    def get_session_message_rows(self, session_id: str) -> List[Dict[str, Any]]:
+        """get_session_messages as plain dicts in the ConversationMessage schema's shape"""
+        return [_message_row(message) for message in self.get_session_messages(session_id)]
+
+    def get_recent_messages(self, session_id: str, limit: int, after_id: int = 0,
+                            exclude_id: Optional[int] = None) -> List[Any]:
+        """The last limit messages with id > after_id, oldest first"""
+        raise NotImplementedError
+
+    def get_messages_after(self, session_id: str, after_id: int, limit: int) -> List[Any]:
+        """The first limit messages with id > after_id, oldest first"""
+        raise NotImplementedError
+
+    def get_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_summary(self, session_id: str, summary: str, last_message_id: int, summarized_messages: int):
+        raise NotImplementedError
+
+    def find_archivable_sessions(self, idle_before: datetime, closed_before: datetime, limit: int) -> List[str]:
+        """Sessions with hot messages that were closed before closed_before or idle since idle_before"""
+        raise NotImplementedError
+
+    def archive_session(self, session_id: str) -> int:
+        """
+        Move a session's hot messages into its compressed archive blob (merging with an earlier
+        blob if the session was resumed) and return how many were moved
+        """
+        raise NotImplementedError
+
+    def get_archived_messages(self, session_id: str) -> List[Any]:
+        raise NotImplementedError
+
+    def archive_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class SQLAlchemyConversationStore(ConversationStore):
+    """Conversation tables in the main database, through the request's session"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_session(self, user_id):
+        session = ConversationSession(
+            user_id=user_id,
+            session_id=str(uuid.uuid4()),
+            is_active=True
+        )
+        self.db.add(session)
+        self.db.commit()
+        self.db.refresh(session)
+        return session
+
+    def get_session(self, session_id):
+        return self.db.query(ConversationSession).filter(
+            ConversationSession.session_id == session_id,
+            ConversationSession.is_active == True
+        ).first()
+
+    def get_user_sessions(self, user_id):
+        return self.db.query(ConversationSession).filter(
+            ConversationSession.user_id == user_id,
+            ConversationSession.is_active == True
+        ).order_by(ConversationSession.updated_at.desc()).all()
+
+    def close_session(self, session_id):
+        session = self.get_session(session_id)
+        if session:
+            session.is_active = False
+            self.db.commit()
+            return True
+        return False
+
+    def count_sessions(self):
+        return self.db.query(ConversationSession).count()
+
+    def add_message(self, session_id, message_type, content):
+        message = ConversationMessage(
+            session_id=session_id,
+            message_type=message_type,
+            content=content
+        )
+        self.db.add(message)
+
+        # Update session's updated_at timestamp
+        session = self.get_session(session_id)
+        if session:
+            session.updated_at = datetime.utcnow()
+
+        self.db.commit()
+        self.db.refresh(message)
+        return message
+
+    def get_session_messages(self, session_id):
+        hot = self.db.query(ConversationMessage).filter(
+            ConversationMessage.session_id == session_id
+        ).order_by(ConversationMessage.timestamp.asc()).all()
+        return self.get_archived_messages(session_id) + hot
+
+    def get_user_session_rows(self, user_id):
+        # Columns only, and every session's messages in one query instead of one lazy load each
+        sessions = [row._asdict() for row in self.db.query(*SESSION_COLUMNS).filter(
+            ConversationSession.user_id == user_id,
+            ConversationSession.is_active == True
+        ).order_by(ConversationSession.updated_at.desc())]
+        messages = {session["session_id"]: [] for session in sessions}
+        if messages:
+            # Archived messages first, as in get_session_messages (idle sessions can still be active)
+            for archive in self.db.query(
+                ConversationArchive.session_id, ConversationArchive.payload, ConversationArchive.codec
+            ).filter(ConversationArchive.session_id.in_(list(messages))):
+                messages[archive.session_id].extend(
+                    _message_row(MessageRecord(message)) for message in decompress_json(archive.payload, archive.codec)
+                )
+            for row in self.db.query(ConversationMessage.session_id, *MESSAGE_COLUMNS).filter(
+                ConversationMessage.session_id.in_(list(messages))
+            ).order_by(ConversationMessage.timestamp.asc()):
+                messages[row.session_id].append(_message_row(row))
+        for session in sessions:
+            session["messages"] = messages[session["session_id"]]
+        return sessions
+
+    def get_session_message_rows(self, session_id):
+        hot = self.db.query(*MESSAGE_COLUMNS).filter(
+            ConversationMessage.session_id == session_id
+        ).order_by(ConversationMessage.timestamp.asc())
+        return [_message_row(message) for message in self.get_archived_messages(session_id)] + [
+            row._asdict() for row in hot
+        ]
+
+    def get_recent_messages(self, session_id, limit, after_id=0, exclude_id=None):
+        query = self.db.query(ConversationMessage).filter(
+            ConversationMessage.session_id == session_id,
+            ConversationMessage.id > after_id
+        )
+        if exclude_id is not None:
+            query = query.filter(ConversationMessage.id != exclude_id)
+        recent = query.order_by(ConversationMessage.id.desc()).limit(limit).all()
+        return list(reversed(recent))
+
+    def get_messages_after(self, session_id, after_id, limit):
+        return self.db.query(ConversationMessage).filter(
+            ConversationMessage.session_id == session_id,
+            ConversationMessage.id > after_id
+        ).order_by(ConversationMessage.id.asc()).limit(limit).all()
+
+    def get_summary(self, session_id):
+        summary = self._get_summary_row(session_id)
+        if summary is None:
+            return None
+        return {
+            "summary": summary.summary,
+            "last_message_id": summary.last_message_id,
+            "summarized_messages": summary.summarized_messages or 0
+        }
+
+    def save_summary(self, session_id, summary, last_message_id, summarized_messages):
+        row = self._get_summary_row(session_id)
+        if row is None:
+            row = ConversationSummary(session_id=session_id)
+            self.db.add(row)
+        row.summary = summary
+        row.last_message_id = last_message_id
+        row.summarized_messages = summarized_messages
+        self.db.commit()
+
+    def _get_summary_row(self, session_id) -> Optional[ConversationSummary]:
+        return self.db.query(ConversationSummary).filter(
+            ConversationSummary.session_id == session_id
+        ).first()
+
+    def find_archivable_sessions(self, idle_before, closed_before, limit):
+        rows = self.db.query(ConversationSession.session_id).filter(
+            or_(
+                ConversationSession.updated_at < idle_before,
+                and_(ConversationSession.is_active == False, ConversationSession.updated_at < closed_before)
+            ),
+            exists().where(ConversationMessage.session_id == ConversationSession.session_id)
+        ).order_by(ConversationSession.updated_at.asc()).limit(limit).all()
+        return [row.session_id for row in rows]
+
+    def archive_session(self, session_id):
+        hot = self.db.query(ConversationMessage).filter(
+            ConversationMessage.session_id == session_id
+        ).order_by(ConversationMessage.id.asc()).all()
+        if not hot:
+            return 0
+
+        archive = self._get_archive_row(session_id)
+        messages = decompress_json(archive.payload, archive.codec) if archive else []
+        messages.extend(_message_to_dict(message) for message in hot)
+        if archive is None:
+            session = self.db.query(ConversationSession).filter(ConversationSession.session_id == session_id).first()
+            archive = ConversationArchive(session_id=session_id, user_id=session.user_id if session else None)
+            self.db.add(archive)
+        _fill_archive(archive, messages)
+
+        # The blob and the deletion commit together, so a message is never in neither place
+        self.db.query(ConversationMessage).filter(
+            ConversationMessage.session_id == session_id,
+            ConversationMessage.id <= hot[-1].id
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return len(hot)
+
+    def get_archived_messages(self, session_id):
+        archive = self._get_archive_row(session_id)
+        if archive is None:
+            return []
+        return [MessageRecord(message) for message in decompress_json(archive.payload, archive.codec)]
+
+    def archive_stats(self):
+        archived = self.db.query(
+            func.count(ConversationArchive.id),
+            func.coalesce(func.sum(ConversationArchive.message_count), 0),
+            func.coalesce(func.sum(ConversationArchive.raw_bytes), 0),
+            func.coalesce(func.sum(func.length(ConversationArchive.payload)), 0)
+        ).one()
+        return {
+            "hot_messages": self.db.query(ConversationMessage).count(),
+            "archived_sessions": archived[0],
+            "archived_messages": archived[1],
+            "raw_bytes": archived[2],
+            "compressed_bytes": archived[3]
+        }
+
+    def _get_archive_row(self, session_id) -> Optional[ConversationArchive]:
+        return self.db.query(ConversationArchive).filter(
+            ConversationArchive.session_id == session_id
+        ).first()
+
+
+def _session_row(session, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "id": session.id,
+        "user_id": session.user_id,
+        "session_id": session.session_id,
+        "created_at": session.created_at,
+        "updated_at": session.updated_at,
+        "is_active": session.is_active,
+        "messages": messages
+    }
+
+
+def _message_row(message) -> Dict[str, Any]:
+    return {"id": message.id, "message_type": message.message_type, "content": message.content,
+            "timestamp": message.timestamp}
+
+
+def _message_to_dict(message) -> Dict[str, Any]:
+    timestamp = message.timestamp
+    return {
+        "id": message.id,
+        "session_id": message.session_id,
+        "message_type": message.message_type,
+        "content": message.content,
+        "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+    }
+
+
+def _fill_archive(archive, messages: List[Dict[str, Any]]):
+    archive.payload, archive.codec = compress_json(messages)
+    archive.raw_bytes = sum(len(message["content"]) for message in messages)
+    archive.message_count = len(messages)
+    archive.first_message_at = _parse_time(messages[0]["timestamp"])
+    archive.last_message_at = _parse_time(messages[-1]["timestamp"])
+    archive.archived_at = datetime.utcnow()
+
+
+class SessionRecord:
+    """A session row from the SQLite store; messages load on first access"""
+
+    def __init__(self, store: "SQLiteConversationStore", row: sqlite3.Row):
+        self._store = store
+        self.id = row["id"]
+        self.session_id = row["session_id"]
+        self.user_id = row["user_id"]
+        self.created_at = _parse_time(row["created_at"])
+        self.updated_at = _parse_time(row["updated_at"])
+        self.is_active = bool(row["is_active"])
+        self._messages = None
+
+    @property
+    def messages(self) -> List["MessageRecord"]:
+        if self._messages is None:
+            self._messages = self._store.get_session_messages(self.session_id)
+        return self._messages
+
+
+class MessageRecord:
+    def __init__(self, row: sqlite3.Row):
+        self.id = row["id"]
+        self.session_id = row["session_id"]
+        self.message_type = row["message_type"]
+        self.content = row["content"]
+        self.timestamp = _parse_time(row["timestamp"])
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Append-optimized conversation store in its own SQLite file.
+
+    WAL mode makes each turn a sequential append that never blocks readers, and messages are
+    keyed by (session_id, id) so "last N messages of a session" is a single index range scan.
+    Chat writes no longer compete with the catalogue database, and all workers on a host
+    share the file.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT NOT NULL UNIQUE,
+        user_id TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        is_active INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id, is_active, updated_at);
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        message_type TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+    CREATE TABLE IF NOT EXISTS archives (
+        session_id TEXT PRIMARY KEY,
+        user_id TEXT,
+        message_count INTEGER NOT NULL,
+        codec TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        raw_bytes INTEGER NOT NULL,
+        first_message_at TEXT,
+        last_message_at TEXT,
+        archived_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS summaries (
+        session_id TEXT PRIMARY KEY,
+        summary TEXT NOT NULL,
+        last_message_id INTEGER NOT NULL,
+        summarized_messages INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path: str = CONVERSATION_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints rather than every commit; a crash can lose the last turns
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create_session(self, user_id):
+        now = datetime.utcnow().isoformat()
+        conn = self._connection()
+        cursor = conn.execute(
+            "INSERT INTO sessions (session_id, user_id, created_at, updated_at, is_active) VALUES (?, ?, ?, ?, 1)",
+            (str(uuid.uuid4()), user_id, now, now)
+        )
+        row = conn.execute("SELECT * FROM sessions WHERE id = ?", (cursor.lastrowid,)).fetchone()
+        return SessionRecord(self, row)
+
+    def get_session(self, session_id):
+        row = self._connection().execute(
+            "SELECT * FROM sessions WHERE session_id = ? AND is_active = 1", (session_id,)
+        ).fetchone()
+        return SessionRecord(self, row) if row else None
+
+    def get_user_sessions(self, user_id):
+        rows = self._connection().execute(
+            "SELECT * FROM sessions WHERE user_id = ? AND is_active = 1 ORDER BY updated_at DESC", (user_id,)
+        ).fetchall()
+        return [SessionRecord(self, row) for row in rows]
+
+    def close_session(self, session_id):
+        cursor = self._connection().execute(
+            "UPDATE sessions SET is_active = 0 WHERE session_id = ? AND is_active = 1", (session_id,)
+        )
+        return cursor.rowcount > 0
+
+    def count_sessions(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def add_message(self, session_id, message_type, content):
+        now = datetime.utcnow().isoformat()
+        conn = self._connection()
+        # One write transaction per turn: the append and the session touch
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "INSERT INTO messages (session_id, message_type, content, timestamp) VALUES (?, ?, ?, ?)",
+                (session_id, message_type, content, now)
+            )
+            conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ? AND is_active = 1", (now, session_id))
+        return MessageRecord({
+            "id": cursor.lastrowid, "session_id": session_id, "message_type": message_type,
+            "content": content, "timestamp": now
+        })
+
+    def get_session_messages(self, session_id):
+        rows = self._connection().execute(
+            "SELECT * FROM messages WHERE session_id = ? ORDER BY id ASC", (session_id,)
+        ).fetchall()
+        return self.get_archived_messages(session_id) + [MessageRecord(row) for row in rows]
+
+    def get_recent_messages(self, session_id, limit, after_id=0, exclude_id=None):
+        rows = self._connection().execute(
+            "SELECT * FROM messages WHERE session_id = ? AND id > ? AND id != ? ORDER BY id DESC LIMIT ?",
+            (session_id, after_id, exclude_id if exclude_id is not None else -1, limit)
+        ).fetchall()
+        return [MessageRecord(row) for row in reversed(rows)]
+
+    def get_messages_after(self, session_id, after_id, limit):
+        rows = self._connection().execute(
+            "SELECT * FROM messages WHERE session_id = ? AND id > ? ORDER BY id ASC LIMIT ?",
+            (session_id, after_id, limit)
+        ).fetchall()
+        return [MessageRecord(row) for row in rows]
+
+    def get_summary(self, session_id):
+        row = self._connection().execute(
+            "SELECT summary, last_message_id, summarized_messages FROM summaries WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def save_summary(self, session_id, summary, last_message_id, summarized_messages):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO summaries (session_id, summary, last_message_id, summarized_messages, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (session_id, summary, last_message_id, summarized_messages, datetime.utcnow().isoformat())
+        )
+
+    def find_archivable_sessions(self, idle_before, closed_before, limit):
+        rows = self._connection().execute(
+            "SELECT session_id FROM sessions s "
+            "WHERE (updated_at < ? OR (is_active = 0 AND updated_at < ?)) "
+            "AND EXISTS (SELECT 1 FROM messages m WHERE m.session_id = s.session_id) "
+            "ORDER BY updated_at ASC LIMIT ?",
+            (idle_before.isoformat(), closed_before.isoformat(), limit)
+        ).fetchall()
+        return [row["session_id"] for row in rows]
+
+    def archive_session(self, session_id):
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            hot = conn.execute(
+                "SELECT * FROM messages WHERE session_id = ? ORDER BY id ASC", (session_id,)
+            ).fetchall()
+            if not hot:
+                return 0
+            archive = conn.execute("SELECT payload, codec FROM archives WHERE session_id = ?", (session_id,)).fetchone()
+            messages = decompress_json(archive["payload"], archive["codec"]) if archive else []
+            messages.extend(dict(row) for row in hot)
+            user = conn.execute("SELECT user_id FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+
+            payload, codec = compress_json(messages)
+            conn.execute(
+                "INSERT OR REPLACE INTO archives (session_id, user_id, message_count, codec, payload, raw_bytes, "
+                "first_message_at, last_message_at, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, user["user_id"] if user else None, len(messages), codec, payload,
+                 sum(len(message["content"]) for message in messages), messages[0]["timestamp"],
+                 messages[-1]["timestamp"], datetime.utcnow().isoformat())
+            )
+            conn.execute("DELETE FROM messages WHERE session_id = ? AND id <= ?", (session_id, hot[-1]["id"]))
+        return len(hot)
+
+    def get_archived_messages(self, session_id):
+        row = self._connection().execute(
+            "SELECT payload, codec FROM archives WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return []
+        return [MessageRecord(message) for message in decompress_json(row["payload"], row["codec"])]
+
+    def archive_stats(self):
+        conn = self._connection()
+        archived = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(message_count), 0), COALESCE(SUM(raw_bytes), 0), "
+            "COALESCE(SUM(LENGTH(payload)), 0) FROM archives"
+        ).fetchone()
+        return {
+            "hot_messages": conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0],
+            "archived_sessions": archived[0],
+            "archived_messages": archived[1],
+            "raw_bytes": archived[2],
+            "compressed_bytes": archived[3]
+        }
+
+
+_sqlite_store: Optional[SQLiteConversationStore] = None
+_sqlite_store_lock = threading.Lock()
+
+
+def get_conversation_store(db: Session) -> ConversationStore:
+    """The configured store; the SQLite store is shared by the whole process"""
+    global _sqlite_store
+    if CONVERSATION_STORE == "sqlite":
+        with _sqlite_store_lock:
+            if _sqlite_store is None:
+                _sqlite_store = SQLiteConversationStore(CONVERSATION_STORE_PATH)
+            return _sqlite_store
+    return SQLAlchemyConversationStore(db)
@@ -1,16 +1,47 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, and_, or_
 from models import User, Order, OrderItem, InventoryItem, DistributionCenter
-from schemas import TopProductResponse, OrderStatusResponse, StockLevelResponse
-from typing import List, Optional, Dict, Any
+from schemas import (
+    TopProductResponse, OrderStatusResponse, StockLevelResponse, NearestDistributionCenterResponse, OrderEtaResponse,
+    ProductRecommendationResponse, TrendingProductResponse
+)
+from services.cache import cache
+from services.entity_cache import (
+    entity_cache, order_snapshot, order_version, customer_record, ORDER_VERSION_FIELDS, ENTITY_CACHE_VERIFY
+)
+from services.pagination import Keyset, stream_rows, STREAM_BATCH_SIZE
+from services.spatial_index import get_distribution_center_index, haversine_km
+from services.eta_model import get_eta_model, estimate_delivery
+from services.recommendations import get_recommendation_index
+from services.trending import trending
+from services.approx_analytics import approximate_sales_analytics, APPROXIMATE_ANALYTICS
+from typing import List, Optional, Dict, Any, Iterator, Tuple
+from itertools import islice
+import os
 import re
 
+# Aggregates over the whole catalogue change slowly; share them between requests and workers
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+
+# Keyset orderings of the list methods; each ends with a unique column.
+# created_at is always set on insert (column default), so it is compared as-is.
+ORDERS_BY_DATE_KEYSET = Keyset(Order.created_at, Order.order_id, descending=True)
+ORDERS_KEYSET = Keyset(Order.order_id)
+INVENTORY_KEYSET = Keyset(InventoryItem.id)
+# Stock levels are one row per (name, category, brand) group
+STOCK_LEVELS_KEYSET = Keyset(InventoryItem.product_name, InventoryItem.product_category, InventoryItem.product_brand)
+
 class EcommerceService:
     def __init__(self, db: Session):
         self.db = db
     
     def get_top_products(self, limit: int = 5) -> List[TopProductResponse]:
         """Get top selling products by revenue"""
+        rows = cache.get_or_set(f"top_products:{limit}", ANALYTICS_CACHE_TTL,
+                                lambda: [product.dict() for product in self._query_top_products(limit)])
+        return [TopProductResponse(**row) for row in rows]
+    
+    def _query_top_products(self, limit: int) -> List[TopProductResponse]:
         # Query to get top products by total sales
         top_products = self.db.query(
             InventoryItem.product_name,
@@ -33,35 +64,159 @@ class EcommerceService:
             for product in top_products
         ]
     
+    def get_trending_products(self, window: Optional[str] = None, limit: int = 5, category: Optional[str] = None,
+                              department: Optional[str] = None) -> List[TrendingProductResponse]:
+        """
+        Best sellers of a recent window (e.g. "1h", "24h"), optionally within one category or
+        department, from the in-process heavy-hitter sketches (no database access)
+        """
+        return [TrendingProductResponse(**product) for product in trending.top(window, limit, category, department)]
+    
     def get_order_status(self, order_id: int) -> Optional[OrderStatusResponse]:
         """Get detailed order status by order ID"""
-        order = self.db.query(Order).filter(Order.order_id == order_id).first()
-        
-        if not order:
+        snapshot = self._order_snapshot(order_id)
+        if snapshot is None:
             return None
+        customer = self.get_customer(snapshot["user_id"]) if snapshot["user_id"] else None
+        return _order_status_response(snapshot, _display_name(customer))
+    
+    def _order_snapshot(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """Order fields and items count, from the entity cache when its shipment state is current"""
+        snapshot = entity_cache.get_order(order_id)
+        if snapshot is not None and ENTITY_CACHE_VERIFY:
+            # One primary-key probe of the shipment fields instead of reloading the order and its items
+            current = self.db.query(*_order_version_columns()).filter(Order.order_id == order_id).first()
+            if current is None or order_version(current) != snapshot["version"]:
+                entity_cache.discard_stale_order(order_id)
+                snapshot = None
         
-        # Get user name if available
-        user_name = None
-        if order.user_id:
-            user = self.db.query(User).filter(User.id == order.user_id).first()
-            if user:
-                user_name = f"{user.first_name} {user.last_name}"
-        
-        # Get items count
-        items_count = self.db.query(OrderItem).filter(OrderItem.order_id == order_id).count()
+        if snapshot is None:
+            generation = entity_cache.generation()
+            order = self.db.query(Order).filter(Order.order_id == order_id).first()
+            
+            if not order:
+                return None
+            
+            # Get items count
+            items_count = self.db.query(OrderItem).filter(OrderItem.order_id == order_id).count()
+            snapshot = order_snapshot(order, items_count)
+            entity_cache.put_order(snapshot, generation)
+        return snapshot
+    
+    def get_order_eta(self, order_id: int) -> Optional[OrderEtaResponse]:
+        """Delivery window of an order from the precomputed lead-time model"""
+        snapshot = self._order_snapshot(order_id)
+        if snapshot is None:
+            return None
+        model = get_eta_model()
+        if model is None:
+            return OrderEtaResponse(order_id=order_id, status=snapshot["status"], stage="unknown")
         
-        return OrderStatusResponse(
-            order_id=order.order_id,
-            status=order.status,
-            user_name=user_name,
-            items_count=items_count,
-            created_at=order.created_at,
-            shipped_at=order.shipped_at,
-            delivered_at=order.delivered_at
+        dc_ids = [center_id for (center_id,) in self.db.query(
+            InventoryItem.product_distribution_center_id
+        ).join(
+            OrderItem, OrderItem.inventory_item_id == InventoryItem.id
+        ).filter(
+            OrderItem.order_id == order_id,
+            InventoryItem.product_distribution_center_id.isnot(None)
+        ).distinct()]
+        customer = self.get_customer(snapshot["user_id"]) if snapshot["user_id"] else None
+        estimate = estimate_delivery(
+            model, snapshot["status"], snapshot["created_at"], snapshot["shipped_at"], snapshot["delivered_at"],
+            snapshot["returned_at"], dc_ids, customer["state"] if customer else None
         )
+        return OrderEtaResponse(order_id=order_id, status=snapshot["status"], **estimate)
+    
+    def get_order_statuses(self, order_ids: List[int]) -> Dict[int, OrderStatusResponse]:
+        """Order status for many orders with three set-based queries instead of three per order"""
+        snapshots = {}
+        for chunk in _chunks(sorted(set(order_ids))):
+            cached = {}
+            for order_id in chunk:
+                snapshot = entity_cache.get_order(order_id)
+                if snapshot is not None:
+                    cached[order_id] = snapshot
+            if cached and ENTITY_CACHE_VERIFY:
+                current = {
+                    row.order_id: order_version(row)
+                    for row in self.db.query(Order.order_id, *_order_version_columns()).filter(
+                        Order.order_id.in_(list(cached))
+                    )
+                }
+                for order_id, snapshot in list(cached.items()):
+                    if current.get(order_id) != snapshot["version"]:
+                        entity_cache.discard_stale_order(order_id)
+                        del cached[order_id]
+            snapshots.update(cached)
+            
+            missing = [order_id for order_id in chunk if order_id not in cached]
+            if not missing:
+                continue
+            generation = entity_cache.generation()
+            orders = self.db.query(Order).filter(Order.order_id.in_(missing)).all()
+            items_counts = dict(
+                self.db.query(OrderItem.order_id, func.count(OrderItem.id)).filter(
+                    OrderItem.order_id.in_(missing)
+                ).group_by(OrderItem.order_id).all()
+            )
+            for order in orders:
+                snapshot = order_snapshot(order, items_counts.get(order.order_id, 0))
+                entity_cache.put_order(snapshot, generation)
+                snapshots[order.order_id] = snapshot
+        
+        customers = self.get_customers([snapshot["user_id"] for snapshot in snapshots.values() if snapshot["user_id"]])
+        return {
+            order_id: _order_status_response(snapshot, _display_name(customers.get(snapshot["user_id"])))
+            for order_id, snapshot in snapshots.items()
+        }
     
-    def get_stock_levels(self, product_name: str = None) -> List[StockLevelResponse]:
-        """Get stock levels for products"""
+    def get_customer(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Customer display data (name, email, location), served from the entity cache"""
+        customer = entity_cache.get_customer(user_id)
+        if customer is None:
+            generation = entity_cache.generation()
+            user = self.db.query(User).filter(User.id == user_id).first()
+            if not user:
+                return None
+            customer = customer_record(user)
+            entity_cache.put_customer(customer, generation)
+        return customer
+    
+    def get_customers(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Customer display data for many users; cache misses are loaded with one query per chunk"""
+        customers = {}
+        missing = []
+        for user_id in sorted(set(user_ids)):
+            customer = entity_cache.get_customer(user_id)
+            if customer is None:
+                missing.append(user_id)
+            else:
+                customers[user_id] = customer
+        for chunk in _chunks(missing):
+            generation = entity_cache.generation()
+            for user in self.db.query(User).filter(User.id.in_(chunk)):
+                customer = customers[user.id] = customer_record(user)
+                entity_cache.put_customer(customer, generation)
+        return customers
+    
+    def get_stock_levels(self, product_name: str = None, limit: Optional[int] = None,
+                         after: Optional[str] = None, match: Optional[str] = None) -> List[StockLevelResponse]:
+        """
+        Get stock levels for products (a page of them with limit/after). match says what a
+        catalog-resolved product_name is (see _product_filter); a substring search without it.
+        """
+        query = self._stock_levels_query(product_name, after, match)
+        if limit:
+            query = query.limit(limit)
+        return [_stock_level_response(result) for result in query]
+    
+    def iter_stock_levels(self, product_name: str = None, after: Optional[str] = None,
+                          limit: Optional[int] = None, match: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream stock levels (plain dicts in StockLevelResponse's shape) in keyset order without holding the result set"""
+        for result in stream_rows(_limited(self._stock_levels_query(product_name, after, match), limit)):
+            yield _stock_level_row(result)
+    
+    def _stock_levels_query(self, product_name: Optional[str], after: Optional[str], match: Optional[str] = None):
         query = self.db.query(
             InventoryItem.product_name,
             func.count(InventoryItem.id).label('total_inventory'),
@@ -75,51 +230,271 @@ class EcommerceService:
         )
         
         if product_name:
-            query = query.filter(InventoryItem.product_name.ilike(f"%{product_name}%"))
+            query = query.filter(_product_filter(product_name, match))
         
-        results = query.all()
+        return STOCK_LEVELS_KEYSET.apply(query, after)
+    
+    def get_stock_levels_for_products(self, product_names: List[str],
+                                      matches: Optional[Dict[str, str]] = None) -> Dict[str, List[StockLevelResponse]]:
+        """
+        Stock levels for several product searches with one grouped query per 100 terms;
+        matches gives the match kind of catalog-resolved names (substring search otherwise)
+        """
+        matches = matches or {}
+        names = sorted(set(product_names))
+        if not names:
+            return {}
+        results = {}
+        for chunk in _chunks(names, 100):
+            for result in self.db.query(
+                InventoryItem.product_name,
+                func.count(InventoryItem.id).label('total_inventory'),
+                func.count(InventoryItem.sold_at).label('sold_count'),
+                InventoryItem.product_category,
+                InventoryItem.product_brand
+            ).filter(
+                or_(*[_product_filter(name, matches.get(name)) for name in chunk])
+            ).group_by(
+                InventoryItem.product_name,
+                InventoryItem.product_category,
+                InventoryItem.product_brand
+            ):
+                # A product matched by terms in two chunks comes back twice
+                results[(result.product_name, result.product_category, result.product_brand)] = result
         
-        return [
-            StockLevelResponse(
-                product_name=result.product_name,
-                available_stock=result.total_inventory - result.sold_count,
-                total_inventory=result.total_inventory,
-                product_category=result.product_category,
-                product_brand=result.product_brand
-            )
-            for result in results
-        ]
+        levels = [_stock_level_response(result) for result in results.values()]
+        # Same matching as the filter, applied per search term
+        return {
+            name: [level for level in levels if _product_matches(name, matches.get(name), level)] for name in names
+        }
+    
+    def get_user_orders(self, user_id: int, limit: Optional[int] = None, after: Optional[str] = None) -> List[Order]:
+        """Get orders for a specific user, newest first (a page of them with limit/after)"""
+        return _limited(ORDERS_BY_DATE_KEYSET.apply(
+            self.db.query(Order).filter(Order.user_id == user_id), after
+        ), limit).all()
+    
+    def iter_user_orders(self, user_id: int, after: Optional[str] = None, limit: Optional[int] = None) -> Iterator[Any]:
+        """Stream a user's orders as row tuples, newest first"""
+        return stream_rows(_limited(ORDERS_BY_DATE_KEYSET.apply(
+            self.db.query(*Order.__table__.columns).filter(Order.user_id == user_id), after
+        ), limit))
+    
+    def count_user_orders(self, user_id: int) -> int:
+        return self.db.query(func.count(Order.order_id)).filter(Order.user_id == user_id).scalar()
+    
+    def get_orders_for_users(self, user_ids: List[int], limit: int) -> Tuple[Dict[int, List[Order]], Dict[int, int]]:
+        """
+        The newest limit orders of many users (in get_user_orders' order) and each user's order
+        count, with one query per chunk of ids
+        """
+        orders = {user_id: [] for user_id in set(user_ids)}
+        totals = {user_id: 0 for user_id in orders}
+        for chunk in _chunks(sorted(orders)):
+            ranked = self.db.query(
+                Order.order_id,
+                func.row_number().over(
+                    partition_by=Order.user_id, order_by=(desc(Order.created_at), desc(Order.order_id))
+                ).label("rank"),
+                func.count().over(partition_by=Order.user_id).label("total")
+            ).filter(Order.user_id.in_(chunk)).subquery()
+            for order, total in self.db.query(Order, ranked.c.total).join(
+                ranked, ranked.c.order_id == Order.order_id
+            ).filter(ranked.c.rank <= limit).order_by(Order.user_id, ranked.c.rank):
+                orders[order.user_id].append(order)
+                totals[order.user_id] = total
+        return orders, totals
+    
+    def get_product_details(self, product_name: str, limit: Optional[int] = None, after: Optional[str] = None,
+                            unique: bool = False, match: Optional[str] = None) -> List[InventoryItem]:
+        """
+        Get detailed information about a specific product (a page of items with limit/after).
+        With unique, only the first inventory item of each matching product name is returned.
+        """
+        query = self.db.query(InventoryItem).filter(_product_filter(product_name, match))
+        if unique:
+            query = query.filter(InventoryItem.id.in_(
+                self.db.query(func.min(InventoryItem.id)).filter(
+                    _product_filter(product_name, match)
+                ).group_by(InventoryItem.product_name)
+            ))
+        return _limited(INVENTORY_KEYSET.apply(query, after), limit).all()
     
-    def get_user_orders(self, user_id: int) -> List[Order]:
-        """Get all orders for a specific user"""
-        return self.db.query(Order).filter(Order.user_id == user_id).order_by(desc(Order.created_at)).all()
+    def iter_product_details(self, product_name: str, after: Optional[str] = None,
+                             limit: Optional[int] = None, match: Optional[str] = None) -> Iterator[Any]:
+        """Stream the inventory items of matching products as row tuples (match as for get_product_details)"""
+        return stream_rows(_limited(INVENTORY_KEYSET.apply(
+            self.db.query(*InventoryItem.__table__.columns).filter(_product_filter(product_name, match)), after
+        ), limit))
     
-    def get_product_details(self, product_name: str) -> List[InventoryItem]:
-        """Get detailed information about a specific product"""
-        return self.db.query(InventoryItem).filter(
-            InventoryItem.product_name.ilike(f"%{product_name}%")
-        ).all()
+    def get_product_details_for_products(self, product_names: List[str],
+                                         matches: Optional[Dict[str, str]] = None) -> Dict[str, List[InventoryItem]]:
+        """Product details for several product searches with one query per 100 terms (matches as for stock levels)"""
+        matches = matches or {}
+        names = sorted(set(product_names))
+        if not names:
+            return {}
+        items = {}
+        for chunk in _chunks(names, 100):
+            for item in self.db.query(InventoryItem).filter(
+                or_(*[_product_filter(name, matches.get(name)) for name in chunk])
+            ):
+                items[item.id] = item
+        items = list(items.values())
+        return {name: [item for item in items if _product_matches(name, matches.get(name), item)] for name in names}
     
-    def get_recent_orders(self, limit: int = 10) -> List[Order]:
+    def get_recommendations(self, product_id: int, limit: int = 5) -> Optional[List[ProductRecommendationResponse]]:
+        """
+        Products customers also bought, from the precomputed co-occurrence index (no database
+        access). None if there is no index or the product has no co-purchases in it.
+        """
+        index = get_recommendation_index()
+        recommendations = index.recommend(product_id, limit) if index is not None else None
+        if recommendations is None:
+            return None
+        return [ProductRecommendationResponse(**recommendation) for recommendation in recommendations]
+    
+    def get_recent_orders(self, limit: int = 10, after: Optional[str] = None) -> List[Order]:
         """Get recent orders"""
-        return self.db.query(Order).order_by(desc(Order.created_at)).limit(limit).all()
+        return ORDERS_BY_DATE_KEYSET.apply(self.db.query(Order), after).limit(limit).all()
+    
+    def get_orders_by_status(self, status: str, limit: Optional[int] = None, after: Optional[str] = None) -> List[Order]:
+        """Get orders by status (a page of them with limit/after)"""
+        return _limited(ORDERS_KEYSET.apply(self.db.query(Order).filter(Order.status == status), after), limit).all()
+    
+    def iter_orders_by_status(self, status: str, after: Optional[str] = None, limit: Optional[int] = None) -> Iterator[Any]:
+        """Stream orders with a status as row tuples"""
+        return stream_rows(_limited(ORDERS_KEYSET.apply(
+            self.db.query(*Order.__table__.columns).filter(Order.status == status), after
+        ), limit))
     
-    def get_orders_by_status(self, status: str) -> List[Order]:
-        """Get orders by status"""
-        return self.db.query(Order).filter(Order.status == status).all()
+    def get_inventory_by_category(self, category: str, limit: Optional[int] = None,
+                                  after: Optional[str] = None, match: Optional[str] = None) -> List[InventoryItem]:
+        """
+        Get inventory items by category (a page of them with limit/after). match="category" for
+        a catalog-resolved category (equality); a substring search without it.
+        """
+        return _limited(INVENTORY_KEYSET.apply(
+            self.db.query(InventoryItem).filter(_category_filter(category, match)), after
+        ), limit).all()
     
-    def get_inventory_by_category(self, category: str) -> List[InventoryItem]:
-        """Get inventory items by category"""
-        return self.db.query(InventoryItem).filter(
-            InventoryItem.product_category.ilike(f"%{category}%")
-        ).all()
+    def iter_inventory_by_category(self, category: str, after: Optional[str] = None,
+                                   limit: Optional[int] = None, match: Optional[str] = None) -> Iterator[Any]:
+        """Stream inventory items of a category as row tuples (match as for get_inventory_by_category)"""
+        return stream_rows(_limited(INVENTORY_KEYSET.apply(
+            self.db.query(*InventoryItem.__table__.columns).filter(_category_filter(category, match)), after
+        ), limit))
     
     def get_distribution_centers(self) -> List[DistributionCenter]:
         """Get all distribution centers"""
         return self.db.query(DistributionCenter).all()
     
-    def get_sales_analytics(self) -> Dict[str, Any]:
-        """Get overall sales analytics"""
+    def get_nearest_distribution_centers(self, latitude: float, longitude: float, product_name: Optional[str] = None,
+                                         limit: int = 1, match: Optional[str] = None) -> List[NearestDistributionCenterResponse]:
+        """
+        Nearest distribution centers to a point, from the in-memory spatial index. With
+        product_name, only centers holding unsold stock of a matching product qualify.
+        """
+        index = get_distribution_center_index(self.db)
+        stock = self.get_stock_by_distribution_center(product_name, match) if product_name else None
+        centers = []
+        for position, distance_km in index.ranked(latitude, longitude):
+            center_id = int(index.ids[position])
+            if stock is not None and not stock.get(center_id):
+                continue
+            centers.append(_center_response(index, position, distance_km=distance_km,
+                                            available_stock=stock.get(center_id) if stock is not None else None))
+            if len(centers) >= limit:
+                break
+        return centers
+    
+    def get_nearest_distribution_centers_for_user(self, user_id: int, product_name: Optional[str] = None, limit: int = 1,
+                                                  match: Optional[str] = None) -> Optional[List[NearestDistributionCenterResponse]]:
+        """Nearest centers to a customer's address; None if the user or their location is unknown"""
+        customer = self.get_customer(user_id)
+        if not customer or customer["latitude"] is None or customer["longitude"] is None:
+            return None
+        return self.get_nearest_distribution_centers(customer["latitude"], customer["longitude"], product_name, limit, match)
+    
+    def get_stock_by_distribution_center(self, product_name: str, match: Optional[str] = None) -> Dict[int, int]:
+        """Unsold items of products matching product_name, per distribution center id"""
+        return dict(
+            self.db.query(InventoryItem.product_distribution_center_id, func.count(InventoryItem.id)).filter(
+                _product_filter(product_name, match),
+                InventoryItem.sold_at.is_(None),
+                InventoryItem.product_distribution_center_id.isnot(None)
+            ).group_by(InventoryItem.product_distribution_center_id).all()
+        )
+    
+    def get_order_distribution_centers(self, order_id: int) -> List[NearestDistributionCenterResponse]:
+        """Centers an order's items ship from, with their distance to the customer when known"""
+        rows = self.db.query(
+            InventoryItem.product_distribution_center_id, func.count(OrderItem.id)
+        ).join(
+            InventoryItem, OrderItem.inventory_item_id == InventoryItem.id
+        ).filter(
+            OrderItem.order_id == order_id,
+            InventoryItem.product_distribution_center_id.isnot(None)
+        ).group_by(InventoryItem.product_distribution_center_id).all()
+        if not rows:
+            return []
+        
+        index = get_distribution_center_index(self.db)
+        positions = {int(center_id): position for position, center_id in enumerate(index.ids)}
+        user_id = self.db.query(Order.user_id).filter(Order.order_id == order_id).scalar()
+        customer = self.get_customer(user_id) if user_id else None
+        
+        centers = []
+        for center_id, items_count in rows:
+            position = positions.get(center_id)
+            if position is None:
+                continue
+            distance_km = None
+            if customer and customer["latitude"] is not None and customer["longitude"] is not None:
+                distance_km = float(haversine_km(customer["latitude"], customer["longitude"],
+                                                  index.latitudes[position], index.longitudes[position]))
+            centers.append(_center_response(index, position, distance_km=distance_km, items_count=items_count))
+        return sorted(centers, key=lambda center: -center.items_count)
+    
+    def assign_users_to_distribution_centers(self, after: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Nearest center of every user with a location, for logistics analysis. Users are read
+        through a server-side cursor and assigned one vectorized chunk at a time.
+        """
+        index = get_distribution_center_index(self.db)
+        if not len(index):
+            return
+        query = self.db.query(User.id, User.latitude, User.longitude).filter(
+            User.latitude.isnot(None), User.longitude.isnot(None)
+        )
+        if after is not None:
+            query = query.filter(User.id > after)
+        
+        rows = stream_rows(query.order_by(User.id))
+        while True:
+            chunk = list(islice(rows, STREAM_BATCH_SIZE))
+            if not chunk:
+                break
+            positions, distances = index.nearest_many([row.latitude for row in chunk], [row.longitude for row in chunk])
+            for row, position, distance_km in zip(chunk, positions, distances):
+                yield {
+                    "user_id": row.id,
+                    "distribution_center_id": int(index.ids[position]),
+                    "distribution_center": index.names[position],
+                    "distance_km": round(float(distance_km), 2)
+                }
+    
+    def get_sales_analytics(self, approximate: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Get overall sales analytics. approximate (default APPROXIMATE_ANALYTICS) answers from
+        monthly sketches, reading only the current month, and reports error bounds.
+        """
+        if APPROXIMATE_ANALYTICS if approximate is None else approximate:
+            return cache.get_or_set("sales_analytics:approximate", ANALYTICS_CACHE_TTL,
+                                    lambda: approximate_sales_analytics(self.db))
+        return cache.get_or_set("sales_analytics", ANALYTICS_CACHE_TTL, self._query_sales_analytics)
+    
+    def _query_sales_analytics(self) -> Dict[str, Any]:
         total_orders = self.db.query(Order).count()
         total_revenue = self.db.query(func.sum(InventoryItem.product_retail_price)).filter(
             InventoryItem.sold_at.isnot(None)
@@ -133,4 +508,81 @@ class EcommerceService:
             "total_revenue": float(total_revenue),
             "total_customers": total_customers,
             "total_products": total_products
-        } 
\ No newline at end of file
+        }
+
+def _limited(query, limit: Optional[int]):
+    return query.limit(limit) if limit else query
+
+def _product_filter(product_name: str, match: Optional[str]):
+    """
+    Filter for a product search. Names the catalog gazetteer resolved are compared for equality
+    (indexed): a product name, a category or a brand, per match. Free text is a substring search.
+    """
+    if match == "product":
+        return InventoryItem.product_name == product_name
+    if match == "category":
+        return InventoryItem.product_category == product_name
+    if match == "brand":
+        return InventoryItem.product_brand == product_name
+    return InventoryItem.product_name.ilike(f"%{product_name}%")
+
+def _category_filter(category: str, match: Optional[str]):
+    """Filter for a category listing: _product_filter's equality for a resolved category, a substring search otherwise"""
+    if match == "category":
+        return _product_filter(category, match)
+    return InventoryItem.product_category.ilike(f"%{category}%")
+
+def _product_matches(product_name: str, match: Optional[str], row) -> bool:
+    """_product_filter applied to a fetched row (anything with product_name/category/brand)"""
+    if match == "product":
+        return row.product_name == product_name
+    if match == "category":
+        return row.product_category == product_name
+    if match == "brand":
+        return row.product_brand == product_name
+    return product_name.lower() in row.product_name.lower()
+
+def _stock_level_row(result) -> Dict[str, Any]:
+    return {
+        "product_name": result.product_name,
+        "available_stock": result.total_inventory - result.sold_count,
+        "total_inventory": result.total_inventory,
+        "product_category": result.product_category,
+        "product_brand": result.product_brand
+    }
+
+def _stock_level_response(result) -> StockLevelResponse:
+    return StockLevelResponse(**_stock_level_row(result))
+
+def _center_response(index, position: int, **fields) -> NearestDistributionCenterResponse:
+    if fields.get("distance_km") is not None:
+        fields["distance_km"] = round(fields["distance_km"], 2)
+    return NearestDistributionCenterResponse(
+        id=int(index.ids[position]),
+        name=index.names[position],
+        latitude=float(index.latitudes[position]),
+        longitude=float(index.longitudes[position]),
+        **fields
+    )
+
+def _order_version_columns():
+    return [getattr(Order, field) for field in ORDER_VERSION_FIELDS]
+
+def _display_name(customer: Optional[Dict[str, Any]]) -> Optional[str]:
+    return f"{customer['first_name']} {customer['last_name']}" if customer else None
+
+def _order_status_response(snapshot: Dict[str, Any], user_name: Optional[str]) -> OrderStatusResponse:
+    return OrderStatusResponse(
+        order_id=snapshot["order_id"],
+        status=snapshot["status"],
+        user_name=user_name,
+        items_count=snapshot["items_count"],
+        created_at=snapshot["created_at"],
+        shipped_at=snapshot["shipped_at"],
+        delivered_at=snapshot["delivered_at"]
+    )
+
+def _chunks(values: List[Any], size: int = 500):
+    """Split IN lists so large batches stay within database parameter limits"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
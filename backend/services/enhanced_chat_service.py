@@ -1,16 +1,34 @@
-from typing import Dict, Any, List, Optional, Tuple
+import os
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from services.ecommerce_service import EcommerceService
 from services.query_parser import QueryParser, QueryType
+from services.gazetteer import get_catalog_gazetteer
 from services.response_formatter import ResponseFormatter
-from services.llm_service import LLMService
+from services.llm_service import LLMService, llm_single_flight
+from services.prompt_builder import token_usage
+from services.llm_policy import Deadline, llm_policy, is_timeout_error
+from services.rate_limiter import QuotaExceeded, upstream_quota, user_rate_limiter
 from sqlalchemy.orm import Session
 
+# Rows a chat answer lists at most (stock levels, product details); the lookups stop there
+CHAT_LIST_LIMIT = int(os.getenv("CHAT_LIST_LIMIT", "20"))
+# Orders listed in a user-orders answer; the rest are only counted
+CHAT_ORDERS_SHOWN = 5
+# "Customers also bought" suggestions added to a product answer
+CHAT_RECOMMENDATIONS = int(os.getenv("CHAT_RECOMMENDATIONS", "3"))
+
 class EnhancedChatService:
     def __init__(self, db: Session):
         self.db = db
         self.ecommerce_service = EcommerceService(db)
-        self.query_parser = QueryParser()
+        # Product, brand and category mentions resolve against the live catalog
+        self.query_parser = QueryParser(get_catalog_gazetteer(db))
         self.response_formatter = ResponseFormatter()
+        # Milliseconds spent in each pipeline stage of the last processed message
+        self.stage_timings: Dict[str, float] = {}
+        # Data fetched for the base response, reused when building LLM context
+        self._query_results: Dict[str, Any] = {}
         
         # Initialize LLM service (with fallback if API key is not available)
         try:
@@ -21,10 +39,22 @@ class EnhancedChatService:
             self.llm_service = None
             self.llm_available = False
     
-    def process_message(self, user_message: str, conversation_history: List[Dict] = None) -> Tuple[str, bool, List[str]]:
+    def process_message(self, user_message: str, conversation_history: List[Dict] = None,
+                        deadline: Optional[Deadline] = None,
+                        on_token: Optional[Callable[[str], None]] = None,
+                        degraded: bool = False) -> Tuple[str, bool, List[str]]:
         """
-        Process a user message and return response, whether clarification is needed, and missing info
+        Process a user message and return response, whether clarification is needed, and missing info.
+        
+        The per-intent LLM policy decides whether the LLM is called and with which model; deadline
+        bounds the LLM call so the formatted response is returned in time if it runs late.
+        on_token receives the LLM output as it is generated; the returned response is final.
+        degraded (set by admission control under load) answers without the LLM.
         """
+        self.stage_timings = {}
+        self._query_results = {}
+        stage_start = time.perf_counter()
+        
         # Parse the user's query
         parsed_query = self.query_parser.parse_query(user_message)
         query_type = parsed_query["query_type"]
@@ -33,37 +63,63 @@ class EnhancedChatService:
         
         # Check if we need more information
         missing_info = self._check_missing_information(query_type, parameters)
+        stage_start = self._record_stage("parse", stage_start)
         
         if missing_info:
             # Ask for clarification
-            clarifying_question = self._generate_clarifying_question(user_message, missing_info)
+            clarifying_question = self._generate_clarifying_question(
+                user_message, missing_info, deadline, on_token, degraded
+            )
+            self._record_stage("llm", stage_start)
             return clarifying_question, True, missing_info
         
         # Generate response based on query type
         base_response = self._generate_base_response(query_type, parameters)
+        stage_start = self._record_stage("db", stage_start)
         
-        # Enhance response with LLM if available
-        if self.llm_available and self.llm_service:
-            try:
-                # Build context for LLM
-                context = self._build_context(query_type, parameters, base_response)
-                
-                # Enhance the response
-                enhanced_response = self.llm_service.enhance_response(
-                    base_response, user_message, context
-                )
-                return enhanced_response, False, []
-            except Exception as e:
-                print(f"Error enhancing response with LLM: {e}")
-                return base_response, False, []
-        else:
+        # Enhance response with LLM if the intent's policy calls for it and time allows
+        decision = llm_policy.decide(query_type.value, deadline, degraded)
+        if not decision.enhance:
+            llm_policy.record(query_type.value, decision.path)
+            return base_response, False, []
+        if not (self.llm_available and self.llm_service):
+            llm_policy.record(query_type.value, "llm_unavailable")
+            return base_response, False, []
+        
+        try:
+            # Build context for LLM
+            context = self._build_context(query_type, parameters, base_response)
+            stage_start = self._record_stage("context", stage_start)
+            
+            # Enhance the response
+            enhanced_response = self.llm_service.enhance_response(
+                base_response, user_message, context, history=conversation_history,
+                model=decision.model, timeout=decision.timeout, on_token=on_token
+            )
+            self._record_stage("llm", stage_start)
+            llm_policy.record(query_type.value, self._llm_outcome())
+            return enhanced_response, False, []
+        except Exception as e:
+            print(f"Error enhancing response with LLM: {e}")
+            self._record_stage("llm", stage_start)
+            llm_policy.record(query_type.value, "llm_error")
             return base_response, False, []
     
+    def _llm_outcome(self) -> str:
+        """Classify the last LLM call for the policy counters"""
+        return classify_llm_outcome(self.llm_service.last_error)
+    
+    def _record_stage(self, stage: str, stage_start: float) -> float:
+        """Record elapsed time for a pipeline stage and return the start of the next one"""
+        now = time.perf_counter()
+        self.stage_timings[stage] = self.stage_timings.get(stage, 0.0) + (now - stage_start) * 1000
+        return now
+    
     def _check_missing_information(self, query_type: QueryType, parameters: Dict[str, Any]) -> List[str]:
         """Check if we have all the information needed to answer the query"""
         missing_info = []
         
-        if query_type == QueryType.ORDER_STATUS:
+        if query_type in (QueryType.ORDER_STATUS, QueryType.ORDER_ETA):
             if "order_id" not in parameters:
                 missing_info.append("order ID")
         
@@ -79,17 +135,37 @@ class EnhancedChatService:
             if "product_name" not in parameters or not parameters["product_name"]:
                 missing_info.append("product name")
         
+        elif query_type == QueryType.DISTRIBUTION_CENTER:
+            if "order_id" not in parameters and "user_id" not in parameters:
+                missing_info.append("user ID or order ID")
+        
         return missing_info
     
-    def _generate_clarifying_question(self, user_message: str, missing_info: List[str]) -> str:
+    def _generate_clarifying_question(self, user_message: str, missing_info: List[str],
+                                      deadline: Optional[Deadline] = None,
+                                      on_token: Optional[Callable[[str], None]] = None,
+                                      degraded: bool = False) -> str:
         """Generate a clarifying question using LLM or fallback"""
-        if self.llm_available and self.llm_service:
+        decision = llm_policy.decide("clarification", deadline, degraded)
+        if not decision.enhance:
+            llm_policy.record("clarification", decision.path)
+        elif not (self.llm_available and self.llm_service):
+            llm_policy.record("clarification", "llm_unavailable")
+        else:
             try:
-                return self.llm_service.ask_clarifying_question(user_message, missing_info)
+                question = self.llm_service.ask_clarifying_question(
+                    user_message, missing_info, model=decision.model, timeout=decision.timeout, on_token=on_token
+                )
+                llm_policy.record("clarification", self._llm_outcome())
+                return question
             except Exception as e:
                 print(f"Error generating clarifying question with LLM: {e}")
+                llm_policy.record("clarification", "llm_error")
         
-        # Fallback clarifying question
+        return self._fallback_clarifying_question(missing_info)
+    
+    def _fallback_clarifying_question(self, missing_info: List[str]) -> str:
+        """Clarifying question without the LLM"""
         if "order ID" in missing_info:
             return "I'd be happy to help you check your order status! Could you please provide your order ID?"
         elif "product name" in missing_info:
@@ -107,30 +183,50 @@ class EnhancedChatService:
                 products = self.ecommerce_service.get_top_products(limit)
                 return self.response_formatter.format_top_products_response(products)
                 
+            elif query_type == QueryType.TRENDING_PRODUCTS:
+                products = self.ecommerce_service.get_trending_products(parameters.get("window"), parameters.get("limit", 5))
+                return self.response_formatter.format_trending_products_response(products, parameters.get("window"))
+                
             elif query_type == QueryType.ORDER_STATUS:
                 order_id = parameters.get("order_id")
                 order_status = self.ecommerce_service.get_order_status(order_id)
+                self._query_results["order_status"] = order_status
                 return self.response_formatter.format_order_status_response(order_status)
                 
+            elif query_type == QueryType.ORDER_ETA:
+                order_eta = self.ecommerce_service.get_order_eta(parameters.get("order_id"))
+                return self.response_formatter.format_order_eta_response(order_eta)
+                
             elif query_type == QueryType.STOCK_LEVELS:
                 product_name = parameters.get("product_name")
-                stock_levels = self.ecommerce_service.get_stock_levels(product_name)
+                stock_levels = self.ecommerce_service.get_stock_levels(
+                    product_name, limit=CHAT_LIST_LIMIT, match=parameters.get("match")
+                )
+                self._query_results["stock_levels"] = stock_levels
                 return self.response_formatter.format_stock_levels_response(stock_levels)
                 
             elif query_type == QueryType.USER_ORDERS:
                 user_id = parameters.get("user_id")
-                orders = self.ecommerce_service.get_user_orders(user_id)
-                return self.response_formatter.format_user_orders_response(orders)
+                orders = self.ecommerce_service.get_user_orders(user_id, limit=CHAT_ORDERS_SHOWN)
+                total = self.ecommerce_service.count_user_orders(user_id) if len(orders) == CHAT_ORDERS_SHOWN else len(orders)
+                return self.response_formatter.format_user_orders_response(orders, total)
                 
             elif query_type == QueryType.PRODUCT_DETAILS:
                 product_name = parameters.get("product_name")
-                products = self.ecommerce_service.get_product_details(product_name)
-                return self.response_formatter.format_product_details_response(products)
+                products = self.ecommerce_service.get_product_details(
+                    product_name, limit=CHAT_LIST_LIMIT, unique=True, match=parameters.get("match")
+                )
+                also_bought = self.also_bought(products)
+                self._query_results["also_bought"] = also_bought
+                return self.response_formatter.format_product_details_response(products, also_bought)
                 
             elif query_type == QueryType.SALES_ANALYTICS:
                 analytics = self.ecommerce_service.get_sales_analytics()
                 return self.response_formatter.format_sales_analytics_response(analytics)
                 
+            elif query_type == QueryType.DISTRIBUTION_CENTER:
+                return self.distribution_center_response(parameters)
+                
             else:  # QueryType.GENERAL
                 message = parameters.get("message", "")
                 return self.response_formatter.format_general_response(message)
@@ -138,20 +234,44 @@ class EnhancedChatService:
         except Exception as e:
             return self.response_formatter.format_error_response("database_error", str(e))
     
-    def _build_context(self, query_type: QueryType, parameters: Dict[str, Any], base_response: str) -> Dict[str, Any]:
-        """Build context for LLM enhancement"""
+    def also_bought(self, products: List) -> List:
+        """Co-purchase recommendations for the best-matching product, leaving out the other matches"""
+        if not products or CHAT_RECOMMENDATIONS <= 0:
+            return []
+        shown = {product.product_id for product in products}
+        recommendations = self.ecommerce_service.get_recommendations(
+            products[0].product_id, CHAT_RECOMMENDATIONS + len(shown)
+        ) or []
+        return [item for item in recommendations if item.product_id not in shown][:CHAT_RECOMMENDATIONS]
+    
+    def distribution_center_response(self, parameters: Dict[str, Any]) -> str:
+        """Where an order ships from, or the customer's nearest center (holding the product, if named)"""
+        if parameters.get("order_id"):
+            centers = self.ecommerce_service.get_order_distribution_centers(parameters["order_id"])
+            return self.response_formatter.format_order_distribution_centers_response(parameters["order_id"], centers)
+        centers = self.ecommerce_service.get_nearest_distribution_centers_for_user(
+            parameters["user_id"], parameters.get("product_name"), match=parameters.get("match")
+        )
+        if centers is None:
+            return self.response_formatter.format_error_response("user_not_found")
+        return self.response_formatter.format_nearest_distribution_center_response(centers, parameters.get("product_name"))
+    
+    def _build_context(self, query_type: QueryType, parameters: Dict[str, Any], base_response: str,
+                       query_results: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build context for LLM enhancement (query_results defaults to the last processed message's)"""
+        if query_results is None:
+            query_results = self._query_results
+        # base_response is already part of the prompt, so it is not repeated here
         context = {
             "query_type": query_type.value,
-            "parameters": parameters,
-            "base_response": base_response,
-            "llm_available": self.llm_available
+            "parameters": parameters
         }
         
-        # Add additional context based on query type
+        # Add additional context based on query type, reusing what the base response fetched
         if query_type == QueryType.ORDER_STATUS:
             order_id = parameters.get("order_id")
             if order_id:
-                order_status = self.ecommerce_service.get_order_status(order_id)
+                order_status = query_results.get("order_status")
                 if order_status:
                     context["order_details"] = {
                         "status": order_status.status,
@@ -159,10 +279,16 @@ class EnhancedChatService:
                         "user_name": order_status.user_name
                     }
         
+        elif query_type == QueryType.PRODUCT_DETAILS:
+            # Real co-purchases, so suggestions are not made up
+            also_bought = query_results.get("also_bought")
+            if also_bought:
+                context["also_bought"] = [item.product_name for item in also_bought]
+        
         elif query_type == QueryType.STOCK_LEVELS:
             product_name = parameters.get("product_name")
             if product_name:
-                stock_levels = self.ecommerce_service.get_stock_levels(product_name)
+                stock_levels = query_results.get("stock_levels") or []
                 context["stock_info"] = [
                     {
                         "product_name": stock.product_name,
@@ -178,5 +304,20 @@ class EnhancedChatService:
         """Get the status of LLM service"""
         return {
             "available": self.llm_available,
-            "service_initialized": self.llm_service is not None
-        } 
\ No newline at end of file
+            "service_initialized": self.llm_service is not None,
+            "request_coalescing": llm_single_flight.stats(),
+            "token_usage": token_usage.snapshot(),
+            "policy": llm_policy.stats(),
+            "routing": self.llm_service.router.stats() if self.llm_service else None,
+            "quota": upstream_quota.stats(),
+            "user_rate_limit": user_rate_limiter.stats()
+        }
+
+
+def classify_llm_outcome(error: Optional[BaseException]) -> str:
+    """Policy path for an LLM call that raised error (None if it succeeded)"""
+    if error is None:
+        return "enhanced"
+    if isinstance(error, QuotaExceeded):
+        return "quota_exhausted"
+    return "deadline_exceeded" if is_timeout_error(error) else "llm_error"
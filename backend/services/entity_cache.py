@@ -0,0 +1,202 @@
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from models import Order, OrderItem, User
+from services.cache import LocalCache, _MISSING
+
+ENTITY_CACHE_MAX_ORDERS = int(os.getenv("ENTITY_CACHE_MAX_ORDERS", "10000"))
+ENTITY_CACHE_MAX_CUSTOMERS = int(os.getenv("ENTITY_CACHE_MAX_CUSTOMERS", "10000"))
+# Customer display data only changes through profile edits; the TTL bounds how long an edit
+# made outside this process (another worker, a bulk load) can go unnoticed
+CUSTOMER_CACHE_TTL = float(os.getenv("CUSTOMER_CACHE_TTL", "300"))
+# Re-read a cached order's shipment fields on every hit (one primary-key lookup instead of three
+# queries). Shipment updates come from loaders and other processes that the ORM listeners below
+# never see, so only disable it when every write goes through this process's ORM sessions.
+ENTITY_CACHE_VERIFY = os.getenv("ENTITY_CACHE_VERIFY", "true").lower() in ("1", "true", "yes")
+# With verification disabled, bounds how long a write the listeners cannot see can leave an
+# order's shipment state stale
+ORDER_CACHE_TTL = float(os.getenv("ORDER_CACHE_TTL", "60"))
+
+# The fields that make up an order's shipment state; a change to any of them invalidates it
+ORDER_VERSION_FIELDS = ("status", "shipped_at", "delivered_at", "returned_at")
+CUSTOMER_FIELDS = ("first_name", "last_name", "email", "state", "city", "country", "latitude", "longitude")
+
+_NO_EXPIRY = float("inf")
+
+
+class EntityCache:
+    """
+    Read-through LRU caches of order-status snapshots (by order_id) and customer display data
+    (by user_id).
+
+    Entries are dropped when the ORM writes a change to an order's status or shipment
+    timestamps, its items, or a customer's profile (see the listeners below), both when the
+    change is flushed and again when it commits. Orders carry their version (status and
+    shipment timestamps), so callers check a hit against the database with a cheap probe
+    (ENTITY_CACHE_VERIFY, on by default) and never serve a stale shipment state, whoever made
+    the change. Customer edits made outside this process's ORM sessions are seen after at most
+    CUSTOMER_CACHE_TTL seconds (ORDER_CACHE_TTL for orders when verification is disabled).
+
+    Callers take generation() before loading rows and pass it to put_order/put_customer;
+    the put is skipped when an invalidation happened in between, so a row read before a
+    concurrent write cannot be cached again after that write commits.
+    """
+
+    def __init__(self, max_orders: int = ENTITY_CACHE_MAX_ORDERS, max_customers: int = ENTITY_CACHE_MAX_CUSTOMERS):
+        self.orders = LocalCache(max_orders)
+        self.customers = LocalCache(max_customers)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.counters = {"order_hits": 0, "order_misses": 0, "order_stale": 0, "customer_hits": 0,
+                         "customer_misses": 0, "invalidations": 0}
+
+    def get_order(self, order_id: int) -> Optional[Dict[str, Any]]:
+        snapshot = self.orders.get(order_id)
+        self._count("order_misses" if snapshot is _MISSING else "order_hits")
+        return None if snapshot is _MISSING else snapshot
+
+    def generation(self) -> int:
+        """Invalidation count; take it before loading the rows that will be put"""
+        with self._lock:
+            return self._generation
+
+    def put_order(self, snapshot: Dict[str, Any], generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.orders.set(snapshot["order_id"], snapshot, _NO_EXPIRY if ENTITY_CACHE_VERIFY else ORDER_CACHE_TTL)
+
+    def discard_stale_order(self, order_id: int):
+        """Drop an entry whose version no longer matches the database"""
+        self.orders.delete(order_id)
+        with self._lock:
+            self.counters["order_stale"] += 1
+            # Counted as a miss: the caller reloads it
+            self.counters["order_hits"] -= 1
+            self.counters["order_misses"] += 1
+
+    def get_customer(self, user_id: int) -> Optional[Dict[str, Any]]:
+        customer = self.customers.get(user_id)
+        self._count("customer_misses" if customer is _MISSING else "customer_hits")
+        return None if customer is _MISSING else customer
+
+    def put_customer(self, customer: Dict[str, Any], generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.customers.set(customer["id"], customer, CUSTOMER_CACHE_TTL)
+
+    def invalidate(self, orders: Iterable[int] = (), customers: Iterable[int] = ()):
+        # Bumped before the entries go, so a load that overlaps this invalidation is not put
+        with self._lock:
+            self._generation += 1
+        for order_id in orders:
+            self.orders.delete(order_id)
+            self._count("invalidations")
+        for user_id in customers:
+            self.customers.delete(user_id)
+            self._count("invalidations")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        order_lookups = counters["order_hits"] + counters["order_misses"]
+        customer_lookups = counters["customer_hits"] + counters["customer_misses"]
+        return {
+            **counters,
+            "order_hit_rate": round(counters["order_hits"] / order_lookups, 3) if order_lookups else None,
+            "customer_hit_rate": round(counters["customer_hits"] / customer_lookups, 3) if customer_lookups else None,
+            "orders_cached": len(self.orders),
+            "customers_cached": len(self.customers),
+            "verify_hits": ENTITY_CACHE_VERIFY
+        }
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+
+def order_snapshot(order: Order, items_count: int) -> Dict[str, Any]:
+    return {
+        "order_id": order.order_id,
+        "user_id": order.user_id,
+        "status": order.status,
+        "items_count": items_count,
+        "created_at": order.created_at,
+        "shipped_at": order.shipped_at,
+        "delivered_at": order.delivered_at,
+        "returned_at": order.returned_at,
+        "version": order_version(order)
+    }
+
+
+def order_version(row) -> Tuple:
+    """Shipment state of an Order (or a row with the ORDER_VERSION_FIELDS columns)"""
+    return tuple(getattr(row, field) for field in ORDER_VERSION_FIELDS)
+
+
+def customer_record(user) -> Dict[str, Any]:
+    return {"id": user.id, **{field: getattr(user, field) for field in CUSTOMER_FIELDS}}
+
+
+entity_cache = EntityCache()
+
+
+# Change-driven invalidation. Mapper events see ORM flushes only; bulk UPDATEs and writes from
+# other processes are caught by the version check on each hit (ENTITY_CACHE_VERIFY) or expire
+# with the entry's TTL.
+_PENDING_KEY = "entity_cache_invalidations"
+
+
+def _queue_invalidation(target, orders=(), customers=()):
+    # Invalidate now so this process stops serving the old state, and again after the commit
+    # so a concurrent read of the not-yet-committed row cannot re-cache it
+    entity_cache.invalidate(orders, customers)
+    session = object_session(target)
+    if session is not None:
+        pending = session.info.setdefault(_PENDING_KEY, (set(), set()))
+        pending[0].update(orders)
+        pending[1].update(customers)
+
+
+def _changed(target, fields) -> bool:
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Order, "after_update")
+def _order_updated(mapper, connection, target):
+    if _changed(target, ORDER_VERSION_FIELDS + ("user_id",)):
+        _queue_invalidation(target, orders=[target.order_id])
+
+
+@event.listens_for(Order, "after_delete")
+def _order_deleted(mapper, connection, target):
+    _queue_invalidation(target, orders=[target.order_id])
+
+
+@event.listens_for(OrderItem, "after_insert")
+@event.listens_for(OrderItem, "after_delete")
+def _order_items_changed(mapper, connection, target):
+    # items_count is part of the snapshot
+    _queue_invalidation(target, orders=[target.order_id])
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _customer_changed(mapper, connection, target):
+    _queue_invalidation(target, customers=[target.id])
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        entity_cache.invalidate(*pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
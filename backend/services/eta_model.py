@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from sqlalchemy.orm import Session
+from models import OrderItem, InventoryItem, User
+from services.pagination import stream_rows
+
+ETA_MODEL_PATH = os.getenv("ETA_MODEL_PATH", "eta_model.json")
+# Groups with fewer delivered items than this fall back to a coarser group
+ETA_MIN_SAMPLES = int(os.getenv("ETA_MIN_SAMPLES", "20"))
+# Only deliveries of items ordered within this many days are fitted
+ETA_LOOKBACK_DAYS = int(os.getenv("ETA_LOOKBACK_DAYS", "365"))
+# How often workers look for a model refitted by fit_eta_model.py
+ETA_RELOAD_SECONDS = float(os.getenv("ETA_RELOAD_SECONDS", "60"))
+
+ETA_PERCENTILES = (10, 50, 90)
+# Lead-time stages: from processing to shipped, in transit, and end to end
+STAGES = {
+    "ship": ("created_at", "shipped_at"),
+    "transit": ("shipped_at", "delivered_at"),
+    "total": ("created_at", "delivered_at"),
+}
+# Most specific first; the first group with enough samples answers
+LEVELS = ("dc_state", "dc", "state", "global")
+
+
+class EtaModel:
+    """
+    Percentiles of order-item lead times (hours) per stage, for each distribution center and
+    customer state combination, each center, each state and overall.
+
+    Fitted in one vectorized pass over the order history (pandas group-by quantiles) and
+    stored as a small JSON file, so a lookup at request time is a few dict accesses.
+    """
+
+    def __init__(self, stages: Dict[str, Dict[str, Dict[str, List[float]]]], fitted_at: str, samples: int):
+        self.stages = stages
+        self.fitted_at = fitted_at
+        self.samples = samples
+
+    @classmethod
+    def fit(cls, frame: pd.DataFrame, min_samples: int = ETA_MIN_SAMPLES) -> "EtaModel":
+        """Fit from a frame with dc_id, state, created_at, shipped_at and delivered_at columns"""
+        dc = frame["dc_id"].astype("Int64").astype(str)
+        state = frame["state"].fillna("").astype(str)
+        keys = {"dc_state": [dc, state], "dc": [dc], "state": [state]}
+        quantiles = [percentile / 100 for percentile in ETA_PERCENTILES]
+
+        stages = {}
+        for stage, (start, end) in STAGES.items():
+            hours = (pd.to_datetime(frame[end]) - pd.to_datetime(frame[start])).dt.total_seconds() / 3600
+            valid = hours.notna() & (hours >= 0)
+            hours = hours[valid]
+            groups = {}
+            if len(hours) >= min_samples:
+                groups["global"] = {"": _summary(hours.quantile(quantiles).tolist(), len(hours))}
+            for level, level_keys in keys.items():
+                grouped = hours.groupby([key[valid] for key in level_keys])
+                counts = grouped.size()
+                counts = counts[counts >= min_samples]
+                if counts.empty:
+                    groups[level] = {}
+                    continue
+                table = grouped.quantile(quantiles).unstack().loc[counts.index]
+                groups[level] = {
+                    _group_key(index): _summary(row.tolist(), int(counts[index]))
+                    for index, row in table.iterrows()
+                }
+            stages[stage] = groups
+        return cls(stages, datetime.utcnow().isoformat(), int(len(frame)))
+
+    @classmethod
+    def fit_from_db(cls, db: Session, lookback_days: int = ETA_LOOKBACK_DAYS) -> "EtaModel":
+        """Fit from shipped order items of the last lookback_days, read through a server-side cursor"""
+        since = datetime.utcnow() - timedelta(days=lookback_days)
+        query = db.query(
+            InventoryItem.product_distribution_center_id.label("dc_id"),
+            User.state,
+            OrderItem.created_at,
+            OrderItem.shipped_at,
+            OrderItem.delivered_at
+        ).join(
+            InventoryItem, OrderItem.inventory_item_id == InventoryItem.id
+        ).outerjoin(
+            User, OrderItem.user_id == User.id
+        ).filter(
+            OrderItem.shipped_at.isnot(None),
+            OrderItem.created_at >= since
+        )
+        columns = ["dc_id", "state", "created_at", "shipped_at", "delivered_at"]
+        frame = pd.DataFrame.from_records(stream_rows(query), columns=columns)
+        return cls.fit(frame)
+
+    def lead_time(self, stage: str, dc_id: Optional[int], state: Optional[str]) -> Optional[Tuple[List[float], int, str]]:
+        """(percentile hours, samples, group used) of the most specific group that has data"""
+        candidates = {
+            "dc_state": _group_key((str(dc_id), state or "")) if dc_id is not None else None,
+            "dc": str(dc_id) if dc_id is not None else None,
+            "state": state or None,
+            "global": "",
+        }
+        groups = self.stages.get(stage, {})
+        for level in LEVELS:
+            key = candidates[level]
+            if key is None:
+                continue
+            summary = groups.get(level, {}).get(key)
+            if summary:
+                return summary[:-1], int(summary[-1]), level if level == "global" else f"{level}:{key}"
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"percentiles": list(ETA_PERCENTILES), "fitted_at": self.fitted_at, "samples": self.samples,
+                "stages": self.stages}
+
+    def save(self, path: str = ETA_MODEL_PATH):
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as model_file:
+            json.dump(self.to_dict(), model_file, separators=(",", ":"))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str = ETA_MODEL_PATH) -> "EtaModel":
+        with open(path, encoding="utf-8") as model_file:
+            data = json.load(model_file)
+        if data.get("percentiles") != list(ETA_PERCENTILES):
+            raise ValueError(f"{path} was fitted with percentiles {data.get('percentiles')}")
+        return cls(data["stages"], data["fitted_at"], data["samples"])
+
+
+def estimate_delivery(model: EtaModel, status: Optional[str], created_at: Optional[datetime], shipped_at: Optional[datetime],
+                      delivered_at: Optional[datetime], returned_at: Optional[datetime],
+                      dc_ids: List[int], state: Optional[str], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Delivery window of an order: P10/P50/P90 of the remaining stage added to when it started.
+    Items from several centers arrive when the slowest does, so the latest window is used.
+    """
+    now = now or datetime.utcnow()
+    if delivered_at:
+        return {"stage": "delivered", "expected": delivered_at}
+    # Orders without a status are estimated from their timestamps
+    if returned_at or (status or "").lower() in ("cancelled", "returned"):
+        return {"stage": "closed"}
+    stage, started = ("transit", shipped_at) if shipped_at else ("total", created_at)
+    if started is None:
+        return {"stage": "unknown"}
+
+    best = None
+    for dc_id in dc_ids or [None]:
+        lead_time = model.lead_time(stage, dc_id, state)
+        if lead_time and (best is None or lead_time[0][1] > best[0][1]):
+            best = lead_time
+    if best is None:
+        return {"stage": "unknown"}
+
+    (low, median, high), samples, basis = best
+    latest = started + timedelta(hours=high)
+    estimate = {
+        "stage": "shipped" if shipped_at else "processing",
+        "earliest": started + timedelta(hours=low),
+        "expected": started + timedelta(hours=median),
+        "latest": latest,
+        "overdue": now > latest,
+        "samples": samples,
+        "basis": basis,
+    }
+    if not shipped_at:
+        ship_times = [model.lead_time("ship", dc_id, state) for dc_id in dc_ids or [None]]
+        ship_hours = [lead_time[0][1] for lead_time in ship_times if lead_time]
+        if ship_hours:
+            estimate["expected_ship"] = started + timedelta(hours=max(ship_hours))
+    return estimate
+
+
+def _summary(values: List[float], samples: int) -> List[float]:
+    return [round(float(value), 1) for value in values] + [samples]
+
+
+def _group_key(index) -> str:
+    return "|".join(str(part) for part in index) if isinstance(index, tuple) else str(index)
+
+
+_model: Optional[EtaModel] = None
+_model_lock = threading.Lock()
+_model_mtime: Optional[float] = None
+_checked_at: Optional[float] = None
+
+
+def get_eta_model() -> Optional[EtaModel]:
+    """
+    The worker's model, reloaded when fit_eta_model.py has written a new one. Never fitted
+    here: until the file exists there is no model and estimates are "unknown".
+    """
+    global _checked_at
+    if _checked_at is not None and time.monotonic() - _checked_at < ETA_RELOAD_SECONDS:
+        return _model
+    with _model_lock:
+        _checked_at = time.monotonic()
+        try:
+            mtime = os.path.getmtime(ETA_MODEL_PATH)
+        except OSError:
+            return _model
+        if mtime != _model_mtime:
+            load_eta_model()
+        return _model
+
+
+def load_eta_model(path: str = ETA_MODEL_PATH) -> Optional[EtaModel]:
+    global _model, _model_mtime
+    if not os.path.exists(path):
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+        _model = EtaModel.load(path)
+    except Exception as e:
+        print(f"Error loading ETA model from {path}: {e}")
+        return None
+    _model_mtime = mtime
+    return _model
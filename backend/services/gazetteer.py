@@ -0,0 +1,329 @@
+import os
+import re
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event, func, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from models import InventoryItem
+
+try:
+    import ahocorasick  # pyahocorasick is optional; the pure-Python automaton below is used without it
+except ImportError:
+    ahocorasick = None
+
+# Seconds between checks for inventory rows added since the last build (an indexed id range read)
+GAZETTEER_REFRESH_SECONDS = float(os.getenv("GAZETTEER_REFRESH_SECONDS", "60"))
+# Renames and deletes in other processes are only seen by a full rebuild, at least this often
+GAZETTEER_REBUILD_SECONDS = float(os.getenv("GAZETTEER_REBUILD_SECONDS", "3600"))
+# Shorter surface forms are too ambiguous to match
+MIN_TERM_LENGTH = 3
+
+# When a message names several entities, the most specific one is used; a name matched as written
+# comes before one matched through its singular/plural ("sweaters" is the category Sweaters before
+# the product Sweater)
+KIND_PRIORITY = {"product": 0, "category": 1, "brand": 2}
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over characters: every keyword occurring in a text is found in one
+    pass, O(len(text) + matches), however many keywords there are. Keywords can be added after
+    compile; the failure links are recomputed by the next compile.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Keyword ending at each state, and every keyword recognised there (own and via failure links)
+        self._keyword: List[Optional[str]] = [None]
+        self._output: List[Tuple[str, ...]] = [()]
+
+    def add(self, keyword: str):
+        state = 0
+        for char in keyword:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = self._goto[state][char] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._keyword.append(None)
+                self._output.append(())
+            state = following
+        self._keyword[state] = keyword
+
+    def compile(self):
+        # Breadth first, so a state's failure target (always shallower) is complete before it
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            inherited = self._output[self._fail[state]]
+            keyword = self._keyword[state]
+            self._output[state] = (keyword,) + inherited if keyword else inherited
+            for char, child in self._goto[state].items():
+                if state:
+                    fallback = self._fail[state]
+                    while fallback and char not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    self._fail[child] = self._goto[fallback].get(char, 0)
+                queue.append(child)
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, keyword) of every occurrence, overlapping ones included"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                yield index - len(keyword) + 1, index + 1, keyword
+
+
+class NativeAhoCorasick:
+    """The same interface over pyahocorasick's C automaton"""
+
+    def __init__(self):
+        self._automaton = ahocorasick.Automaton()
+
+    def add(self, keyword: str):
+        self._automaton.add_word(keyword, keyword)
+
+    def compile(self):
+        if len(self._automaton):
+            self._automaton.make_automaton()
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        if self._automaton.kind != ahocorasick.AHOCORASICK:
+            return
+        for end, keyword in self._automaton.iter(text):
+            yield end - len(keyword) + 1, end + 1, keyword
+
+
+def _automaton():
+    return NativeAhoCorasick() if ahocorasick is not None else AhoCorasick()
+
+
+class CatalogGazetteer:
+    """
+    Product names, brands and categories of inventory_items compiled into one Aho-Corasick
+    automaton. find() returns the catalog entities a message mentions, each resolved to its
+    canonical value (and product ids for products), in a single pass over the message.
+
+    Checks for catalog changes run at most every GAZETTEER_REFRESH_SECONDS. New inventory rows
+    are added incrementally (only ids above the last one read); renamed or deleted items make
+    the next check rebuild from scratch. After the first build, checks run in a background
+    thread on a new automaton that is swapped in when compiled, so requests never wait on one.
+    """
+
+    def __init__(self):
+        self._automaton = _automaton()
+        # surface form -> entities it names; (kind, canonical value) -> entity
+        self._forms: Dict[str, List[Dict[str, Any]]] = {}
+        self._entities: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.max_id = 0
+        self.built_at: Optional[float] = None
+        self._checked_at = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entities)
+
+    def refresh(self, db: Session) -> "CatalogGazetteer":
+        """
+        Build the automaton on first use; afterwards start a background check of the catalog
+        when one is due and keep answering from the current automaton meanwhile
+        """
+        if self.built_at is not None and time.monotonic() - self._checked_at < GAZETTEER_REFRESH_SECONDS:
+            return self
+        if not self._refresh_lock.acquire(blocking=self.built_at is None):
+            return self  # another thread is refreshing
+        if self.built_at is None:
+            try:
+                self._update(db)
+            finally:
+                self._refresh_lock.release()
+            return self
+        self._checked_at = time.monotonic()
+        threading.Thread(target=self._update_in_background, args=(db.get_bind(),), daemon=True,
+                         name="gazetteer-refresh").start()
+        return self
+
+    def _update_in_background(self, bind: Engine):
+        db = Session(bind=bind)
+        try:
+            self._update(db)
+        except Exception as e:
+            print(f"Error refreshing catalog gazetteer: {e}")
+        finally:
+            db.close()
+            self._refresh_lock.release()
+
+    def _update(self, db: Session):
+        """Read the catalog changes and swap in a recompiled automaton; caller holds _refresh_lock"""
+        rebuild = self.built_at is None or self._stale or time.monotonic() - self.built_at >= GAZETTEER_REBUILD_SECONDS
+        if rebuild:
+            # Cleared first, so a rename during the rebuild is picked up by the next one
+            self._stale = False
+            fresh = CatalogGazetteer()
+            fresh._add_rows(_catalog_rows(db, 0))
+        else:
+            rows = _catalog_rows(db, self.max_id)
+            fresh = self._copy() if rows else None
+            if fresh is not None:
+                fresh._add_rows(rows)
+        if fresh is not None:
+            fresh._automaton.compile()
+            with self._lock:
+                self._automaton, self._forms, self._entities = fresh._automaton, fresh._forms, fresh._entities
+                self.max_id = fresh.max_id
+        if rebuild:
+            self.built_at = time.monotonic()
+        self._checked_at = time.monotonic()
+
+    def _copy(self) -> "CatalogGazetteer":
+        """A gazetteer with the same entities and an uncompiled automaton, for adding rows to"""
+        fresh = CatalogGazetteer()
+        with self._lock:
+            entities, forms, fresh.max_id = self._entities, self._forms, self.max_id
+        fresh._entities = {key: {**entity, "ids": list(entity["ids"])} for key, entity in entities.items()}
+        for form, named in forms.items():
+            fresh._forms[form] = [fresh._entities[(entity["kind"], entity["name"])] for entity in named]
+            fresh._automaton.add(form)
+        return fresh
+
+    def _add_rows(self, rows):
+        for name, product_id, brand, category, max_id in rows:
+            self._add("product", name, product_id)
+            self._add("brand", brand)
+            self._add("category", category)
+            self.max_id = max(self.max_id, max_id)
+
+    def _add(self, kind: str, value: Optional[str], product_id: Optional[int] = None):
+        if not value:
+            return
+        entity = self._entities.get((kind, value))
+        if entity is None:
+            entity = self._entities[(kind, value)] = {"kind": kind, "name": value, "ids": []}
+            for form in _surface_forms(value, kind):
+                if len(form) < MIN_TERM_LENGTH:
+                    continue
+                if form not in self._forms:
+                    self._forms[form] = []
+                    self._automaton.add(form)
+                self._forms[form].append(entity)
+        if product_id is not None and product_id not in entity["ids"]:
+            entity["ids"].append(product_id)
+
+    def find(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Catalog entities mentioned in text, in order. Matches must cover whole words; where
+        matches overlap the longest wins, so "Sport Jeans 12" is a product, not the category Jeans.
+        """
+        normalized = normalize(text)
+        with self._lock:
+            matches = [
+                (start, end, form) for start, end, form in self._automaton.iter(normalized)
+                if (start == 0 or normalized[start - 1] == " ") and (end == len(normalized) or normalized[end] == " ")
+            ]
+            forms = self._forms
+        matches.sort(key=lambda match: (match[0] - match[1], match[0]))
+        taken: List[Tuple[int, int]] = []
+        found = []
+        for start, end, form in matches:
+            if any(start < taken_end and taken_start < end for taken_start, taken_end in taken):
+                continue
+            taken.append((start, end))
+            for entity in forms[form]:
+                found.append({**entity, "ids": list(entity["ids"]), "start": start, "end": end})
+        return sorted(found, key=lambda entity: (entity["start"], KIND_PRIORITY[entity["kind"]]))
+
+    def resolve(self, text: str, kinds: Tuple[str, ...] = tuple(KIND_PRIORITY)) -> Optional[Dict[str, Any]]:
+        """The entity of one of kinds that the whole of text names (e.g. an API filter), most specific first"""
+        form = normalize(text)
+        with self._lock:
+            entities = [entity for entity in self._forms.get(form, ()) if entity["kind"] in kinds]
+        if not entities:
+            return None
+        entity = min(entities, key=lambda entity: _rank(entity, form))
+        return {**entity, "ids": list(entity["ids"])}
+
+    def best(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        The most specific entity in text: a name as written before an inflected one, then a
+        product before a category before a brand
+        """
+        normalized = normalize(text)
+        found = self.find(text)
+        return min(found, key=lambda entity: _rank(entity, normalized[entity["start"]:entity["end"]])) if found else None
+
+    def stats(self) -> Dict[str, Any]:
+        kinds: Dict[str, int] = {}
+        for kind, _ in self._entities:
+            kinds[kind] = kinds.get(kind, 0) + 1
+        return {"entities": kinds, "surface_forms": len(self._forms), "max_id": self.max_id,
+                "native": ahocorasick is not None}
+
+
+def normalize(text: str) -> str:
+    """Lowercase words separated by single spaces; punctuation ("T-Shirt", "Men's") splits words"""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def _rank(entity: Dict[str, Any], form: str) -> Tuple[bool, int]:
+    """Sort key of an entity matched by form: exact names first, then KIND_PRIORITY"""
+    return normalize(entity["name"]) != form, KIND_PRIORITY[entity["kind"]]
+
+
+def _surface_forms(value: str, kind: str) -> List[str]:
+    form = normalize(value)
+    forms = [form]
+    # Singular/plural of the last word ("classic t shirts", "jean"), except for brands and model numbers
+    if kind != "brand" and form[-1:].isalpha():
+        forms.append(form[:-1] if form.endswith("s") else form + "s")
+    return forms
+
+
+def _catalog_rows(db: Session, after_id: int) -> List[Tuple]:
+    """Distinct (name, product id, brand, category) of inventory rows with id > after_id"""
+    return db.query(
+        InventoryItem.product_name, InventoryItem.product_id, InventoryItem.product_brand,
+        InventoryItem.product_category, func.max(InventoryItem.id)
+    ).filter(
+        InventoryItem.id > after_id
+    ).group_by(
+        InventoryItem.product_name, InventoryItem.product_id, InventoryItem.product_brand, InventoryItem.product_category
+    ).all()
+
+
+catalog_gazetteer = CatalogGazetteer()
+
+
+def get_catalog_gazetteer(db: Session) -> CatalogGazetteer:
+    """The process-wide gazetteer, built on first use and kept current with the catalog"""
+    try:
+        return catalog_gazetteer.refresh(db)
+    except Exception as e:
+        # Parsing falls back to the regex extraction while the catalog cannot be read
+        print(f"Error refreshing catalog gazetteer: {e}")
+        return catalog_gazetteer
+
+
+# New rows need no listener: the interval-gated check reads every id above max_id. Renames and
+# deletes only mark the gazetteer, so the next due check rebuilds it.
+@event.listens_for(InventoryItem, "after_update")
+def _catalog_changed(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in ("product_name", "product_brand", "product_category")):
+        catalog_gazetteer._stale = True
+
+
+@event.listens_for(InventoryItem, "after_delete")
+def _catalog_removed(mapper, connection, target):
+    catalog_gazetteer._stale = True
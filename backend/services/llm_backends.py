@@ -0,0 +1,527 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import httpx
+
+# Default per-attempt timeout in seconds; each backend can override it
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "10"))
+# Retries per backend after the first attempt, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", "200"))
+LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", "2000"))
+
+# Hedging: if the primary has not answered after its p95 latency, also ask the next backend
+# (or the primary with LLM_HEDGE_MODEL) and take whichever answers first
+LLM_HEDGE = os.getenv("LLM_HEDGE", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL")
+LLM_HEDGE_DELAY_MS = float(os.getenv("LLM_HEDGE_DELAY_MS", "1500"))  # until enough samples exist
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "150"))
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+# Shared keep-alive pool for every backend in this process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+# Hedged calls run their attempts here. One worker per pooled connection, so the executor never
+# caps LLM concurrency below what the HTTP pool allows
+_hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_HEDGE_WORKERS", str(LLM_MAX_CONNECTIONS))),
+                                     thread_name_prefix="llm-hedge")
+
+
+class LLMBackendError(Exception):
+    """A failed completion call, normalized across providers"""
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class LLMBackendTimeout(LLMBackendError, TimeoutError):
+    def __init__(self, message: str):
+        super().__init__(message, retryable=True)
+
+
+class CompletionResult:
+    def __init__(self, content: str, backend: str, model: str, prompt_tokens: Optional[int] = None,
+                 completion_tokens: Optional[int] = None):
+        self.content = content
+        self.backend = backend
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide HTTP client so connections to providers are reused across requests"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+                timeout=LLM_TIMEOUT
+            )
+        return _http_client
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def record(self, latency_ms: float):
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < LATENCY_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LLMBackend:
+    """A chat completion provider with its own default model and timeout"""
+
+    name = "base"
+
+    def __init__(self, model: str, timeout: float = LLM_TIMEOUT):
+        self.model = model
+        self.timeout = timeout
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "errors": 0, "timeouts": 0, "retries": 0}
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                 model: Optional[str] = None, timeout: Optional[float] = None) -> CompletionResult:
+        raise NotImplementedError
+
+    def stream(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+               model: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield the completion in pieces as the provider produces them (timeout applies per read)"""
+        yield self.complete(messages, temperature, max_tokens, model=model, timeout=timeout).content
+
+    def resolve_model(self, model: Optional[str]) -> str:
+        return model or self.model
+
+    def count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        p50, p95 = self.latency.percentile(50), self.latency.percentile(95)
+        return {
+            **counters,
+            "model": self.model,
+            "timeout_s": self.timeout,
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None
+        }
+
+
+class GroqBackend(LLMBackend):
+    name = "groq"
+
+    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None, timeout: float = LLM_TIMEOUT):
+        super().__init__(model, timeout)
+        from groq import Groq
+        # Retries are handled by the router so they can respect the request deadline
+        self.client = Groq(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                           http_client=get_http_client())
+
+    def complete(self, messages, temperature, max_tokens, model=None, timeout=None):
+        import groq
+        model = self.resolve_model(model)
+        try:
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout or self.timeout
+            )
+        except groq.APITimeoutError as e:
+            raise LLMBackendTimeout(f"groq timed out: {e}") from e
+        except groq.APIConnectionError as e:
+            raise LLMBackendError(f"groq connection error: {e}", retryable=True) from e
+        except groq.APIStatusError as e:
+            raise _status_error("groq", e.status_code, e.response.headers, str(e)) from e
+
+        usage = getattr(response, "usage", None)
+        return CompletionResult(
+            response.choices[0].message.content.strip(), self.name, model,
+            getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+        )
+
+    def stream(self, messages, temperature, max_tokens, model=None, timeout=None):
+        import groq
+        try:
+            chunks = self.client.chat.completions.create(
+                model=self.resolve_model(model),
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout or self.timeout,
+                stream=True
+            )
+            for chunk in chunks:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        except groq.APITimeoutError as e:
+            raise LLMBackendTimeout(f"groq timed out: {e}") from e
+        except groq.APIConnectionError as e:
+            raise LLMBackendError(f"groq connection error: {e}", retryable=True) from e
+        except groq.APIStatusError as e:
+            raise _status_error("groq", e.status_code, e.response.headers, str(e)) from e
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Any server implementing POST {base_url}/chat/completions (vLLM, Ollama, OpenAI, ...)"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str, model: str, api_key: Optional[str] = None, timeout: float = LLM_TIMEOUT,
+                 fixed_model: bool = False):
+        super().__init__(model, timeout)
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        # A separately configured model always wins over the per-intent model names
+        self.fixed_model = fixed_model
+
+    def resolve_model(self, model):
+        return self.model if self.fixed_model or not model else model
+
+    def complete(self, messages, temperature, max_tokens, model=None, timeout=None):
+        model = self.resolve_model(model)
+        try:
+            response = get_http_client().post(self.url, headers=self.headers, timeout=timeout or self.timeout, json={
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens
+            })
+        except httpx.TimeoutException as e:
+            raise LLMBackendTimeout(f"openai timed out: {e}") from e
+        except httpx.TransportError as e:
+            raise LLMBackendError(f"openai connection error: {e}", retryable=True) from e
+        if response.status_code >= 400:
+            raise _status_error("openai", response.status_code, response.headers, response.text[:200])
+
+        body = response.json()
+        usage = body.get("usage") or {}
+        return CompletionResult(
+            body["choices"][0]["message"]["content"].strip(), self.name, model,
+            usage.get("prompt_tokens"), usage.get("completion_tokens")
+        )
+
+    def stream(self, messages, temperature, max_tokens, model=None, timeout=None):
+        try:
+            with get_http_client().stream("POST", self.url, headers=self.headers, timeout=timeout or self.timeout, json={
+                "model": self.resolve_model(model),
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True
+            }) as response:
+                if response.status_code >= 400:
+                    raise _status_error("openai", response.status_code, response.headers, response.read()[:200].decode())
+                # Server-sent events: "data: {chunk}" lines, terminated by "data: [DONE]"
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+        except httpx.TimeoutException as e:
+            raise LLMBackendTimeout(f"openai timed out: {e}") from e
+        except httpx.TransportError as e:
+            raise LLMBackendError(f"openai connection error: {e}", retryable=True) from e
+
+
+class LocalBackend(LLMBackend):
+    """
+    In-process stand-in for development and tests without a provider: returns the base response
+    from the prompt (or a short acknowledgement) without any network call
+    """
+
+    name = "local"
+    _BASE_RESPONSE = re.compile(r'Base response: "(.*?)"(?:\n\n|$)', re.S)
+
+    def __init__(self, model: str = "local", timeout: float = LLM_TIMEOUT):
+        super().__init__(model, timeout)
+
+    def complete(self, messages, temperature, max_tokens, model=None, timeout=None):
+        prompt = messages[-1]["content"] if messages else ""
+        match = self._BASE_RESPONSE.search(prompt)
+        content = match.group(1) if match else "Thanks for your message! How else can I help you today?"
+        return CompletionResult(content, self.name, self.model, None, None)
+
+    def stream(self, messages, temperature, max_tokens, model=None, timeout=None):
+        content = self.complete(messages, temperature, max_tokens).content
+        for piece in re.findall(r"\S+\s*", content):
+            yield piece
+
+
+def _status_error(backend: str, status_code: int, headers, detail: str) -> LLMBackendError:
+    retry_after = None
+    try:
+        retry_after = float(headers.get("retry-after")) if headers.get("retry-after") else None
+    except (TypeError, ValueError):
+        pass
+    retryable = status_code in (408, 409, 429) or status_code >= 500
+    return LLMBackendError(f"{backend} returned {status_code}: {detail}", retryable, retry_after)
+
+
+class LLMRouter:
+    """
+    Sends completions to an ordered list of backends.
+
+    Each backend is retried on timeouts, connection errors, 429s and 5xx with full-jitter
+    backoff; when it gives up the next backend is tried. With hedging enabled, a second
+    attempt starts on the next backend (or on the primary with LLM_HEDGE_MODEL) once the
+    primary has been outstanding for its p95 latency, and the first answer wins. timeout
+    bounds the whole call including retries and hedges.
+    """
+
+    def __init__(self, backends: List[LLMBackend], hedge: bool = LLM_HEDGE, hedge_model: Optional[str] = LLM_HEDGE_MODEL):
+        self.backends = backends
+        self.hedge = hedge
+        self.hedge_model = hedge_model
+        self._lock = threading.Lock()
+        self.hedge_counters = {"hedged": 0, "hedge_wins": 0, "abandoned": 0}
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                 model: Optional[str] = None, timeout: Optional[float] = None) -> CompletionResult:
+        if not self.backends:
+            raise LLMBackendError("No LLM backend configured")
+        deadline_at = time.monotonic() + timeout if timeout else None
+        candidates = [(backend, model) for backend in self.backends]
+
+        hedge_target = self._hedge_target(model)
+        if hedge_target is not None:
+            result, candidates = self._complete_hedged(candidates[0], hedge_target, candidates,
+                                                       messages, temperature, max_tokens, deadline_at)
+            if result is not None:
+                return result
+
+        last_error: Optional[LLMBackendError] = None
+        for backend, candidate_model in candidates:
+            try:
+                return self._call_with_retries(backend, candidate_model, messages, temperature, max_tokens, deadline_at)
+            except LLMBackendError as e:
+                last_error = e
+        raise last_error or LLMBackendTimeout("LLM deadline exceeded before any backend answered")
+
+    def stream(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+               model: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Stream a completion from the first backend that produces a token.
+
+        Backends are tried in order (with retries) until one starts answering; once tokens
+        have been yielded a failure is raised to the caller, since the text cannot be replayed.
+        There is no hedging. timeout bounds the time until the first token.
+        """
+        if not self.backends:
+            raise LLMBackendError("No LLM backend configured")
+        deadline_at = time.monotonic() + timeout if timeout else None
+
+        last_error: Optional[LLMBackendError] = None
+        for backend in self.backends:
+            attempt = 0
+            while True:
+                attempt_timeout = backend.timeout
+                if deadline_at is not None:
+                    remaining = deadline_at - time.monotonic()
+                    if remaining <= 0:
+                        raise last_error or LLMBackendTimeout("LLM deadline exceeded before any backend answered")
+                    attempt_timeout = min(attempt_timeout, remaining)
+
+                backend.count("calls")
+                started = False
+                try:
+                    for piece in backend.stream(messages, temperature, max_tokens, model=model, timeout=attempt_timeout):
+                        started = True
+                        yield piece
+                    return
+                except LLMBackendError as e:
+                    backend.count("timeouts" if isinstance(e, LLMBackendTimeout) else "errors")
+                    if started:
+                        raise
+                    last_error = e
+                if not last_error.retryable or attempt >= LLM_MAX_RETRIES:
+                    break
+                attempt += 1
+                backend.count("retries")
+                time.sleep(random.uniform(0, min(LLM_RETRY_MAX_MS, LLM_RETRY_BASE_MS * 2 ** attempt)) / 1000)
+        raise last_error or LLMBackendTimeout("LLM deadline exceeded before any backend answered")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hedge_counters = dict(self.hedge_counters)
+        return {
+            "backends": {backend.name: backend.stats() for backend in self.backends},
+            "hedging": {"enabled": self._hedge_target(None) is not None, **hedge_counters}
+        }
+
+    def _hedge_target(self, model: Optional[str]) -> Optional[Tuple[LLMBackend, Optional[str]]]:
+        if not self.hedge:
+            return None
+        if len(self.backends) > 1:
+            return self.backends[1], model
+        if self.hedge_model and self.hedge_model != self.backends[0].resolve_model(model):
+            return self.backends[0], self.hedge_model
+        return None
+
+    def _complete_hedged(self, primary, hedge, candidates, messages, temperature, max_tokens, deadline_at):
+        """Race the primary against a delayed hedge; returns (result, remaining failover candidates)"""
+        # Set once this call stops waiting: the losing attempt makes no further retries
+        abandoned = threading.Event()
+        futures = {}
+        try:
+            return self._race(primary, hedge, candidates, messages, temperature, max_tokens, deadline_at,
+                              futures, abandoned)
+        finally:
+            abandoned.set()
+            losers = [future for future in futures if not future.done() and not future.cancel()]
+            if losers:
+                with self._lock:
+                    self.hedge_counters["abandoned"] += len(losers)
+
+    def _race(self, primary, hedge, candidates, messages, temperature, max_tokens, deadline_at, futures, abandoned):
+        primary_backend = primary[0]
+        delay_ms = primary_backend.latency.percentile(95) or LLM_HEDGE_DELAY_MS
+        delay = max(delay_ms, LLM_HEDGE_MIN_DELAY_MS) / 1000
+        if deadline_at is not None:
+            delay = min(delay, max(0.0, deadline_at - time.monotonic()))
+
+        futures[_hedge_executor.submit(self._call_with_retries, *primary, messages, temperature,
+                                       max_tokens, deadline_at, abandoned)] = "primary"
+        done, _ = wait(futures, timeout=delay)
+        primary_future = next(iter(futures))
+        if done and primary_future.exception() is None:
+            return primary_future.result(), []
+
+        # The primary is slow or failed: start the hedge and take whichever succeeds first
+        with self._lock:
+            self.hedge_counters["hedged"] += 1
+        futures[_hedge_executor.submit(self._call_with_retries, *hedge, messages, temperature,
+                                       max_tokens, deadline_at, abandoned)] = "hedge"
+        pending = {future for future in futures if not future.done() or future.exception() is None}
+        while pending:
+            remaining = None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if futures[future] == "hedge":
+                        with self._lock:
+                            self.hedge_counters["hedge_wins"] += 1
+                    return future.result(), []
+
+        # Both failed or the deadline passed; fall back to any backends not yet tried
+        tried = {primary_backend, hedge[0]}
+        remaining_candidates = [candidate for candidate in candidates if candidate[0] not in tried]
+        if not remaining_candidates:
+            errors = [future.exception() for future in futures if future.done() and future.exception() is not None]
+            raise errors[-1] if errors and not pending else LLMBackendTimeout("LLM deadline exceeded while hedging")
+        return None, remaining_candidates
+
+    def _call_with_retries(self, backend: LLMBackend, model: Optional[str], messages, temperature, max_tokens,
+                           deadline_at: Optional[float], abandoned: Optional[threading.Event] = None) -> CompletionResult:
+        attempt = 0
+        while True:
+            if abandoned is not None and abandoned.is_set():
+                raise LLMBackendError(f"{backend.name}: abandoned by a hedged call")
+            attempt_timeout = backend.timeout
+            if deadline_at is not None:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise LLMBackendTimeout(f"{backend.name}: deadline exceeded")
+                attempt_timeout = min(attempt_timeout, remaining)
+
+            backend.count("calls")
+            started = time.perf_counter()
+            try:
+                result = backend.complete(messages, temperature, max_tokens, model=model, timeout=attempt_timeout)
+                backend.latency.record((time.perf_counter() - started) * 1000)
+                return result
+            except LLMBackendError as e:
+                backend.count("timeouts" if isinstance(e, LLMBackendTimeout) else "errors")
+                if not e.retryable or attempt >= LLM_MAX_RETRIES:
+                    raise
+                error = e
+
+            attempt += 1
+            backend.count("retries")
+            # Full jitter spreads retries from concurrent requests; honor Retry-After when given
+            backoff = random.uniform(0, min(LLM_RETRY_MAX_MS, LLM_RETRY_BASE_MS * 2 ** attempt)) / 1000
+            if error.retry_after is not None:
+                backoff = max(backoff, error.retry_after)
+            if deadline_at is not None and time.monotonic() + backoff >= deadline_at:
+                raise error
+            if abandoned is not None:
+                abandoned.wait(backoff)
+            else:
+                time.sleep(backoff)
+
+
+def build_backends_from_env() -> List[LLMBackend]:
+    """
+    Build backends in LLM_BACKENDS order (comma separated: groq, openai, local).
+    Backends whose credentials are missing are skipped.
+    """
+    backends = []
+    for name in (part.strip() for part in os.getenv("LLM_BACKENDS", "groq").split(",")):
+        if name == "groq" and os.getenv("GROQ_API_KEY"):
+            backends.append(GroqBackend(
+                api_key=os.getenv("GROQ_API_KEY"),
+                model=os.getenv("GROQ_MODEL", "llama3-8b-8192"),
+                # GROQ_BASE_URL points the client at an OpenAI/Groq-compatible server (e.g. the benchmark stand-in)
+                base_url=os.getenv("GROQ_BASE_URL") or None,
+                timeout=float(os.getenv("GROQ_TIMEOUT", LLM_TIMEOUT))
+            ))
+        elif name == "openai" and os.getenv("OPENAI_COMPAT_BASE_URL"):
+            backends.append(OpenAICompatibleBackend(
+                base_url=os.getenv("OPENAI_COMPAT_BASE_URL"),
+                model=os.getenv("OPENAI_COMPAT_MODEL", "llama3-8b-8192"),
+                api_key=os.getenv("OPENAI_COMPAT_API_KEY"),
+                timeout=float(os.getenv("OPENAI_COMPAT_TIMEOUT", LLM_TIMEOUT)),
+                fixed_model=bool(os.getenv("OPENAI_COMPAT_MODEL"))
+            ))
+        elif name == "local":
+            backends.append(LocalBackend())
+    return backends
+
+
+_router: Optional[LLMRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Process-wide router, built once so clients and latency history are shared by all requests"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = LLMRouter(build_backends_from_env())
+        return _router
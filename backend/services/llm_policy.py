@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, Optional
+
+SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "llama3-8b-8192")
+LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", "llama3-70b-8192")
+
+# End-to-end budget for one chat request; the LLM gets whatever is left of it
+CHAT_DEADLINE_MS = float(os.getenv("CHAT_DEADLINE_MS", "4000"))
+# Time kept back for persisting the response after the LLM returns
+DEADLINE_RESERVE_MS = float(os.getenv("LLM_DEADLINE_RESERVE_MS", "150"))
+# Below this much remaining time an LLM call is not worth starting
+MIN_LLM_BUDGET_MS = float(os.getenv("LLM_MIN_BUDGET_MS", "300"))
+
+# Per-intent defaults. Intents whose formatter output is already complete and exact skip the
+# LLM; the rest, including the catch-all "general" (most traffic), use the small model. The large
+# one is opt-in per intent through LLM_POLICY_FILE.
+DEFAULT_INTENT_POLICIES: Dict[str, Dict[str, Any]] = {
+    "order_status": {"enhance": False},
+    "order_eta": {"enhance": False},
+    "stock_levels": {"enhance": False},
+    "user_orders": {"enhance": False},
+    "sales_analytics": {"enhance": False},
+    "distribution_center": {"enhance": False},
+    "top_products": {"enhance": True, "model": "small"},
+    "trending_products": {"enhance": True, "model": "small"},
+    "product_details": {"enhance": True, "model": "small"},
+    "clarification": {"enhance": True, "model": "small", "deadline_ms": 1500},
+    "general": {"enhance": True, "model": "small"},
+}
+
+
+class Deadline:
+    """Absolute time by which a request must be answered"""
+
+    def __init__(self, budget_ms: float = CHAT_DEADLINE_MS):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    def remaining_ms(self) -> float:
+        return max(0.0, (self.expires_at - time.monotonic()) * 1000)
+
+    def expired(self) -> bool:
+        return self.remaining_ms() <= 0
+
+
+class PolicyDecision:
+    def __init__(self, intent: str, enhance: bool, model: Optional[str] = None,
+                 timeout: Optional[float] = None, path: str = "enhanced"):
+        self.intent = intent
+        self.enhance = enhance
+        self.model = model
+        self.timeout = timeout  # seconds
+        self.path = path
+
+
+class LLMPolicy:
+    """
+    Decides per intent whether to call the LLM, with which model and with what timeout.
+
+    Configured from DEFAULT_INTENT_POLICIES, overridden by the JSON file in LLM_POLICY_FILE,
+    e.g. {"general": {"enhance": true, "model": "large", "deadline_ms": 2000}}. "model" may be
+    "small", "large" or a provider model name. Counts how often each path is taken.
+    """
+
+    PATHS = ("enhanced", "formatter_only", "deadline_skipped", "deadline_exceeded", "quota_exhausted",
+             "load_shed", "llm_error", "llm_unavailable")
+
+    def __init__(self, policies: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.policies = {intent: dict(policy) for intent, policy in DEFAULT_INTENT_POLICIES.items()}
+        for intent, policy in (policies or {}).items():
+            self.policies.setdefault(intent, {}).update(policy)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "LLMPolicy":
+        path = os.getenv("LLM_POLICY_FILE")
+        if not path:
+            return cls()
+        try:
+            with open(path) as f:
+                return cls(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Could not load LLM policy from {path}: {e}")
+            return cls()
+
+    def decide(self, intent: str, deadline: Optional[Deadline] = None, degraded: bool = False) -> PolicyDecision:
+        """degraded: the request was admitted under load and is answered without the LLM"""
+        policy = self.policies.get(intent) or self.policies["general"]
+        if not policy.get("enhance", True):
+            return PolicyDecision(intent, False, path="formatter_only")
+        if degraded:
+            return PolicyDecision(intent, False, path="load_shed")
+
+        model = self._resolve_model(policy.get("model", "small"))
+        remaining_ms = deadline.remaining_ms() - DEADLINE_RESERVE_MS if deadline else None
+        if policy.get("deadline_ms") is not None:
+            remaining_ms = min(remaining_ms, policy["deadline_ms"]) if remaining_ms is not None else policy["deadline_ms"]
+
+        if remaining_ms is not None and remaining_ms < MIN_LLM_BUDGET_MS:
+            return PolicyDecision(intent, False, model, path="deadline_skipped")
+        timeout = remaining_ms / 1000 if remaining_ms is not None else None
+        return PolicyDecision(intent, True, model, timeout)
+
+    def record(self, intent: str, path: str):
+        with self._lock:
+            counts = self._counts.setdefault(intent, {name: 0 for name in self.PATHS})
+            counts[path] = counts.get(path, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = {name: 0 for name in self.PATHS}
+            for counts in self._counts.values():
+                for name, value in counts.items():
+                    totals[name] += value
+            return {
+                "by_intent": {intent: dict(counts) for intent, counts in self._counts.items()},
+                "totals": totals,
+                "policies": self.policies,
+                "chat_deadline_ms": CHAT_DEADLINE_MS
+            }
+
+    def _resolve_model(self, model: str) -> str:
+        return {"small": SMALL_MODEL, "large": LARGE_MODEL}.get(model, model)
+
+
+def is_timeout_error(error: BaseException) -> bool:
+    """True for client, coalescing and socket timeouts"""
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+llm_policy = LLMPolicy.from_env()
@@ -1,19 +1,46 @@
 import os
-import json
-from typing import Dict, Any, List, Optional
-from groq import Groq
+import time
+import threading
+from typing import Callable, Dict, Any, List, Optional
 from dotenv import load_dotenv
+from services.single_flight import SingleFlight, fingerprint
+from services.prompt_builder import PromptBuilder, compact_context, compact_json, count_tokens, token_usage
 
 load_dotenv()
 
+# Imported after load_dotenv: backend settings are read from the environment at import time
+from services.llm_backends import get_router
+from services.rate_limiter import upstream_quota, QuotaExceeded, LLM_QUOTA_MAX_WAIT_MS
+
+# Identical prompts in flight at the same time share one upstream call
+llm_single_flight = SingleFlight()
+# How long a coalesced caller waits on another request's call before falling back
+LLM_COALESCE_TIMEOUT = float(os.getenv("LLM_COALESCE_TIMEOUT", "30"))
+# The availability probe is a real completion call, so its result is reused for this many seconds
+# (a successful chat call also counts as one)
+LLM_AVAILABILITY_TTL = float(os.getenv("LLM_AVAILABILITY_TTL", "60"))
+# The probe runs in the background and gives up after this many seconds, retries included
+LLM_AVAILABILITY_TIMEOUT = float(os.getenv("LLM_AVAILABILITY_TIMEOUT", "5"))
+
+_availability_lock = threading.Lock()
+# Assumed up until the first probe answers: every chat call is bounded by its deadline and falls back
+_availability = {"available": True, "checked_at": None, "probing": False}
+
+def _confirm_available():
+    with _availability_lock:
+        _availability.update(available=True, checked_at=time.monotonic())
+
 class LLMService:
     def __init__(self):
-        self.api_key = os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY environment variable is required")
+        # Backends (Groq, OpenAI-compatible, local) are built once per process from LLM_BACKENDS
+        self.router = get_router()
+        if not self.router.backends:
+            raise ValueError("No LLM backend configured: set GROQ_API_KEY or LLM_BACKENDS")
         
-        self.client = Groq(api_key=self.api_key)
-        self.model = "llama3-8b-8192"  # Using Llama3 model for good performance
+        self.model = self.router.backends[0].model  # Default model of the primary backend
+        self.prompt_builder = PromptBuilder()
+        # Exception from the last enhance/clarify call that fell back, None if it succeeded
+        self.last_error: Optional[BaseException] = None
     
     def generate_response(self, user_message: str, context: Dict[str, Any] = None) -> str:
         """
@@ -30,92 +57,172 @@ class LLMService:
         
         try:
             # Call Groq API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            return response.choices[0].message.content.strip()
+            return self._complete(messages, temperature=0.7, max_tokens=1000,
+                                  intent=(context or {}).get("query_type", "general"))
             
         except Exception as e:
             print(f"Error calling Groq API: {e}")
             return self._get_fallback_response(user_message)
     
-    def ask_clarifying_question(self, user_message: str, missing_info: List[str]) -> str:
+    def ask_clarifying_question(self, user_message: str, missing_info: List[str], model: Optional[str] = None,
+                                timeout: Optional[float] = None, on_token: Optional[Callable[[str], None]] = None) -> str:
         """
-        Generate a clarifying question when information is missing
+        Generate a clarifying question when information is missing (streamed to on_token if given)
         """
         system_prompt = """You are a helpful e-commerce customer support assistant. 
         The user has asked a question but we need more information to help them properly.
         Generate a friendly, helpful clarifying question to get the missing information.
         Be specific and helpful."""
         
-        user_prompt = f"""
-        User message: "{user_message}"
-        
-        Missing information: {', '.join(missing_info)}
-        
-        Please ask a clarifying question to get the missing information. Be friendly and helpful.
-        """
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
+        messages, max_tokens, prompt_tokens = self.prompt_builder.build(
+            system_prompt,
+            [("User message", user_message), ("Missing information", ", ".join(missing_info))],
+            intent="clarification",
+            instruction="Please ask a clarifying question to get the missing information. Be friendly and helpful."
+        )
         
+        self.last_error = None
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=300
-            )
-            
-            return response.choices[0].message.content.strip()
+            return self._complete(messages, temperature=0.7, max_tokens=max_tokens, intent="clarification",
+                                  estimated_prompt_tokens=prompt_tokens, model=model, timeout=timeout,
+                                  on_token=on_token)
             
         except Exception as e:
             print(f"Error calling Groq API for clarifying question: {e}")
+            self.last_error = e
             return f"I'd be happy to help! Could you please provide more details about {', '.join(missing_info)}?"
     
-    def enhance_response(self, base_response: str, user_message: str, context: Dict[str, Any] = None) -> str:
+    def enhance_response(self, base_response: str, user_message: str, context: Dict[str, Any] = None,
+                         history: List[Dict[str, str]] = None, model: Optional[str] = None,
+                         timeout: Optional[float] = None, on_token: Optional[Callable[[str], None]] = None) -> str:
         """
-        Enhance a base response with additional context and personalization
+        Enhance a base response with additional context and personalization (streamed to on_token if given)
         """
         system_prompt = """You are a helpful e-commerce customer support assistant.
         You have a base response to give to the user, but you should enhance it to be more helpful, 
         friendly, and personalized. Add relevant suggestions, follow-up questions, or additional helpful information.
+        Only recommend products named in the context (also_bought); never invent product names.
         Keep the response conversational and engaging."""
         
-        user_prompt = f"""
-        User message: "{user_message}"
+        # The base response is sent once; the builder drops its copy from the context and
+        # trims large result lists so the prompt fits the intent's input budget
+        intent = (context or {}).get("query_type", "general")
+        messages, max_tokens, prompt_tokens = self.prompt_builder.build(
+            system_prompt,
+            [("User message", user_message), ("Base response", base_response)],
+            intent=intent,
+            context=context,
+            instruction="Please enhance this response to be more helpful and engaging while keeping the core information.",
+            history=history
+        )
         
-        Base response: "{base_response}"
+        self.last_error = None
+        try:
+            return self._complete(messages, temperature=0.7, max_tokens=max_tokens, intent=intent,
+                                  estimated_prompt_tokens=prompt_tokens, model=model, timeout=timeout,
+                                  on_token=on_token)
+            
+        except Exception as e:
+            print(f"Error calling Groq API for response enhancement: {e}")
+            self.last_error = e
+            return base_response
+    
+    def summarize_conversation(self, previous_summary: str, turns: List[Dict[str, str]], max_tokens: int) -> str:
+        """
+        Fold new conversation turns into a rolling summary
+        """
+        system_prompt = """You maintain a running summary of a customer support conversation.
+        Merge the new messages into the existing summary. Keep order IDs, product names, user IDs,
+        open questions and anything the customer asked for. Be concise and factual."""
         
-        Context: {json.dumps(context) if context else 'None'}
+        transcript = "\n".join(
+            f"{'User' if turn['role'] == 'user' else 'Assistant'}: {turn['content']}"
+            for turn in turns
+        )
+        messages, output_budget, prompt_tokens = self.prompt_builder.build(
+            system_prompt,
+            [("Existing summary", previous_summary or "None"), ("New messages", transcript)],
+            intent="summary",
+            instruction=f"Return only the updated summary in at most {max_tokens} tokens."
+        )
         
-        Please enhance this response to be more helpful and engaging while keeping the core information.
+        return self._complete(messages, temperature=0.2, max_tokens=min(max_tokens, output_budget),
+                              intent="summary", estimated_prompt_tokens=prompt_tokens)
+    
+    def _complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                  intent: str = "general", estimated_prompt_tokens: int = 0, model: Optional[str] = None,
+                  timeout: Optional[float] = None, on_token: Optional[Callable[[str], None]] = None) -> str:
         """
+        Call the chat completion API, sharing the upstream call with identical in-flight requests.
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
+        model overrides the default model. timeout (seconds) bounds the whole call, including
+        retries, hedged attempts and waiting on a coalesced call. With on_token the completion is
+        streamed instead: each piece is passed to on_token as it arrives and nothing is coalesced.
+        """
+        model = model or self.model
+        if on_token is not None:
+            return self._stream_complete(messages, temperature, max_tokens, intent, estimated_prompt_tokens,
+                                         model, timeout, on_token)
+        key = fingerprint({
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        })
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=800
-            )
-            
-            return response.choices[0].message.content.strip()
+        deadline_at = time.monotonic() + timeout if timeout else None
+        
+        def call_upstream() -> str:
+            # Queue briefly for provider quota, otherwise raise QuotaExceeded so the caller
+            # answers without the LLM instead of collecting a 429
+            reserved_tokens = estimated_prompt_tokens + max_tokens
+            max_wait = LLM_QUOTA_MAX_WAIT_MS / 1000
+            if deadline_at is not None:
+                max_wait = min(max_wait, deadline_at - time.monotonic())
+            upstream_quota.acquire(reserved_tokens, max_wait=max_wait)
             
-        except Exception as e:
-            print(f"Error calling Groq API for response enhancement: {e}")
-            return base_response
+            remaining = deadline_at - time.monotonic() if deadline_at is not None else None
+            # A failed call is settled at its prompt estimate, so the reservation is never kept
+            used_tokens = estimated_prompt_tokens
+            try:
+                result = self.router.complete(messages, temperature, max_tokens, model=model, timeout=remaining)
+                _confirm_available()
+                # Only the call that actually reached the provider consumes tokens
+                prompt_tokens = result.prompt_tokens or estimated_prompt_tokens
+                completion_tokens = result.completion_tokens or 0
+                token_usage.record(intent, prompt_tokens, completion_tokens, estimated_prompt_tokens)
+                used_tokens = prompt_tokens + completion_tokens
+            finally:
+                upstream_quota.record_usage(reserved_tokens, used_tokens)
+            return result.content
+        
+        wait_timeout = min(timeout, LLM_COALESCE_TIMEOUT) if timeout else LLM_COALESCE_TIMEOUT
+        return llm_single_flight.do(key, call_upstream, timeout=wait_timeout)
+    
+    def _stream_complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int, intent: str,
+                         estimated_prompt_tokens: int, model: str, timeout: Optional[float],
+                         on_token: Callable[[str], None]) -> str:
+        """Streaming variant of _complete; timeout bounds the quota wait and the first token"""
+        deadline_at = time.monotonic() + timeout if timeout else None
+        reserved_tokens = estimated_prompt_tokens + max_tokens
+        max_wait = LLM_QUOTA_MAX_WAIT_MS / 1000
+        if deadline_at is not None:
+            max_wait = min(max_wait, deadline_at - time.monotonic())
+        upstream_quota.acquire(reserved_tokens, max_wait=max_wait)
+        
+        pieces = []
+        remaining = deadline_at - time.monotonic() if deadline_at is not None else None
+        try:
+            for piece in self.router.stream(messages, temperature, max_tokens, model=model, timeout=remaining):
+                pieces.append(piece)
+                on_token(piece)
+            _confirm_available()
+        finally:
+            # Streams report no usage, so completion tokens are estimated from the text
+            completion_tokens = count_tokens("".join(pieces))
+            token_usage.record(intent, estimated_prompt_tokens, completion_tokens, estimated_prompt_tokens)
+            upstream_quota.record_usage(reserved_tokens, estimated_prompt_tokens + completion_tokens)
+        return "".join(pieces).strip()
     
     def _build_system_prompt(self, context: Dict[str, Any] = None) -> str:
         """
@@ -136,7 +243,7 @@ class LLMService:
         When providing information, be specific and accurate. If you're not sure about something, say so rather than guessing."""
         
         if context:
-            context_str = json.dumps(context, indent=2)
+            context_str = compact_json(compact_context(context))
             base_prompt += f"\n\nCurrent context: {context_str}"
         
         return base_prompt
@@ -149,15 +256,40 @@ class LLMService:
     
     def is_api_available(self) -> bool:
         """
-        Check if the Groq API is available
+        Whether the Groq API answered recently. Never blocks: once the last result is older than
+        LLM_AVAILABILITY_TTL, a probe in a background thread refreshes it for later requests
         """
+        with _availability_lock:
+            checked_at = _availability["checked_at"]
+            stale = checked_at is None or time.monotonic() - checked_at >= LLM_AVAILABILITY_TTL
+            if stale and not _availability["probing"]:
+                _availability["probing"] = True
+                threading.Thread(target=self._refresh_availability, name="llm-availability", daemon=True).start()
+            return _availability["available"]
+    
+    def _refresh_availability(self):
+        available = None
+        try:
+            available = self._probe_api()
+        finally:
+            with _availability_lock:
+                if available is not None:
+                    _availability["available"] = available
+                _availability.update(checked_at=time.monotonic(), probing=False)
+    
+    def _probe_api(self) -> Optional[bool]:
+        """True or False, or None when there is no quota to spare for a probe right now"""
         try:
-            # Simple test call
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=10
-            )
+            # Only spare quota: the probe never waits for, or ahead of, a chat call
+            upstream_quota.acquire(20, max_wait=0)
+        except QuotaExceeded:
+            # Out of quota is not an outage; requests are downgraded per call until it refills
+            return None
+        try:
+            # A timeout counts as unavailable
+            self.router.complete([{"role": "user", "content": "Hello"}], temperature=0.0, max_tokens=10,
+                                 timeout=LLM_AVAILABILITY_TIMEOUT)
             return True
-        except Exception:
-            return False 
\ No newline at end of file
+        except Exception as e:
+            print(f"LLM availability probe failed: {e}")
+            return False
@@ -0,0 +1,82 @@
+import os
+import json
+import base64
+from datetime import datetime
+from typing import Any, Iterator, Optional, Tuple
+from sqlalchemy import DateTime, String, func, tuple_
+from sqlalchemy.orm import Query
+
+# Rows fetched per round trip when streaming through a server-side cursor
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+# Page size of the list endpoints when no limit is given, and their upper bound
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by the same keyset"""
+
+
+class Keyset:
+    """
+    Keyset (seek) pagination over a fixed ordering.
+
+    The ordering columns must identify a row uniquely (end them with the primary key). A page
+    continues strictly after the last row of the previous one, so the database seeks straight
+    to it through the index instead of counting past an OFFSET, and rows inserted meanwhile do
+    not shift pages. Cursors are opaque url-safe strings holding the last row's ordering values.
+    Nullable string columns are compared as '' so that NULLs have a place in the order.
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+        self._expressions = [
+            func.coalesce(column, "") if column.nullable and isinstance(column.type, String) else column
+            for column in columns
+        ]
+
+    def apply(self, query: Query, after: Optional[str] = None) -> Query:
+        """Order the query by the keyset and, given a cursor, start after it"""
+        if after:
+            values = self.decode(after)
+            row, last = tuple_(*self._expressions), tuple_(*values)
+            query = query.filter(row < last if self.descending else row > last)
+        return query.order_by(*[
+            expression.desc() if self.descending else expression for expression in self._expressions
+        ])
+
+    def cursor(self, row: Any) -> str:
+        """Cursor of the page that follows row (an ORM object, a Row, a schema or a dict with the same names)"""
+        values = []
+        for column in self.columns:
+            value = row[column.key] if isinstance(row, dict) else getattr(row, column.key)
+            if value is None and isinstance(column.type, String):
+                value = ""
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> Tuple:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if not isinstance(values, list) or len(values) != len(self.columns):
+                raise ValueError("wrong number of values")
+            return tuple(
+                datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+                for column, value in zip(self.columns, values)
+            )
+        except (ValueError, TypeError) as e:
+            raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE (DEFAULT_PAGE_SIZE when not given)"""
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+def stream_rows(query: Query, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Any]:
+    """
+    Iterate a query through a server-side cursor (psycopg2 named cursor; SQLite steps its
+    cursor anyway), so only batch_size rows are held in memory at a time.
+    """
+    return iter(query.yield_per(batch_size))
@@ -0,0 +1,212 @@
+import re
+import json
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to a character estimate
+    _encoding = None
+
+# Per-intent (input, output) token budgets for LLM calls
+INTENT_TOKEN_BUDGETS: Dict[str, Tuple[int, int]] = {
+    "top_products": (700, 350),
+    "trending_products": (700, 350),
+    "order_status": (500, 250),
+    "order_eta": (500, 250),
+    "stock_levels": (700, 300),
+    "user_orders": (700, 350),
+    "product_details": (800, 350),
+    "sales_analytics": (500, 300),
+    "distribution_center": (500, 250),
+    "general": (500, 400),
+    "clarification": (250, 120),
+    "summary": (1200, 250),
+}
+DEFAULT_TOKEN_BUDGET = (600, 350)
+
+# Extra input tokens allowed for conversation history (summary + recent messages)
+HISTORY_TOKEN_BUDGET = 350
+# Each recent message is cut to this length in the history section
+HISTORY_MESSAGE_MAX_TOKENS = 120
+
+# Large result lists in the context are cut to this many entries plus a summary
+CONTEXT_TOP_K = 5
+
+# Context keys that repeat information already in the prompt or mean nothing to the model
+REDUNDANT_CONTEXT_KEYS = {"base_response", "llm_available"}
+
+TRUNCATION_MARKER = " …[truncated]"
+_PROMPT_INDENT = re.compile(r"[ \t]*\n[ \t]*")
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate ~4 characters per token"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    # Chat formats add a few tokens of framing per message
+    return sum(count_tokens(message.get("content", "")) + 4 for message in messages)
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text so that it fits in max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens]) + TRUNCATION_MARKER
+    return text[:max_tokens * 4] + TRUNCATION_MARKER
+
+
+def summarize_list(items: List[Any], top_k: int = CONTEXT_TOP_K, sort_key: Optional[str] = None) -> Dict[str, Any]:
+    """Keep the top-k entries of a result list and summarize the rest"""
+    if sort_key and items and isinstance(items[0], dict):
+        items = sorted(items, key=lambda item: item.get(sort_key) or 0, reverse=True)
+    summary = {"top": items[:top_k], "total": len(items)}
+    omitted = items[top_k:]
+    if omitted and sort_key and isinstance(omitted[0], dict):
+        summary[f"omitted_{sort_key}_sum"] = sum(item.get(sort_key) or 0 for item in omitted)
+    return summary
+
+
+def compact_context(context: Optional[Dict[str, Any]], top_k: int = CONTEXT_TOP_K) -> Dict[str, Any]:
+    """Drop duplicated fields and cut large result lists down to their top-k entries"""
+    compacted = {}
+    for key, value in (context or {}).items():
+        if key in REDUNDANT_CONTEXT_KEYS or value in (None, [], {}):
+            continue
+        if isinstance(value, list) and len(value) > top_k:
+            sort_key = "available_stock" if key == "stock_info" else None
+            value = summarize_list(value, top_k, sort_key)
+        compacted[key] = value
+    return compacted
+
+
+def render_history(history: Optional[List[Dict[str, str]]], budget: int = HISTORY_TOKEN_BUDGET) -> str:
+    """Render summary + recent messages, dropping the oldest messages to stay within budget"""
+    if not history:
+        return ""
+    summary = ""
+    lines = []
+    for entry in history:
+        content = entry.get("content") or ""
+        if entry.get("role") == "summary":
+            summary = f"Summary of earlier conversation: {content}"
+        else:
+            speaker = "User" if entry.get("role") == "user" else "Assistant"
+            lines.append(f"{speaker}: {truncate_to_tokens(content, HISTORY_MESSAGE_MAX_TOKENS)}")
+
+    while lines and count_tokens("\n".join([summary] + lines)) > budget:
+        lines.pop(0)
+    return truncate_to_tokens("\n".join(filter(None, [summary] + lines)), budget)
+
+
+def get_budget(intent: Optional[str]) -> Tuple[int, int]:
+    return INTENT_TOKEN_BUDGETS.get(intent or "general", DEFAULT_TOKEN_BUDGET)
+
+
+class PromptBuilder:
+    """Builds chat messages that fit the per-intent input budget"""
+
+    def build(self, system_prompt: str, sections: List[Tuple[str, str]], intent: Optional[str] = None,
+              context: Optional[Dict[str, Any]] = None, instruction: str = "",
+              history: Optional[List[Dict[str, str]]] = None) -> Tuple[List[Dict[str, str]], int, int]:
+        """
+        Assemble system + user messages.
+
+        sections are (label, text) pairs placed in the user prompt. history (a rolling summary
+        plus recent messages) is rendered first under its own HISTORY_TOKEN_BUDGET. If the prompt
+        exceeds the input budget, the context is shrunk first (top-3, then dropped) and then the
+        longest section is truncated. Returns (messages, max_output_tokens, prompt_tokens).
+        """
+        input_budget, output_budget = get_budget(intent)
+        history_text = render_history(history)
+        if history_text:
+            sections = [("Conversation so far", history_text)] + list(sections)
+            input_budget += count_tokens(history_text)
+        compacted = compact_context(context)
+        top_k = CONTEXT_TOP_K
+
+        while True:
+            messages = self._assemble(system_prompt, sections, compacted, instruction)
+            prompt_tokens = count_message_tokens(messages)
+            if prompt_tokens <= input_budget:
+                return messages, output_budget, prompt_tokens
+            if compacted and top_k > 3:
+                top_k = 3
+                compacted = compact_context(context, top_k)
+            elif compacted:
+                compacted = {}
+            else:
+                break
+
+        if not sections:
+            return messages, output_budget, prompt_tokens
+
+        # Still too large: truncate the longest section to whatever budget remains
+        overflow = prompt_tokens - input_budget
+        longest = max(range(len(sections)), key=lambda i: count_tokens(sections[i][1]))
+        label, text = sections[longest]
+        sections = list(sections)
+        sections[longest] = (label, truncate_to_tokens(text, max(0, count_tokens(text) - overflow - 8)))
+        messages = self._assemble(system_prompt, sections, compacted, instruction)
+        return messages, output_budget, count_message_tokens(messages)
+
+    def _assemble(self, system_prompt: str, sections: List[Tuple[str, str]], context: Dict[str, Any],
+                  instruction: str) -> List[Dict[str, str]]:
+        lines = [f"{label}: \"{text}\"" for label, text in sections]
+        if context:
+            lines.append(f"Context: {compact_json(context)}")
+        if instruction:
+            lines.append(instruction)
+        return [
+            # Indented triple-quoted prompts otherwise spend tokens on leading whitespace
+            {"role": "system", "content": _PROMPT_INDENT.sub("\n", system_prompt.strip())},
+            {"role": "user", "content": "\n\n".join(lines)}
+        ]
+
+
+class TokenUsageTracker:
+    """Per-intent prompt and completion token totals for LLM calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, int]] = {}
+
+    def record(self, intent: Optional[str], prompt_tokens: int, completion_tokens: int, estimated_prompt_tokens: int = 0):
+        with self._lock:
+            entry = self._usage.setdefault(intent or "general", {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated_prompt_tokens": 0
+            })
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["estimated_prompt_tokens"] += estimated_prompt_tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for intent, entry in self._usage.items():
+                calls = entry["calls"] or 1
+                result[intent] = {
+                    **entry,
+                    "avg_prompt_tokens": round(entry["prompt_tokens"] / calls, 1),
+                    "avg_completion_tokens": round(entry["completion_tokens"] / calls, 1),
+                    "budget": dict(zip(("input", "output"), get_budget(intent)))
+                }
+            return result
+
+
+token_usage = TokenUsageTracker()
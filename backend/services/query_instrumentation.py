@@ -0,0 +1,206 @@
+import os
+import re
+import sys
+import time
+import logging
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, Any, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their parameters and caller
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+# Identical statement shapes repeated this many times in one request are flagged as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "3"))
+
+_SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Reduce a SQL statement to its shape so repeated lookups compare equal"""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def find_calling_service() -> str:
+    """Return the service method (or endpoint) that issued the current statement"""
+    frame = sys._getframe(1)
+    endpoint = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_SERVICES_DIR) and filename != __file__:
+            owner = frame.f_locals.get("self")
+            prefix = f"{type(owner).__name__}." if owner is not None else ""
+            return f"{prefix}{frame.f_code.co_name}"
+        if endpoint is None and filename.endswith("main.py"):
+            endpoint = f"main.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return endpoint or "unknown"
+
+
+class RequestQueryStats:
+    """Statements and DB time recorded for a single request"""
+
+    def __init__(self, endpoint: str = ""):
+        self.endpoint = endpoint
+        self.query_count = 0
+        self.total_time_ms = 0.0
+        self.statement_counts: Dict[str, int] = {}
+        self.n_plus_one: Dict[str, Dict[str, Any]] = {}
+        self.slow_queries: List[Dict[str, Any]] = []
+
+    def record(self, statement: str, parameters: Any, elapsed_ms: float):
+        self.query_count += 1
+        self.total_time_ms += elapsed_ms
+
+        shape = normalize_statement(statement)
+        count = self.statement_counts.get(shape, 0) + 1
+        self.statement_counts[shape] = count
+
+        # Repeated writes are expected (one INSERT per message); N+1 is a read pattern
+        if count >= N_PLUS_ONE_THRESHOLD and shape[:6].upper() == "SELECT":
+            suspect = self.n_plus_one.get(shape)
+            if suspect is None:
+                # Only walk the stack the first time a shape crosses the threshold
+                suspect = {"statement": shape, "count": count, "caller": find_calling_service()}
+                self.n_plus_one[shape] = suspect
+                logger.warning(
+                    f"Suspected N+1 in {self.endpoint or 'unknown endpoint'}: "
+                    f"{suspect['caller']} repeated statement {count} times: {shape}"
+                )
+            suspect["count"] = count
+
+        if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+            caller = find_calling_service()
+            self.slow_queries.append({
+                "statement": shape,
+                "elapsed_ms": round(elapsed_ms, 2),
+                "caller": caller
+            })
+            logger.warning(
+                f"Slow query ({elapsed_ms:.1f} ms) from {caller}: {statement} -- parameters: {parameters!r}"
+            )
+
+
+class QueryMetricsRegistry:
+    """Per-endpoint aggregation of query counts and DB time across requests"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record_request(self, stats: RequestQueryStats):
+        with self._lock:
+            entry = self._endpoints.setdefault(stats.endpoint, {
+                "requests": 0,
+                "total_queries": 0,
+                "max_queries": 0,
+                "total_db_time_ms": 0.0,
+                "n_plus_one_requests": 0,
+                "slow_queries": 0,
+                "n_plus_one_statements": {}
+            })
+            entry["requests"] += 1
+            entry["total_queries"] += stats.query_count
+            entry["max_queries"] = max(entry["max_queries"], stats.query_count)
+            entry["total_db_time_ms"] += stats.total_time_ms
+            entry["slow_queries"] += len(stats.slow_queries)
+            if stats.n_plus_one:
+                entry["n_plus_one_requests"] += 1
+                for shape, suspect in stats.n_plus_one.items():
+                    seen = entry["n_plus_one_statements"].setdefault(
+                        shape, {"caller": suspect["caller"], "occurrences": 0}
+                    )
+                    seen["occurrences"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return per-endpoint averages suitable for an API response"""
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._endpoints.items():
+                requests = entry["requests"] or 1
+                result[endpoint] = {
+                    "requests": entry["requests"],
+                    "avg_queries": round(entry["total_queries"] / requests, 2),
+                    "max_queries": entry["max_queries"],
+                    "avg_db_time_ms": round(entry["total_db_time_ms"] / requests, 2),
+                    "slow_queries": entry["slow_queries"],
+                    "n_plus_one_requests": entry["n_plus_one_requests"],
+                    "n_plus_one_statements": [
+                        {"statement": shape, **details}
+                        for shape, details in entry["n_plus_one_statements"].items()
+                    ]
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+query_metrics = QueryMetricsRegistry()
+_instrumented_engines = set()
+
+
+def start_request(endpoint: str = "") -> RequestQueryStats:
+    """Begin collecting statements for the current request context"""
+    stats = RequestQueryStats(endpoint)
+    _current_stats.set(stats)
+    return stats
+
+
+def finish_request(stats: RequestQueryStats, endpoint: Optional[str] = None):
+    """Publish a finished request's statistics to the per-endpoint registry"""
+    if endpoint:
+        stats.endpoint = endpoint
+    query_metrics.record_request(stats)
+
+
+def get_current_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed_ms = (time.perf_counter() - start_times.pop()) * 1000
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, parameters, elapsed_ms)
+    elif elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        # Statements outside a request (startup, scripts) still get the slow-query log
+        logger.warning(
+            f"Slow query ({elapsed_ms:.1f} ms) from {find_calling_service()}: {statement} -- parameters: {parameters!r}"
+        )
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+
+def instrument_engine(engine: Engine):
+    """Attach statement timing listeners to an engine (idempotent)"""
+    if id(engine) in _instrumented_engines:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    _instrumented_engines.add(id(engine))
@@ -1,20 +1,47 @@
 import re
 from typing import Dict, Any, Optional, List
 from enum import Enum
+from services.gazetteer import CatalogGazetteer
 
 class QueryType(str, Enum):
     TOP_PRODUCTS = "top_products"
+    TRENDING_PRODUCTS = "trending_products"
     ORDER_STATUS = "order_status"
+    ORDER_ETA = "order_eta"
     STOCK_LEVELS = "stock_levels"
     USER_ORDERS = "user_orders"
     PRODUCT_DETAILS = "product_details"
     SALES_ANALYTICS = "sales_analytics"
+    DISTRIBUTION_CENTER = "distribution_center"
     GENERAL = "general"
 
 class QueryParser:
-    def __init__(self):
+    def __init__(self, gazetteer: Optional[CatalogGazetteer] = None):
+        # Catalog entities (product names, brands, categories) resolve to canonical values when
+        # a gazetteer is given; the regex captures are used as free text otherwise
+        self.gazetteer = gazetteer
         # Patterns for different types of queries
         self.patterns = {
+            # Checked first: "where is order 5 shipping from" must not read as an order status
+            QueryType.DISTRIBUTION_CENTER: [
+                r"order\s+(?:id\s+)?#?(\d+)\s+(?:\w+\s+){0,3}?(?:ship(?:ping|ped|s)?|coming|sent)\s+from",
+                r"(?:ship(?:ping|ped|s)?|coming|sent)\s+from\b.*?order\s+(?:id\s+)?#?(\d+)",
+                r"(?:which|what|nearest|closest)\s+(?:\w+\s+)?(?:warehouse|distribution\s+cent(?:er|re)|dc)\b",
+                r"(?:warehouse|distribution\s+cent(?:er|re))s?\s+(?:near|closest|nearest|serves?|serving)"
+            ],
+            # Before ORDER_STATUS: "when will order 5 arrive" asks for a forecast, not the status
+            QueryType.ORDER_ETA: [
+                r"when\s+(?:will|does|should|is)\s+(?:my\s+)?order\s+(?:id\s+)?#?(\d+)\s+(?:\w+\s+){0,2}?(?:arrive|delivered|get\s+here|come|due)",
+                r"(?:eta|delivery\s+(?:date|estimate|time))\s+(?:for\s+|of\s+)?(?:my\s+)?order\s+(?:id\s+)?#?(\d+)",
+                r"how\s+long\s+(?:until|till|before|will)\s+(?:my\s+)?order\s+(?:id\s+)?#?(\d+)",
+                r"order\s+(?:id\s+)?#?(\d+)\s+(?:eta|delivery\s+(?:date|estimate))"
+            ],
+            # Before TOP_PRODUCTS: a time frame asks about recent sales, not all-time best sellers
+            QueryType.TRENDING_PRODUCTS: [
+                r"\btrending\b",
+                r"(?:selling|sold|popular|hot)\s+(?:the\s+)?(?:most\s+)?(?:products?\s+)?(?:right\s+now|today|this\s+(?:hour|week)|in\s+the\s+(?:last|past)\s+(?:hour|day|24\s+hours|week|7\s+days))",
+                r"(?:hot|best\s+selling)\s+products?\s+(?:right\s+)?now"
+            ],
             QueryType.TOP_PRODUCTS: [
                 r"top\s+(\d+)?\s*(?:most\s+)?(?:sold|popular|best\s+selling)\s+products?",
                 r"(?:what\s+are\s+)?(?:the\s+)?(?:top\s+)?(\d+)?\s*(?:most\s+)?(?:sold|popular|best\s+selling)\s+products?",
@@ -40,9 +67,9 @@ class QueryParser:
                 r"customer\s+(\d+)\s+orders?"
             ],
             QueryType.PRODUCT_DETAILS: [
-                r"product\s+(?:details|information)\s+(?:for\s+)?(.+?)",
-                r"tell\s+me\s+about\s+(?:the\s+)?(.+?)",
-                r"what\s+is\s+(?:the\s+)?(.+?)",
+                r"product\s+(?:details|information)\s+(?:for\s+)?(.+?)\s*[?.!]?$",
+                r"tell\s+me\s+about\s+(?:the\s+)?(.+?)\s*[?.!]?$",
+                r"what\s+is\s+(?:the\s+)?(.+?)\s*[?.!]?$",
                 r"(.+?)\s+(?:product|item|details)"
             ],
             QueryType.SALES_ANALYTICS: [
@@ -71,6 +98,15 @@ class QueryParser:
                         "confidence": 0.9
                     }
         
+        # A bare product name ("premium dress 1?") asks about that product
+        entity = self._catalog_entity(user_message)
+        if entity and entity["kind"] == "product":
+            return {
+                "query_type": QueryType.PRODUCT_DETAILS,
+                "parameters": self._entity_parameters(entity),
+                "confidence": 0.7
+            }
+        
         # If no specific pattern matches, return general query
         return {
             "query_type": QueryType.GENERAL,
@@ -89,16 +125,31 @@ class QueryParser:
             else:
                 params["limit"] = 5
         
-        elif query_type == QueryType.ORDER_STATUS:
+        elif query_type == QueryType.TRENDING_PRODUCTS:
+            limit_match = re.search(r"(?:top\s+)(\d+)|(\d+)\s+(?:trending|hot|best)", full_message)
+            if limit_match:
+                params["limit"] = int(limit_match.group(1) or limit_match.group(2))
+            # Time frame, mapped to a tracked window; the tracker's default otherwise
+            for window, pattern in (("1h", r"\bhour\b|right\s+now"), ("24h", r"\btoday\b|\bday\b|24\s+hours"),
+                                    ("7d", r"\bweek\b|7\s+days")):
+                if re.search(pattern, full_message):
+                    params["window"] = window
+                    break
+        
+        elif query_type in (QueryType.ORDER_STATUS, QueryType.ORDER_ETA):
             # Extract order ID
             params["order_id"] = int(match.group(1))
         
         elif query_type == QueryType.STOCK_LEVELS:
-            # Extract product name
-            product_name = match.group(1).strip()
-            # Clean up the product name
-            product_name = re.sub(r'\s+(?:left\s+)?(?:in\s+stock|available)?$', '', product_name)
-            params["product_name"] = product_name
+            entity = self._catalog_entity(full_message)
+            if entity:
+                params.update(self._entity_parameters(entity))
+            else:
+                # Extract product name
+                product_name = match.group(1).strip()
+                # Clean up the product name
+                product_name = re.sub(r'\s+(?:left\s+)?(?:in\s+stock|available)?$', '', product_name)
+                params["product_name"] = product_name
         
         elif query_type == QueryType.USER_ORDERS:
             # Extract user ID if specified
@@ -106,21 +157,64 @@ class QueryParser:
                 params["user_id"] = int(match.group(1))
         
         elif query_type == QueryType.PRODUCT_DETAILS:
-            # Extract product name
-            product_name = match.group(1).strip()
-            params["product_name"] = product_name
+            entity = self._catalog_entity(full_message)
+            if entity:
+                params.update(self._entity_parameters(entity))
+            else:
+                # Extract product name
+                product_name = match.group(1).strip()
+                params["product_name"] = product_name
         
+        elif query_type == QueryType.DISTRIBUTION_CENTER:
+            # Order ID for "where is order N shipping from", otherwise the customer and product
+            if match.lastindex:
+                params["order_id"] = int(match.group(1))
+            user_match = re.search(r"(?:user|customer)\s+(?:id\s+)?#?(\d+)", full_message)
+            if user_match:
+                params["user_id"] = int(user_match.group(1))
+            product_match = re.search(
+                r"(?:with|has|have|stocks?|carr(?:y|ies))\s+(?:the\s+|any\s+|some\s+)?(.+?)"
+                r"(?:\s+(?:in\s+stock|available))?(?:\s+(?:for|near|to)\s+.*)?[?.!]*$",
+                full_message
+            )
+            if product_match and not params.get("order_id"):
+                # Only the product clause is looked up, so words of the question itself never match
+                entity = self._catalog_entity(product_match.group(1))
+                if entity:
+                    params.update(self._entity_parameters(entity))
+                else:
+                    params["product_name"] = product_match.group(1).strip()
+        
+        return params
+    
+    def _catalog_entity(self, text: str) -> Optional[Dict[str, Any]]:
+        """Most specific catalog entity named in text, if a gazetteer is available"""
+        if self.gazetteer is None:
+            return None
+        return self.gazetteer.best(text)
+    
+    def _entity_parameters(self, entity: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Canonical product_name plus how to match it: "product" (exact name, with its product ids),
+        "category" or "brand". Without "match" the name is a free-text substring.
+        """
+        params = {"product_name": entity["name"], "match": entity["kind"]}
+        if entity["kind"] == "product":
+            params["product_ids"] = entity["ids"]
         return params
     
     def get_response_template(self, query_type: QueryType) -> str:
         """Get response template for different query types"""
         templates = {
             QueryType.TOP_PRODUCTS: "Here are the top {limit} most sold products:",
+            QueryType.TRENDING_PRODUCTS: "Here is what is selling in the last {window}:",
             QueryType.ORDER_STATUS: "Order status for order #{order_id}:",
+            QueryType.ORDER_ETA: "Estimated delivery for order #{order_id}:",
             QueryType.STOCK_LEVELS: "Stock levels for {product_name}:",
             QueryType.USER_ORDERS: "Orders for user {user_id}:",
             QueryType.PRODUCT_DETAILS: "Product details for {product_name}:",
             QueryType.SALES_ANALYTICS: "Here are the overall sales analytics:",
+            QueryType.DISTRIBUTION_CENTER: "Nearest distribution center:",
             QueryType.GENERAL: "I understand you're asking about: {message}. Let me help you with that."
         }
         return templates.get(query_type, "I'll help you with that.") 
\ No newline at end of file
@@ -0,0 +1,265 @@
+import os
+import math
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# Upstream provider quota (Groq free tier defaults); 0 disables a limit
+LLM_RPM_LIMIT = float(os.getenv("LLM_RPM_LIMIT", "30"))
+LLM_TPM_LIMIT = float(os.getenv("LLM_TPM_LIMIT", "6000"))
+# How long an LLM call may queue for quota before the request is downgraded to formatter-only
+LLM_QUOTA_MAX_WAIT_MS = float(os.getenv("LLM_QUOTA_MAX_WAIT_MS", "500"))
+
+# Per-user limit on /api/chat; 0 disables it
+USER_RATE_LIMIT_PER_MIN = float(os.getenv("USER_RATE_LIMIT_PER_MIN", "20"))
+USER_RATE_LIMIT_BURST = float(os.getenv("USER_RATE_LIMIT_BURST", "10"))
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# memory (per worker), sqlite (one WAL file shared by the workers on a host) or redis (shared by
+# hosts). Defaults to sqlite when several workers run, since per-worker buckets would each allow
+# the whole provider quota.
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "sqlite" if WEB_CONCURRENCY > 1 else "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv(
+    "RATE_LIMIT_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "ecommerce-chatbot-ratelimit.db")
+)
+RATE_LIMIT_PREFIX = os.getenv("RATE_LIMIT_PREFIX", "ratelimit:")
+
+
+class QuotaExceeded(Exception):
+    """The upstream LLM budget is exhausted and the call was not made"""
+
+
+class MemoryRateLimitStore:
+    """Token buckets in this process; each worker has its own"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def consume(self, key: str, capacity: float, refill_per_second: float, cost: float,
+                force: bool = False) -> Tuple[bool, float]:
+        """
+        Take cost tokens from the bucket. Returns (allowed, seconds until cost tokens are
+        available). force always takes them, letting the bucket go into debt (or refunds a
+        negative cost).
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            if tokens >= cost or force:
+                self._buckets[key] = (min(capacity, tokens - cost), now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, (cost - tokens) / refill_per_second
+
+
+class RedisRateLimitStore:
+    """Token buckets in Redis, shared by every worker and host using the same REDIS_URL"""
+
+    # Atomic refill-and-take; uses the Redis clock so workers agree on time
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local force = ARGV[4] == '1'
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= cost or force then
+        tokens = math.min(capacity, tokens - cost)
+        allowed = 1
+    else
+        retry_after = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for RATE_LIMIT_STORE=redis
+        self.client = redis.Redis.from_url(url)
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, refill_per_second, cost, force=False):
+        allowed, retry_after = self._script(
+            keys=[RATE_LIMIT_PREFIX + key], args=[capacity, refill_per_second, cost, "1" if force else "0"]
+        )
+        return bool(int(allowed)), float(retry_after)
+
+
+class SQLiteRateLimitStore:
+    """
+    Token buckets shared by all workers on a host through one SQLite file in WAL mode. Each
+    consume is one short write transaction, so refill-and-take is atomic across processes.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, capacity, refill_per_second, cost, force=False):
+        conn = self._connection()
+        # Wall clock: monotonic clocks are not comparable between processes everywhere
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * refill_per_second)
+            if tokens >= cost or force:
+                result = (True, 0.0)
+                tokens = min(capacity, tokens - cost)
+            else:
+                result = (False, (cost - tokens) / refill_per_second)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)", (key, tokens, now)
+            )
+            # Occasional sweep of idle buckets (long since refilled) keeps per-user keys bounded
+            if random.random() < 1 / 256:
+                conn.execute("DELETE FROM buckets WHERE updated_at < ?", (now - 3600,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+
+def create_store():
+    if RATE_LIMIT_STORE == "redis":
+        try:
+            return RedisRateLimitStore(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        except ImportError:
+            print("redis package not installed, falling back to in-memory rate limiting")
+    elif RATE_LIMIT_STORE == "sqlite":
+        try:
+            return SQLiteRateLimitStore(RATE_LIMIT_SQLITE_PATH)
+        except sqlite3.Error as e:
+            print(f"Shared rate limit store not available, falling back to in-memory rate limiting: {e}")
+    return MemoryRateLimitStore()
+
+
+class UpstreamQuota:
+    """
+    Requests-per-minute and tokens-per-minute budgets for the LLM provider.
+
+    A call reserves one request and its estimated tokens up front; if the budget is exhausted
+    it queues for up to max_wait and otherwise raises QuotaExceeded, so the caller can answer
+    from the formatter instead of collecting a 429. After the call the reservation is
+    corrected to the tokens actually used.
+    """
+
+    def __init__(self, store, rpm: float = LLM_RPM_LIMIT, tpm: float = LLM_TPM_LIMIT):
+        self.store = store
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    def acquire(self, estimated_tokens: int, max_wait: Optional[float] = None):
+        """Reserve quota for one call or raise QuotaExceeded"""
+        if max_wait is None:
+            max_wait = LLM_QUOTA_MAX_WAIT_MS / 1000
+        give_up_at = time.monotonic() + max_wait
+        queued = False
+        while True:
+            retry_after = self._try_acquire(estimated_tokens)
+            if retry_after == 0:
+                self._count("queued" if queued else "admitted")
+                return
+            if time.monotonic() + retry_after > give_up_at:
+                self._count("rejected")
+                raise QuotaExceeded(f"LLM quota exhausted, next slot in {retry_after:.2f}s")
+            queued = True
+            time.sleep(retry_after)
+
+    def record_usage(self, reserved_tokens: int, actual_tokens: int):
+        """Charge (or refund) the difference between reserved and actual tokens"""
+        if self.tpm > 0 and actual_tokens != reserved_tokens:
+            self.store.consume("llm:tpm", self.tpm, self.tpm / 60, actual_tokens - reserved_tokens, force=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"rpm_limit": self.rpm, "tpm_limit": self.tpm, **self.counters}
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take one request and the tokens, or neither; returns 0 or the seconds to wait"""
+        if self.rpm > 0:
+            allowed, retry_after = self.store.consume("llm:rpm", self.rpm, self.rpm / 60, 1)
+            if not allowed:
+                return retry_after
+        if self.tpm > 0:
+            # A prompt larger than the whole budget would otherwise never be admitted
+            allowed, retry_after = self.store.consume("llm:tpm", self.tpm, self.tpm / 60, min(tokens, self.tpm))
+            if not allowed:
+                if self.rpm > 0:
+                    self.store.consume("llm:rpm", self.rpm, self.rpm / 60, -1, force=True)
+                return retry_after
+        return 0.0
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+
+class UserRateLimiter:
+    """
+    Per-user token bucket for chat requests. Anonymous callers (no user id, or the frontend's
+    "anonymous") each get a bucket per client address, so they do not share one limit.
+    """
+
+    def __init__(self, store, per_minute: float = USER_RATE_LIMIT_PER_MIN, burst: float = USER_RATE_LIMIT_BURST):
+        self.store = store
+        self.per_minute = per_minute
+        self.burst = max(1.0, burst)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def check(self, user_id: Optional[str], client_host: Optional[str] = None) -> Tuple[bool, int]:
+        """Returns (allowed, Retry-After seconds)"""
+        if self.per_minute <= 0:
+            return True, 0
+        if user_id and user_id != "anonymous":
+            key = f"user:{user_id}"
+        else:
+            key = f"client:{client_host or 'unknown'}"
+        allowed, retry_after = self.store.consume(key, self.burst, self.per_minute / 60, 1)
+        if not allowed:
+            with self._lock:
+                self.rejected += 1
+        return allowed, math.ceil(retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"per_minute": self.per_minute, "burst": self.burst, "rejected": self.rejected}
+
+
+rate_limit_store = create_store()
+if isinstance(rate_limit_store, MemoryRateLimitStore) and WEB_CONCURRENCY > 1:
+    # Per-worker buckets: each worker gets its share of the provider quota
+    upstream_quota = UpstreamQuota(rate_limit_store, LLM_RPM_LIMIT / WEB_CONCURRENCY, LLM_TPM_LIMIT / WEB_CONCURRENCY)
+else:
+    upstream_quota = UpstreamQuota(rate_limit_store)
+user_rate_limiter = UserRateLimiter(rate_limit_store)
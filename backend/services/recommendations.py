@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+RECOMMENDATIONS_PATH = os.getenv("RECOMMENDATIONS_PATH", "recommendations")
+# Neighbours kept per product
+RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", "20"))
+# Pairs bought together in fewer orders than this are noise (lift is unstable on tiny counts)
+RECOMMENDATIONS_MIN_SUPPORT = int(os.getenv("RECOMMENDATIONS_MIN_SUPPORT", "2"))
+# How often a worker checks whether build_recommendations.py wrote a newer index
+RECOMMENDATIONS_RELOAD_SECONDS = float(os.getenv("RECOMMENDATIONS_RELOAD_SECONDS", "60"))
+
+# Orders self-joined at a time while counting pairs
+ORDERS_PER_CHUNK = 100000
+
+METRICS = ("lift", "cosine")
+_ARRAYS = ("product_ids", "names", "offsets", "neighbors", "neighbor_positions", "scores", "counts")
+
+
+def build_cooccurrence(pairs: pd.DataFrame, metric: str = "lift", top_k: int = RECOMMENDATIONS_TOP_K,
+                       min_support: int = RECOMMENDATIONS_MIN_SUPPORT) -> pd.DataFrame:
+    """
+    Top-k co-purchased products per product from (order_id, product_id) pairs.
+
+    Returns one row per kept (product_id, neighbor_id) with the number of orders containing
+    both and its score: lift = P(a and b) / (P(a) P(b)), or cosine = n(a, b) / sqrt(n(a) n(b)).
+    Only non-zero pairs are ever materialised, so the matrix stays sparse.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}")
+    baskets = pairs[["order_id", "product_id"]].dropna().drop_duplicates()
+    orders = baskets["order_id"].nunique()
+    frequency = baskets.groupby("product_id").size()
+
+    # Self-join of each basket gives every ordered pair bought together; done over slices of
+    # orders so the pair table never holds more than one slice before it is counted
+    order_ids = baskets["order_id"].unique()
+    partial_counts = []
+    for start in range(0, len(order_ids), ORDERS_PER_CHUNK):
+        chunk = baskets[baskets["order_id"].isin(order_ids[start:start + ORDERS_PER_CHUNK])]
+        together = chunk.merge(chunk, on="order_id", suffixes=("", "_other"))
+        together = together[together["product_id"] != together["product_id_other"]]
+        partial_counts.append(together.groupby(["product_id", "product_id_other"]).size())
+    if not partial_counts:
+        return pd.DataFrame(columns=["product_id", "neighbor_id", "count", "score"])
+    counts = pd.concat(partial_counts).groupby(level=[0, 1]).sum().rename("count").reset_index()
+    counts = counts[counts["count"] >= min_support]
+
+    left = frequency.reindex(counts["product_id"]).to_numpy(dtype=np.float64)
+    right = frequency.reindex(counts["product_id_other"]).to_numpy(dtype=np.float64)
+    if metric == "lift":
+        scores = counts["count"].to_numpy() * orders / (left * right)
+    else:
+        scores = counts["count"].to_numpy() / np.sqrt(left * right)
+    counts = counts.assign(score=scores).rename(columns={"product_id_other": "neighbor_id"})
+
+    # Best first (ties by co-occurrence count), then keep k per product
+    counts = counts.sort_values(["product_id", "score", "count"], ascending=[True, False, False])
+    return counts[counts.groupby("product_id").cumcount() < top_k].reset_index(drop=True)
+
+
+def save_index(neighbors: pd.DataFrame, names: Dict[int, str], path: str = RECOMMENDATIONS_PATH,
+               metric: str = "lift", orders: int = 0):
+    """
+    Write the neighbour lists as CSR-style .npy arrays (products, offsets into flat neighbour,
+    score and count arrays) plus meta.json naming them. Arrays get a fresh version suffix and
+    meta.json is replaced last, so running workers keep reading the previous arrays until they
+    reload.
+    """
+    os.makedirs(path, exist_ok=True)
+    product_ids = np.unique(neighbors["product_id"].to_numpy(dtype=np.int64))
+    sizes = neighbors.groupby("product_id").size().reindex(product_ids).to_numpy()
+    offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+    product_names = [names.get(int(product_id), "") for product_id in product_ids]
+    neighbor_ids = neighbors["neighbor_id"].to_numpy(dtype=np.int64)
+    # Co-occurrence is symmetric, so every neighbour is also a product; its row in names is
+    # stored so a lookup needs no search per neighbour
+    neighbor_positions = np.searchsorted(product_ids, neighbor_ids)
+    arrays = {
+        "product_ids": product_ids,
+        "names": np.array(product_names, dtype=f"<U{max([len(name) for name in product_names] + [1])}"),
+        "offsets": offsets,
+        "neighbors": neighbor_ids,
+        "neighbor_positions": neighbor_positions.astype(np.int32),
+        "scores": neighbors["score"].to_numpy(dtype=np.float32),
+        "counts": neighbors["count"].to_numpy(dtype=np.int32),
+    }
+
+    version = uuid.uuid4().hex[:12]
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}-{version}.npy"), array)
+    meta = {"version": version, "metric": metric, "orders": orders, "products": len(product_ids),
+            "pairs": len(neighbors), "built_at": datetime.utcnow().isoformat()}
+    temporary = os.path.join(path, "meta.json.tmp")
+    with open(temporary, "w", encoding="utf-8") as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(temporary, os.path.join(path, "meta.json"))
+
+    # Earlier versions are no longer named by meta.json; open memory maps survive the unlink
+    for filename in os.listdir(path):
+        if filename.endswith(".npy") and not filename.endswith(f"-{version}.npy"):
+            os.remove(os.path.join(path, filename))
+
+
+class RecommendationIndex:
+    """
+    Memory-mapped top-k neighbour lists. A lookup is a binary search over the sorted product
+    ids and an O(k) slice of the neighbour arrays; pages are shared between workers through
+    the OS page cache.
+    """
+
+    def __init__(self, path: str = RECOMMENDATIONS_PATH):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as meta_file:
+            self.meta = json.load(meta_file)
+        version = self.meta["version"]
+        for name in _ARRAYS:
+            # Plain ndarray views of the maps; slicing a np.memmap builds a new memmap object each time
+            array = np.load(os.path.join(path, f"{name}-{version}.npy"), mmap_mode="r")
+            setattr(self, name, array.view(np.ndarray))
+
+    def recommend(self, product_id: int, limit: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """Products most often bought with product_id, best first; None if it is not in the index"""
+        position = self._position(product_id)
+        if position is None:
+            return None
+        start = int(self.offsets[position])
+        end = min(int(self.offsets[position + 1]), start + limit)
+        return [
+            {
+                "product_id": neighbor,
+                "product_name": name,
+                "score": round(score, 3),
+                "orders_together": count
+            }
+            for neighbor, name, score, count in zip(
+                self.neighbors[start:end].tolist(), self.names[self.neighbor_positions[start:end]].tolist(),
+                self.scores[start:end].tolist(), self.counts[start:end].tolist()
+            )
+        ]
+
+    def _position(self, product_id: int) -> Optional[int]:
+        position = int(np.searchsorted(self.product_ids, product_id))
+        if position < len(self.product_ids) and self.product_ids[position] == product_id:
+            return position
+        return None
+
+
+_index: Optional[RecommendationIndex] = None
+_index_lock = threading.Lock()
+_checked_at: Optional[float] = None
+
+
+def get_recommendation_index(path: str = RECOMMENDATIONS_PATH) -> Optional[RecommendationIndex]:
+    """The worker's index, reloaded when build_recommendations.py has written a new version"""
+    global _index, _checked_at
+    if _checked_at is not None and time.monotonic() - _checked_at < RECOMMENDATIONS_RELOAD_SECONDS:
+        return _index
+    with _index_lock:
+        _checked_at = time.monotonic()
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as meta_file:
+                version = json.load(meta_file)["version"]
+            if _index is None or _index.meta["version"] != version:
+                _index = RecommendationIndex(path)
+        except FileNotFoundError:
+            _index = None
+        except Exception as e:
+            print(f"Error loading recommendations from {path}: {e}")
+        return _index
@@ -19,6 +19,23 @@ class ResponseFormatter:
         
         return response.strip()
     
+    def format_trending_products_response(self, products: List, window: Optional[str] = None) -> str:
+        """Format trending (recent best sellers) response"""
+        period = {"1h": "hour", "24h": "24 hours", "7d": "week"}.get(window, window) if window else None
+        period = f"in the last {period}" if period else "recently"
+        if not products:
+            return f"No sales recorded {period} yet."
+        
+        response = f"Here is what's trending {period}:\n\n"
+        for i, product in enumerate(products, 1):
+            # Counts are estimates from a bounded sketch; show the range when it is not exact
+            sold = f"{product.units_sold}" if not product.error else f"{product.units_sold - product.error}–{product.units_sold}"
+            response += f"{i}. **{product.product_name}** ({product.product_category})\n"
+            response += f"   - Sold: {sold} units\n"
+            response += f"   - Revenue: ${product.revenue:,.2f}\n\n"
+        
+        return response.strip()
+    
     def format_order_status_response(self, order_status: OrderStatusResponse) -> str:
         """Format order status response"""
         if not order_status:
@@ -43,6 +60,31 @@ class ResponseFormatter:
         
         return response
     
+    def format_order_eta_response(self, order_eta) -> str:
+        """Format estimated delivery response"""
+        if not order_eta:
+            return "I couldn't find that order. Please check the order ID and try again."
+        
+        response = f"**Order #{order_eta.order_id} Delivery Estimate:**\n\n"
+        response += f"**Status:** {(order_eta.status or 'unknown').title()}\n"
+        
+        if order_eta.stage == "delivered":
+            response += f"**Delivered:** {order_eta.expected.strftime('%B %d, %Y at %I:%M %p')}\n"
+        elif order_eta.stage == "closed":
+            response += "This order is no longer on its way, so there is no delivery estimate.\n"
+        elif order_eta.stage == "unknown":
+            response += "I don't have enough delivery history to estimate when it will arrive.\n"
+        else:
+            if order_eta.expected_ship:
+                response += f"**Expected to Ship:** {order_eta.expected_ship.strftime('%B %d, %Y')}\n"
+            response += f"**Expected Delivery:** {order_eta.expected.strftime('%B %d, %Y')}\n"
+            response += (f"**Likely Window:** {order_eta.earliest.strftime('%B %d')} – "
+                         f"{order_eta.latest.strftime('%B %d, %Y')} (80% of similar orders)\n")
+            if order_eta.overdue:
+                response += "\nThis order is taking longer than usual. Please contact support if it hasn't arrived soon.\n"
+        
+        return response
+    
     def format_stock_levels_response(self, stock_levels: List[StockLevelResponse]) -> str:
         """Format stock levels response"""
         if not stock_levels:
@@ -65,8 +107,8 @@ class ResponseFormatter:
         
         return response.strip()
     
-    def format_user_orders_response(self, orders: List) -> str:
-        """Format user orders response"""
+    def format_user_orders_response(self, orders: List, total: Optional[int] = None) -> str:
+        """Format user orders response (total counts orders beyond the ones given)"""
         if not orders:
             return "I couldn't find any orders for that user."
         
@@ -79,13 +121,14 @@ class ResponseFormatter:
                 response += f"   - Date: {order.created_at.strftime('%B %d, %Y')}\n"
             response += "\n"
         
-        if len(orders) > 5:
-            response += f"... and {len(orders) - 5} more orders."
+        total = len(orders) if total is None else total
+        if total > 5:
+            response += f"... and {total - 5} more orders."
         
         return response.strip()
     
-    def format_product_details_response(self, products: List) -> str:
-        """Format product details response"""
+    def format_product_details_response(self, products: List, also_bought: Optional[List] = None) -> str:
+        """Format product details response (with co-purchase recommendations if given)"""
         if not products:
             return "I couldn't find any information about that product."
         
@@ -105,6 +148,11 @@ class ResponseFormatter:
             response += f"  - Retail Price: ${product.product_retail_price:.2f}\n"
             response += f"  - Cost: ${product.cost:.2f}\n\n"
         
+        if also_bought:
+            response += "**Customers Also Bought:**\n"
+            for item in also_bought:
+                response += f"  - {item.product_name}\n"
+        
         return response.strip()
     
     def format_sales_analytics_response(self, analytics: Dict[str, Any]) -> str:
@@ -112,15 +160,59 @@ class ResponseFormatter:
         response = "**Sales Analytics Overview:**\n\n"
         response += f"**Total Orders:** {analytics['total_orders']:,}\n"
         response += f"**Total Revenue:** ${analytics['total_revenue']:,.2f}\n"
-        response += f"**Total Customers:** {analytics['total_customers']:,}\n"
-        response += f"**Total Products:** {analytics['total_products']:,}\n"
+        if analytics.get("approximate"):
+            # Distinct counts are estimates; show them with their margin
+            bounds = analytics["error_bounds"]
+            response += f"**Total Customers:** ~{analytics['total_customers']:,} (±{bounds['total_customers']:,})\n"
+            response += f"**Total Products:** ~{analytics['total_products']:,} (±{bounds['total_products']:,})\n"
+        else:
+            response += f"**Total Customers:** {analytics['total_customers']:,}\n"
+            response += f"**Total Products:** {analytics['total_products']:,}\n"
         
         if analytics['total_orders'] > 0:
             avg_order_value = analytics['total_revenue'] / analytics['total_orders']
             response += f"**Average Order Value:** ${avg_order_value:.2f}\n"
         
+        if analytics.get("item_price_percentiles"):
+            percentiles = analytics["item_price_percentiles"]
+            response += f"**Typical Item Price:** ${percentiles['p50']:.2f} (80% between ${percentiles['p10']:.2f} and ${percentiles['p90']:.2f})\n"
+        
+        return response
+    
+    def format_nearest_distribution_center_response(self, centers: List, product_name: Optional[str] = None) -> str:
+        """Format nearest distribution center response"""
+        if not centers:
+            if product_name:
+                return f"None of our distribution centers has {product_name} in stock right now."
+            return "I couldn't find a distribution center for that address."
+        
+        center = centers[0]
+        if product_name:
+            response = f"**Nearest Distribution Center with {product_name} in Stock:**\n\n"
+        else:
+            response = "**Your Nearest Distribution Center:**\n\n"
+        response += f"**Center:** {center.name}\n"
+        response += f"**Distance:** {center.distance_km:,.0f} km\n"
+        if center.available_stock is not None:
+            response += f"**Available Stock:** {center.available_stock} units\n"
+        
         return response
     
+    def format_order_distribution_centers_response(self, order_id: int, centers: List) -> str:
+        """Format the distribution centers an order ships from"""
+        if not centers:
+            return f"I couldn't find where order #{order_id} ships from. Please check the order ID and try again."
+        
+        response = f"**Order #{order_id} Ships From:**\n\n"
+        for center in centers:
+            response += f"**{center.name}**\n"
+            response += f"  - Items: {center.items_count}\n"
+            if center.distance_km is not None:
+                response += f"  - Distance to you: {center.distance_km:,.0f} km\n"
+            response += "\n"
+        
+        return response.strip()
+    
     def format_general_response(self, message: str) -> str:
         """Format general response for unrecognized queries"""
         response = f"I understand you're asking about: \"{message}\"\n\n"
@@ -129,7 +221,9 @@ class ResponseFormatter:
         response += "• **Order status** - Track orders by ID (e.g., 'order status 12345')\n"
         response += "• **Stock levels** - Check product availability (e.g., 'how many Classic T-Shirts left')\n"
         response += "• **Top products** - See best-selling items (e.g., 'top 5 most sold products')\n"
-        response += "• **Sales analytics** - Get business overview\n\n"
+        response += "• **Trending** - See what is selling right now (e.g., 'what's trending this week')\n"
+        response += "• **Sales analytics** - Get business overview\n"
+        response += "• **Distribution centers** - Find where an order ships from (e.g., 'where is order 12345 shipping from')\n\n"
         response += "Please try asking in a different way or be more specific!"
         
         return response
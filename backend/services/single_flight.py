@@ -0,0 +1,89 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised when a waiter gives up on an in-flight call it joined"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) runs the function; callers that arrive while it is
+    in flight wait for it and receive the same result or exception. Nothing is cached once the
+    call completes, so a later caller always triggers a fresh execution.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._executions = 0
+        self._shared = 0
+        self._timeouts = 0
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run fn once per key among concurrent callers.
+
+        timeout bounds how long a waiter blocks on someone else's call; the leader is bound only
+        by fn itself. A waiter that times out raises SingleFlightTimeout while the leader keeps
+        running and still delivers its result to the remaining waiters.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+            else:
+                call.waiters += 1
+                self._shared += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        elif not call.done.wait(timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise SingleFlightTimeout(f"Timed out after {timeout}s waiting for an in-flight call")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "executions": self._executions,
+                "shared_results": self._shared,
+                "waiter_timeouts": self._timeouts,
+                "in_flight": len(self._calls)
+            }
+
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a request payload, used as the coalescing key"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
@@ -0,0 +1,127 @@
+import math
+import base64
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch (Flajolet et al.) with 2**precision one-byte registers.
+
+    Values are hashed with pandas' vectorized 64-bit hash, which is the same in every process,
+    so sketches built by different workers or over different time buckets merge by taking the
+    register-wise maximum. The relative standard error is 1.04 / sqrt(2**precision).
+    """
+
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        # Below 10 the remaining hash bits no longer convert to float64 exactly (see add_many)
+        if not 10 <= precision <= 16:
+            raise ValueError("precision must be between 10 and 16")
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def for_error(cls, relative_error: float) -> "HyperLogLog":
+        """Smallest sketch whose relative standard error is at most relative_error"""
+        precision = math.ceil(math.log2((1.04 / relative_error) ** 2))
+        return cls(min(max(precision, 10), 16))
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add_many(self, values: Iterable[Any]):
+        values = np.asarray(values if isinstance(values, (list, np.ndarray)) else list(values))
+        if not len(values):
+            return
+        if values.dtype.kind in "US":
+            values = values.astype(object)
+        hashes = pd.util.hash_array(values)
+        # Top bits pick the register; the rank is the position of the first set bit in the rest
+        positions = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        _, exponents = np.frexp(rest.astype(np.float64))
+        ranks = (65 - self.precision - exponents).astype(np.uint8)
+        np.maximum.at(self.registers, positions, ranks)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"precision": self.precision, "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return cls(data["precision"], registers)
+
+
+class BottomKSample:
+    """
+    Uniform sample of at most size values: every value gets a random key and the size
+    smallest keys are kept. The union of two such samples, cut back to the size smallest keys,
+    is a uniform sample of the combined stream, so samples merge across buckets and workers.
+    population counts every value offered.
+    """
+
+    def __init__(self, size: int = 2000, keys: Optional[np.ndarray] = None, values: Optional[np.ndarray] = None,
+                 population: int = 0, seed: Optional[int] = None):
+        self.size = size
+        self.keys = keys if keys is not None else np.empty(0, dtype=np.float64)
+        self.values = values if values is not None else np.empty(0, dtype=np.float64)
+        self.population = population
+        self._rng = np.random.default_rng(seed)
+
+    def add_many(self, values: Iterable[float]):
+        values = np.asarray(values if isinstance(values, (list, np.ndarray)) else list(values), dtype=np.float64)
+        self.population += len(values)
+        self._keep(self._rng.random(len(values)), values)
+
+    def merge(self, other: "BottomKSample") -> "BottomKSample":
+        self.population += other.population
+        self._keep(other.keys, other.values)
+        return self
+
+    def _keep(self, keys: np.ndarray, values: np.ndarray):
+        keys = np.concatenate((self.keys, keys))
+        values = np.concatenate((self.values, values))
+        if len(keys) > self.size:
+            kept = np.argpartition(keys, self.size - 1)[:self.size]
+            keys, values = keys[kept], values[kept]
+        self.keys, self.values = keys, values
+
+    def quantiles(self, quantiles: List[float]) -> List[float]:
+        if not len(self.values):
+            return [0.0 for _ in quantiles]
+        return [float(value) for value in np.quantile(self.values, quantiles)]
+
+    def rank_error(self, quantile: float, z: float) -> float:
+        """Half-width (in quantile units) of the confidence interval of a sample quantile's rank"""
+        n, k = self.population, len(self.values)
+        if not k or k >= n:
+            return 0.0
+        # Binomial rank error with the finite population correction
+        return z * math.sqrt(quantile * (1 - quantile) / k * (n - k) / (n - 1))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"size": self.size, "population": self.population,
+                "keys": self.keys.tolist(), "values": self.values.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BottomKSample":
+        return cls(data["size"], np.array(data["keys"], dtype=np.float64), np.array(data["values"], dtype=np.float64),
+                   data["population"])
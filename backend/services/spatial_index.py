@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import DistributionCenter
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is optional; without it lookups compare against every center
+    cKDTree = None
+
+EARTH_RADIUS_KM = 6371.0088
+# Distribution centers rarely move; the index is rebuilt after this long (or on an ORM change)
+DC_INDEX_TTL = float(os.getenv("DC_INDEX_TTL", "3600"))
+# Points per vectorized step of a batch assignment (bounds the distance matrix without a tree)
+ASSIGN_CHUNK_SIZE = int(os.getenv("ASSIGN_CHUNK_SIZE", "10000"))
+# Below this many centers a single-point lookup is faster as one vectorized scan than a tree query
+TREE_MIN_CENTERS = 256
+
+
+class DistributionCenterIndex:
+    """
+    Nearest-neighbour index over distribution center coordinates.
+
+    Points are mapped to unit vectors, where straight-line (chord) distance orders points the
+    same way as great-circle distance, so a KD-tree (scipy's cKDTree) answers nearest queries
+    exactly; chord lengths are converted back to kilometres. Without scipy, haversine distances
+    to every center are computed with NumPy in one vectorized step per chunk of points; that is
+    also used for single-point lookups over a few centers, where the tree's call overhead dominates.
+    """
+
+    def __init__(self, centers: Sequence[Tuple[int, str, float, float]]):
+        self.ids = np.array([center[0] for center in centers], dtype=np.int64)
+        self.names = [center[1] for center in centers]
+        self.latitudes = np.array([center[2] for center in centers], dtype=np.float64)
+        self.longitudes = np.array([center[3] for center in centers], dtype=np.float64)
+        self._vectors = _unit_vectors(self.latitudes, self.longitudes)
+        self._tree = cKDTree(self._vectors) if cKDTree is not None and len(centers) else None
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Tuple[int, float]]:
+        """(position, distance_km) of the k nearest centers, nearest first"""
+        k = min(k, len(self))
+        if k == 0:
+            return []
+        if self._tree is not None and len(self) >= TREE_MIN_CENTERS:
+            chords, positions = self._tree.query(_unit_vectors(np.array([latitude]), np.array([longitude]))[0], k=k)
+            chords, positions = np.atleast_1d(chords), np.atleast_1d(positions)
+            return [(int(position), float(_chord_to_km(chord))) for position, chord in zip(positions, chords)]
+        distances = haversine_km(latitude, longitude, self.latitudes, self.longitudes)
+        positions = np.argsort(distances)[:k]
+        return [(int(position), float(distances[position])) for position in positions]
+
+    def ranked(self, latitude: float, longitude: float) -> List[Tuple[int, float]]:
+        """Every center as (position, distance_km), nearest first"""
+        return self.nearest(latitude, longitude, k=len(self))
+
+    def nearest_many(self, latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest center position and distance (km) for each point, vectorized"""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if self._tree is not None:
+            chords, positions = self._tree.query(_unit_vectors(latitudes, longitudes), k=1)
+            return positions.astype(np.int64), _chord_to_km(chords)
+
+        positions = np.empty(len(latitudes), dtype=np.int64)
+        distances = np.empty(len(latitudes), dtype=np.float64)
+        for start in range(0, len(latitudes), ASSIGN_CHUNK_SIZE):
+            end = start + ASSIGN_CHUNK_SIZE
+            # points x centers distance matrix for this chunk
+            matrix = haversine_km(latitudes[start:end, None], longitudes[start:end, None],
+                                  self.latitudes[None, :], self.longitudes[None, :])
+            positions[start:end] = np.argmin(matrix, axis=1)
+            distances[start:end] = matrix[np.arange(len(matrix)), positions[start:end]]
+        return positions, distances
+
+
+def _unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(latitudes), np.radians(longitudes)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def _chord_to_km(chords):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chords) / 2, 0.0, 1.0))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+_index: Optional[DistributionCenterIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_distribution_center_index(db: Session) -> DistributionCenterIndex:
+    """The process-wide index, built from the distribution_centers table on first use"""
+    global _index
+    index = _index
+    if index is not None and time.monotonic() - index.built_at < DC_INDEX_TTL:
+        return index
+    with _index_lock:
+        if _index is None or time.monotonic() - _index.built_at >= DC_INDEX_TTL:
+            centers = db.query(
+                DistributionCenter.id, DistributionCenter.name, DistributionCenter.latitude, DistributionCenter.longitude
+            ).order_by(DistributionCenter.id).all()
+            _index = DistributionCenterIndex([tuple(center) for center in centers])
+        return _index
+
+
+@event.listens_for(DistributionCenter, "after_insert")
+@event.listens_for(DistributionCenter, "after_update")
+@event.listens_for(DistributionCenter, "after_delete")
+def _reset_index(mapper, connection, target):
+    global _index
+    _index = None
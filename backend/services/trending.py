@@ -0,0 +1,477 @@
+import os
+import json
+import time
+import heapq
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from models import InventoryItem
+from services.pagination import stream_rows
+
+try:
+    import fcntl  # POSIX; elsewhere every process writes the snapshot
+except ImportError:
+    fcntl = None
+
+# Window name -> span:granularity; a window is kept as span/granularity bucket sketches
+TRENDING_WINDOWS = os.getenv("TRENDING_WINDOWS", "1h:1m,24h:15m,7d:6h")
+# Products tracked per bucket sketch overall, and per category / department
+TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", "200"))
+TRENDING_SEGMENT_CAPACITY = int(os.getenv("TRENDING_SEGMENT_CAPACITY", "50"))
+TRENDING_SNAPSHOT_PATH = os.getenv("TRENDING_SNAPSHOT_PATH", "trending_snapshot.json")
+# Minimum seconds between snapshots written after new sales
+TRENDING_SNAPSHOT_SECONDS = float(os.getenv("TRENDING_SNAPSHOT_SECONDS", "300"))
+# Seconds between reads of new sales from inventory_items (0 disables polling)
+TRENDING_POLL_SECONDS = float(os.getenv("TRENDING_POLL_SECONDS", "10"))
+# Sales committed up to this many seconds after their sold_at (long transactions, replica lag)
+# are still counted; each poll re-reads this much before the newest sale seen
+TRENDING_POLL_LAG = float(os.getenv("TRENDING_POLL_LAG", "120"))
+
+ALL = "all"
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k sketch (Metwally et al.) over product sales.
+
+    Holds at most capacity counters. A product not yet counted takes over the smallest counter
+    and inherits its count as error, so count is an upper bound of the product's sales and
+    count - error a lower bound; any product with more than total/capacity sales is present.
+    Revenue is summed from the moment a product holds a counter. The minimum is found through
+    a lazily updated heap, so an update is O(log capacity) at any sales volume.
+    """
+
+    __slots__ = ("capacity", "counters", "_heap")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        # product id -> [count, error, revenue]
+        self.counters: Dict[int, List[float]] = {}
+        # (count, product id); entries whose count is no longer current are skipped
+        self._heap: List[Tuple[float, int]] = []
+
+    def add(self, key: int, count: int = 1, revenue: float = 0.0):
+        counter = self.counters.get(key)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = self.counters[key] = [0, 0, 0.0]
+            else:
+                floor = self.counters.pop(self._pop_min())
+                counter = self.counters[key] = [floor[0], floor[0], 0.0]
+        counter[0] += count
+        counter[2] += revenue
+        heapq.heappush(self._heap, (counter[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def floor(self) -> float:
+        """Largest count a product missing from the sketch can have"""
+        if len(self.counters) < self.capacity:
+            return 0
+        key = self._pop_min()
+        heapq.heappush(self._heap, (self.counters[key][0], key))
+        return self.counters[key][0]
+
+    def top(self, limit: int) -> List[Tuple[int, List[float]]]:
+        return heapq.nlargest(limit, self.counters.items(), key=lambda item: (item[1][0], -item[0]))
+
+    @classmethod
+    def merged(cls, sketches: Iterable["SpaceSaving"], capacity: int) -> "SpaceSaving":
+        """Sum of several sketches (e.g. the buckets of a window), keeping capacity counters"""
+        result = cls(capacity)
+        result.counters = dict(cls.merged_top(sketches, capacity))
+        result._rebuild_heap()
+        return result
+
+    @staticmethod
+    def merged_top(sketches: Iterable["SpaceSaving"], limit: int) -> List[Tuple[int, List[float]]]:
+        """
+        The limit largest counters of the sum of several sketches. A product missing from a full
+        sketch may have sold up to that sketch's floor there, which is added to its count and error.
+        """
+        sketches = list(sketches)
+        if len(sketches) == 1:
+            return sketches[0].top(limit)
+        floors = [sketch.floor() for sketch in sketches]
+        total_floor = sum(floors)
+        # product id -> [count, error, revenue, floors of the sketches it is in]
+        totals: Dict[int, List[float]] = {}
+        for sketch, floor in zip(sketches, floors):
+            for key, (count, error, revenue) in sketch.counters.items():
+                total = totals.get(key)
+                if total is None:
+                    total = totals[key] = [0, 0, 0.0, 0]
+                total[0] += count
+                total[1] += error
+                total[2] += revenue
+                total[3] += floor
+        kept = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1][0] - item[1][3], -item[0]))
+        return [
+            (key, [count + total_floor - present_floor, error + total_floor - present_floor, revenue])
+            for key, (count, error, revenue, present_floor) in kept
+        ]
+
+    def _pop_min(self) -> int:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            counter = self.counters.get(key)
+            if counter is not None and counter[0] == count:
+                return key
+
+    def _rebuild_heap(self):
+        self._heap = [(counter[0], key) for key, counter in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def to_list(self) -> List[List[float]]:
+        return [[key, *counter] for key, counter in self.counters.items()]
+
+    @classmethod
+    def from_list(cls, capacity: int, rows: List[List[float]]) -> "SpaceSaving":
+        sketch = cls(capacity)
+        for key, count, error, revenue in rows[:capacity]:
+            sketch.counters[int(key)] = [count, error, revenue]
+        sketch._rebuild_heap()
+        return sketch
+
+
+class SlidingWindow:
+    """
+    Sales of the last span seconds as one sketch per scope for each granularity-long bucket.
+    Buckets that slide out are dropped whole. The closed buckets are merged once per bucket
+    rotation, so a query only adds the current bucket to that merge.
+    """
+
+    def __init__(self, span: int, granularity: int):
+        self.span = span
+        self.granularity = granularity
+        self.slots = max(1, -(-span // granularity))
+        # bucket index (epoch seconds // granularity) -> scope -> sketch
+        self.buckets: Dict[int, Dict[str, SpaceSaving]] = {}
+        # scope -> (current bucket index when merged, merge of the other buckets)
+        self._closed: Dict[str, Tuple[int, SpaceSaving]] = {}
+        # (scope, limit) -> (version, current bucket index, result); any sale bumps the version
+        self._results: Dict[Tuple[str, int], Tuple[int, int, List]] = {}
+        self._version = 0
+
+    def add(self, timestamp: float, scopes: Tuple[str, ...], key: int, revenue: float, now: float):
+        current = int(now // self.granularity)
+        # Clock skew can date a sale slightly ahead; it counts in the current bucket
+        index = min(int(timestamp // self.granularity), current)
+        if index <= current - self.slots:
+            return
+        bucket = self.buckets.get(index)
+        if bucket is None:
+            # A new bucket: drop those that slid out, so memory stays bounded without queries
+            self._expire(current)
+            bucket = self.buckets[index] = {}
+        for scope in scopes:
+            sketch = bucket.get(scope)
+            if sketch is None:
+                sketch = bucket[scope] = SpaceSaving(_capacity(scope))
+            sketch.add(key, 1, revenue)
+        self._version += 1
+        if index != current:
+            self._closed.clear()
+
+    def top(self, scope: str, limit: int, now: float) -> List[Tuple[int, List[float]]]:
+        current = int(now // self.granularity)
+        cached = self._results.get((scope, limit))
+        if cached is not None and cached[:2] == (self._version, current):
+            return cached[2]
+        self._expire(current)
+        closed = self._closed.get(scope)
+        if closed is None or closed[0] != current:
+            closed = (current, SpaceSaving.merged(
+                (bucket[scope] for index, bucket in self.buckets.items() if index != current and scope in bucket),
+                _capacity(scope)
+            ))
+            self._closed[scope] = closed
+        live = self.buckets.get(current, {}).get(scope)
+        result = SpaceSaving.merged_top((closed[1], live) if live else (closed[1],), limit)
+        if len(self._results) > 1000:
+            self._results.clear()
+        self._results[(scope, limit)] = (self._version, current, result)
+        return result
+
+    def _expire(self, current: int):
+        for index in [index for index in self.buckets if index <= current - self.slots]:
+            del self.buckets[index]
+
+
+class TrendingTracker:
+    """
+    Streaming top products per sliding window, overall and per category and department.
+
+    Fed by the sales in inventory_items: poll() counts the rows whose sold_at is newer than
+    the last sale seen, whichever process wrote them, so every API worker holds the same
+    counts and a query never touches the database. Memory is bounded by windows x buckets x
+    scopes x capacity, independent of sales volume. At startup the windows come from the last
+    snapshot, then the sales since it are replayed (or from the database alone without one).
+    """
+
+    def __init__(self, windows: str = TRENDING_WINDOWS):
+        self.windows = {name: SlidingWindow(span, granularity) for name, (span, granularity) in _parse_windows(windows).items()}
+        # product id -> (name, category, department)
+        self.products: Dict[int, Tuple[str, str, str]] = {}
+        self.events = 0
+        # Newest sold_at counted (naive UTC), and the items counted within TRENDING_POLL_LAG of
+        # it, which the next poll reads again and must not count twice
+        self.watermark: Optional[datetime] = None
+        self._recent: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        # Serializes polls with snapshot saves and loads; always taken before _lock
+        self._poll_lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._dirty = False
+        self._saving = False
+        self._saved_at = time.monotonic()
+        self._snapshot_lock_file = None
+
+    def _add(self, product_id, product_name, category, department, revenue, sold_at, now):
+        self.products[product_id] = (product_name, category, department)
+        scopes = (ALL, _scope("category", category), _scope("department", department))
+        timestamp = _epoch(sold_at)
+        for window in self.windows.values():
+            window.add(timestamp, scopes, product_id, revenue or 0.0, now)
+        self.events += 1
+        self._dirty = True
+
+    def top(self, window: Optional[str] = None, limit: int = 10, category: Optional[str] = None,
+            department: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Best-selling products of a window (default: the first configured), most units first"""
+        window = window or next(iter(self.windows))
+        if window not in self.windows:
+            raise ValueError(f"window must be one of {', '.join(self.windows)}")
+        if category and department:
+            raise ValueError("filter by category or department, not both")
+        scope = _scope("category", category) if category else _scope("department", department) if department else ALL
+        with self._lock:
+            entries = self.windows[window].top(scope, limit, time.time())
+            products = [self.products.get(key, ("", "", "")) for key, _ in entries]
+        return [
+            {
+                "product_id": key,
+                "product_name": product[0],
+                "product_category": product[1],
+                "product_department": product[2],
+                "units_sold": int(count),
+                "revenue": round(revenue, 2),
+                "error": int(error)
+            }
+            for (key, (count, error, revenue)), product in zip(entries, products)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "events": self.events,
+                "products": len(self.products),
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+                "windows": {
+                    name: {"buckets": len(window.buckets), "counters": sum(
+                        len(sketch.counters) for bucket in window.buckets.values() for sketch in bucket.values()
+                    )}
+                    for name, window in self.windows.items()
+                }
+            }
+
+    def poll(self, db: Session) -> int:
+        """
+        Count the sales committed since the last poll (server-side cursor); the first poll reads
+        the longest window. Returns the number of sales counted.
+        """
+        with self._poll_lock:
+            now = datetime.utcnow()
+            since = now - timedelta(seconds=max(window.span for window in self.windows.values()))
+            if self.watermark is not None:
+                since = max(since, self.watermark - timedelta(seconds=TRENDING_POLL_LAG))
+            query = db.query(
+                InventoryItem.id, InventoryItem.product_id, InventoryItem.product_name, InventoryItem.product_category,
+                InventoryItem.product_department, InventoryItem.product_retail_price, InventoryItem.sold_at
+            ).filter(InventoryItem.sold_at > since)
+            clock = time.time()
+            newest = self.watermark or since
+            counted = 0
+            for item_id, *sale in stream_rows(query):
+                sold_at = _utc(sale[-1])
+                if item_id in self._recent:
+                    continue
+                with self._lock:
+                    self._add(*sale, clock)
+                self._recent[item_id] = sold_at
+                newest = max(newest, sold_at)
+                counted += 1
+            # A sale dated ahead of this clock must not push later ones out of the re-read
+            self.watermark = min(newest, now)
+            horizon = self.watermark - timedelta(seconds=TRENDING_POLL_LAG)
+            self._recent = {item_id: sold_at for item_id, sold_at in self._recent.items() if sold_at > horizon}
+        if counted:
+            self._maybe_snapshot()
+        return counted
+
+    def start_polling(self, session_factory: Callable[[], Session], interval: float = TRENDING_POLL_SECONDS):
+        """Poll for new sales every interval seconds in a daemon thread"""
+        if interval <= 0 or (self._poller is not None and self._poller.is_alive()):
+            return
+        self._stop.clear()
+        self._poller = threading.Thread(
+            target=self._poll_loop, args=(session_factory, interval), name="trending-poller", daemon=True
+        )
+        self._poller.start()
+
+    def stop_polling(self):
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(timeout=5)
+            self._poller = None
+
+    def _poll_loop(self, session_factory: Callable[[], Session], interval: float):
+        while not self._stop.wait(interval):
+            db = session_factory()
+            try:
+                self.poll(db)
+            except Exception as e:
+                print(f"Error polling sales for trending products: {e}")
+            finally:
+                db.close()
+
+    def save(self, path: str = TRENDING_SNAPSHOT_PATH):
+        with self._poll_lock, self._lock:
+            snapshot = {
+                "saved_at": datetime.utcnow().isoformat(),
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+                "recent": {str(item_id): sold_at.isoformat() for item_id, sold_at in self._recent.items()},
+                "products": {str(key): list(product) for key, product in self.products.items()},
+                "windows": {
+                    name: {
+                        "span": window.span,
+                        "granularity": window.granularity,
+                        "buckets": {
+                            str(index): {scope: sketch.to_list() for scope, sketch in bucket.items()}
+                            for index, bucket in window.buckets.items()
+                        }
+                    }
+                    for name, window in self.windows.items()
+                }
+            }
+            self._dirty = False
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(",", ":"))
+        os.replace(temporary, path)
+        self._saved_at = time.monotonic()
+
+    def load(self, path: str = TRENDING_SNAPSHOT_PATH) -> bool:
+        """
+        Restore a snapshot; windows whose span or granularity changed since start empty.
+        Snapshots without a watermark cannot be replayed from and are ignored.
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path, encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        if not snapshot.get("watermark"):
+            return False
+        with self._poll_lock, self._lock:
+            self.watermark = datetime.fromisoformat(snapshot["watermark"])
+            self._recent = {int(item_id): datetime.fromisoformat(sold_at) for item_id, sold_at in snapshot.get("recent", {}).items()}
+            self.products = {int(key): tuple(product) for key, product in snapshot["products"].items()}
+            for name, saved in snapshot["windows"].items():
+                window = self.windows.get(name)
+                if window is None or (saved["span"], saved["granularity"]) != (window.span, window.granularity):
+                    continue
+                window.buckets = {
+                    int(index): {scope: SpaceSaving.from_list(_capacity(scope), rows) for scope, rows in bucket.items()}
+                    for index, bucket in saved["buckets"].items()
+                }
+                window._closed.clear()
+                window._results.clear()
+        return True
+
+    def restore(self, db: Session, path: str = TRENDING_SNAPSHOT_PATH) -> str:
+        """
+        Startup: the last snapshot plus the sales since it, otherwise the recent sales in the
+        database. Once counting, only the new sales are read.
+        """
+        if self.watermark is not None:
+            return f"caught up with {self.poll(db)} new sales"
+        try:
+            if path and self.load(path):
+                return f"restored from {path} and {self.poll(db)} sales since"
+        except Exception as e:
+            print(f"Error loading trending snapshot from {path}: {e}")
+        return f"seeded with {self.poll(db)} recent sales"
+
+    def owns_snapshot(self, path: str = TRENDING_SNAPSHOT_PATH) -> bool:
+        """
+        Whether this process writes the snapshot. Every worker counts the same sales, so one
+        writer is enough: the process holding an exclusive lock on path.lock (taken on the
+        first call, retried while another process holds it, released when the process exits).
+        """
+        if fcntl is None or self._snapshot_lock_file is not None:
+            return True
+        lock_file = open(f"{path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._snapshot_lock_file = lock_file
+        return True
+
+    def _maybe_snapshot(self):
+        if not TRENDING_SNAPSHOT_PATH or not self._dirty or self._saving:
+            return
+        if time.monotonic() - self._saved_at < TRENDING_SNAPSHOT_SECONDS:
+            return
+        if not self.owns_snapshot():
+            self._saved_at = time.monotonic()
+            return
+        self._saving = True
+        threading.Thread(target=self._snapshot, daemon=True).start()
+
+    def _snapshot(self):
+        try:
+            self.save()
+        except Exception as e:
+            print(f"Error saving trending snapshot to {TRENDING_SNAPSHOT_PATH}: {e}")
+            self._saved_at = time.monotonic()
+        finally:
+            self._saving = False
+
+
+def _parse_windows(spec: str) -> Dict[str, Tuple[int, int]]:
+    windows = {}
+    for item in spec.split(","):
+        name, _, granularity = item.strip().partition(":")
+        windows[name] = (_seconds(name), _seconds(granularity or name))
+    return windows
+
+
+def _seconds(duration: str) -> int:
+    return int(float(duration[:-1]) * _UNITS[duration[-1]])
+
+
+def _scope(kind: str, value: Optional[str]) -> str:
+    return f"{kind}:{(value or '').strip().lower()}"
+
+
+def _capacity(scope: str) -> int:
+    return TRENDING_CAPACITY if scope == ALL else TRENDING_SEGMENT_CAPACITY
+
+
+def _utc(moment: datetime) -> datetime:
+    """Naive UTC, as the database stores it"""
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def _epoch(moment: datetime) -> float:
+    # Naive timestamps in the database are UTC
+    return (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp()
+
+
+trending = TrendingTracker()
+
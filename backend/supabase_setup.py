@@ -62,7 +62,7 @@ def test_tables():
             
             # Check for required tables
             required_tables = [
-                'conversation_messages', 'conversation_sessions', 
+                'conversation_archives', 'conversation_messages', 'conversation_sessions', 'conversation_summaries',
                 'distribution_centers', 'inventory_items', 
                 'order_items', 'orders', 'users'
             ]
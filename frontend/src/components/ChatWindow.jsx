@@ -7,7 +7,7 @@ import { useChat } from '../context/ChatContext';
 const MOBILE_BREAKPOINT = 900; // px
 
 const ChatWindow = () => {
-  const { messages, isLoading, addMessage, setLoading, addErrorMessage } = useChat();
+  const { messages, isLoading, addMessage, updateMessage, setLoading, addErrorMessage, sendChatMessage } = useChat();
 
   const [showHistory, setShowHistory] = useState(false);
   const [isMobile, setIsMobile] = useState(window.innerWidth <= MOBILE_BREAKPOINT);
@@ -35,16 +35,28 @@ const ChatWindow = () => {
     if (!text.trim()) return;
     addMessage({ id: Date.now(), sender: 'user', text });
     setLoading(true);
+    const replyId = Date.now() + 1;
+    let streamed = '';
     try {
-      const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
-      const response = await fetch(`${API_URL}/api/chat`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: text, user_id: 'anonymous' }),
+      const data = await sendChatMessage(text, {
+        userId: 'anonymous',
+        // Show the reply while the LLM is still writing it
+        onToken: (delta) => {
+          if (!streamed) {
+            setLoading(false);
+            addMessage({ id: replyId, sender: 'ai', text: delta });
+          } else {
+            updateMessage(replyId, { text: streamed + delta });
+          }
+          streamed += delta;
+        }
       });
-      if (!response.ok) throw new Error('Failed to get response');
-      const data = await response.json();
-      addMessage({ id: Date.now() + 1, sender: 'ai', text: data.response });
+      // The final response replaces the streamed text
+      if (streamed) {
+        updateMessage(replyId, { text: data.response });
+      } else {
+        addMessage({ id: replyId, sender: 'ai', text: data.response });
+      }
     } catch (error) {
       console.error('Error sending message:', error);
       addErrorMessage('Sorry, I\'m having trouble connecting right now. Please try again later.');
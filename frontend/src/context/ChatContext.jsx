@@ -1,6 +1,8 @@
-import React, { createContext, useContext, useReducer } from 'react';
+import React, { createContext, useContext, useReducer, useRef, useEffect } from 'react';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+// http(s)://host -> ws(s)://host
+const WS_URL = `${API_URL.replace(/^http/, 'ws')}/ws/chat`;
 
 // Initial state
 const initialState = {
@@ -18,6 +20,7 @@ const initialState = {
 // Action types
 const ACTIONS = {
   ADD_MESSAGE: 'ADD_MESSAGE',
+  UPDATE_MESSAGE: 'UPDATE_MESSAGE',
   SET_LOADING: 'SET_LOADING',
   SET_USER_INPUT: 'SET_USER_INPUT',
   CLEAR_INPUT: 'CLEAR_INPUT',
@@ -37,6 +40,13 @@ const chatReducer = (state, action) => {
         ...state,
         messages: [...state.messages, action.payload]
       };
+    case ACTIONS.UPDATE_MESSAGE:
+      return {
+        ...state,
+        messages: state.messages.map(message =>
+          message.id === action.payload.id ? { ...message, ...action.payload.changes } : message
+        )
+      };
     case ACTIONS.SET_LOADING:
       return {
         ...state,
@@ -95,10 +105,25 @@ const ChatContext = createContext();
 export const ChatProvider = ({ children }) => {
   const [state, dispatch] = useReducer(chatReducer, initialState);
 
+  // One WebSocket per chat session; replies are matched to messages by client_id
+  const socketRef = useRef(null);
+  const socketPromiseRef = useRef(null);
+  const socketSessionRef = useRef(null);
+  const pendingRef = useRef(new Map());
+  const nextClientIdRef = useRef(1);
+
+  useEffect(() => () => {
+    if (socketRef.current) socketRef.current.close();
+  }, []);
+
   const addMessage = (message) => {
     dispatch({ type: ACTIONS.ADD_MESSAGE, payload: message });
   };
 
+  const updateMessage = (id, changes) => {
+    dispatch({ type: ACTIONS.UPDATE_MESSAGE, payload: { id, changes } });
+  };
+
   const setLoading = (loading) => {
     dispatch({ type: ACTIONS.SET_LOADING, payload: loading });
   };
@@ -155,9 +180,92 @@ export const ChatProvider = ({ children }) => {
     }
   };
 
+  // Chat transport
+  const openSocket = (userId, conversationId) => new Promise((resolve, reject) => {
+    const params = new URLSearchParams({ user_id: userId });
+    if (conversationId) params.set('conversation_id', conversationId);
+    const socket = new WebSocket(`${WS_URL}?${params}`);
+    socketRef.current = socket;
+    let opened = false;
+
+    socket.onmessage = (event) => {
+      const frame = JSON.parse(event.data);
+      if (frame.type === 'session') {
+        opened = true;
+        socketSessionRef.current = frame.conversation_id;
+        dispatch({ type: ACTIONS.SET_CURRENT_SESSION, payload: frame.conversation_id });
+        resolve(socket);
+        return;
+      }
+      const pending = pendingRef.current.get(frame.client_id);
+      if (!pending) return;
+      if (frame.type === 'token') {
+        pending.onToken(frame.delta);
+      } else {
+        pendingRef.current.delete(frame.client_id);
+        if (frame.type === 'response') pending.resolve(frame);
+        else pending.reject(new Error(frame.detail || 'Chat error'));
+      }
+    };
+    socket.onerror = () => reject(new Error('WebSocket connection failed'));
+    socket.onclose = (event) => {
+      // The server accepts and then closes (1011) when session setup fails; fall back to POST
+      if (!opened) reject(new Error(`WebSocket closed before the session started (${event.code})`));
+      if (socketRef.current === socket) {
+        socketRef.current = null;
+        socketPromiseRef.current = null;
+      }
+      pendingRef.current.forEach(pending => pending.reject(new Error('Connection closed')));
+      pendingRef.current.clear();
+    };
+  });
+
+  const getSocket = (userId) => {
+    // Reconnect when another conversation was selected in the history panel
+    if (socketPromiseRef.current && state.currentSessionId && state.currentSessionId !== socketSessionRef.current) {
+      socketRef.current.close();
+      socketPromiseRef.current = null;
+    }
+    if (!socketPromiseRef.current) {
+      socketPromiseRef.current = openSocket(userId, state.currentSessionId);
+      socketPromiseRef.current.catch(() => { socketPromiseRef.current = null; });
+    }
+    return socketPromiseRef.current;
+  };
+
+  const postChatMessage = async (text, userId) => {
+    const response = await fetch(`${API_URL}/api/chat`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ message: text, user_id: userId, conversation_id: state.currentSessionId }),
+    });
+    if (!response.ok) throw new Error('Failed to get response');
+    const data = await response.json();
+    dispatch({ type: ACTIONS.SET_CURRENT_SESSION, payload: data.conversation_id });
+    return data;
+  };
+
+  // Sends over the WebSocket (LLM output arrives through onToken as it is generated) and
+  // falls back to POST /api/chat when no connection can be opened. Resolves with the final reply.
+  const sendChatMessage = async (text, { userId = 'anonymous', onToken = () => {} } = {}) => {
+    let socket;
+    try {
+      socket = await getSocket(userId);
+    } catch (err) {
+      return postChatMessage(text, userId);
+    }
+    const clientId = String(nextClientIdRef.current++);
+    return new Promise((resolve, reject) => {
+      pendingRef.current.set(clientId, { resolve, reject, onToken });
+      socket.send(JSON.stringify({ message: text, client_id: clientId }));
+    });
+  };
+
   const value = {
     ...state,
     addMessage,
+    updateMessage,
+    sendChatMessage,
     setLoading,
     setUserInput,
     clearInput,